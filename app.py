@@ -2,14 +2,28 @@
 
 from __future__ import annotations
 
-import io
+import json
 import os
+import tempfile
+import uuid
 from datetime import date, datetime
 
-from flask import Flask, flash, redirect, render_template, request, url_for
+import click
+from flask import (
+    Flask,
+    Response,
+    flash,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+    url_for,
+)
 
 from config import Config
-from models import ElectricityPlan, UsageRecord, db
+from models import Job, UsageRecord, db
+from services import catalog, database, http_cache, jobs, metrics, rollup, uploads, versions
 
 
 def create_app(config_class=Config) -> Flask:
@@ -18,44 +32,62 @@ def create_app(config_class=Config) -> Flask:
 
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
     db.init_app(app)
+    database.init_app(app)
+    rollup.register_listeners()
+    versions.register_listeners()
+    uploads.register_listeners()
 
     with app.app_context():
         db.create_all()
+        database.add_missing_columns()
+        rollup.backfill_rollup()
+        jobs.fail_interrupted_jobs()
+    catalog.init_app(app)
+    jobs.init_app(app)
+    metrics.init_app(app)
+    http_cache.init_app(app)
 
     register_routes(app)
+    register_commands(app)
     return app
 
 
+REPRICE_TOP_K = 15  # plans in the /reprice chart
+REPRICE_PAGE_SIZE = 50  # table rows per page on /reprice
+MAX_REPRICE_TOP_K = 500
+
+SORT_LABELS = {
+    "cost": "Estimated bill",
+    "price_kwh_500": "Price at 500 kWh",
+    "price_kwh_1000": "Price at 1000 kWh",
+    "price_kwh_2000": "Price at 2000 kWh",
+    "renewable_pct": "Renewable %",
+    "contract_length": "Term",
+    "cancellation_fee": "Cancellation fee",
+}
+
+
 def register_routes(app: Flask) -> None:
     # ------------------------------------------------------------------
     # Dashboard
     # ------------------------------------------------------------------
     @app.route("/")
+    @http_cache.versioned(versions.USAGE, versions.PLANS)
     def dashboard():
-        total_records = UsageRecord.query.count()
-        plan_count = ElectricityPlan.query.count()
-
-        first = UsageRecord.query.order_by(UsageRecord.date.asc()).first()
-        last = UsageRecord.query.order_by(UsageRecord.date.desc()).first()
-        if first and last:
-            date_range = f"{first.date} to {last.date}"
-        else:
-            date_range = "No data"
-
-        avg_daily_kwh = 0.0
-        if total_records:
-            result = db.session.query(db.func.avg(UsageRecord.usage_kwh)).scalar()
-            avg_daily_kwh = round(result or 0, 1)
+        from services.dashboard import get_dashboard_stats
 
-        monthly_data = _get_monthly_aggregates()
+        esiid = request.args.get("esiid", "")
+        stats = get_dashboard_stats(esiid or None)
 
         return render_template(
             "index.html",
-            total_records=total_records,
-            date_range=date_range,
-            avg_daily_kwh=avg_daily_kwh,
-            plan_count=plan_count,
-            monthly_data=monthly_data,
+            total_records=stats.total_records,
+            date_range=stats.date_range,
+            avg_daily_kwh=stats.avg_daily_kwh,
+            plan_count=stats.plan_count,
+            monthly_data=_monthly_chart_data(stats.monthly),
+            esiids=stats.esiids,
+            selected_esiid=esiid,
         )
 
     # ------------------------------------------------------------------
@@ -63,7 +95,6 @@ def register_routes(app: Flask) -> None:
     # ------------------------------------------------------------------
     @app.route("/upload", methods=["GET", "POST"])
     def upload():
-        result = None
         if request.method == "POST":
             csv_file = request.files.get("csv_file")
             file_type = request.form.get("file_type", "daily")
@@ -71,50 +102,49 @@ def register_routes(app: Flask) -> None:
             if not csv_file or csv_file.filename == "":
                 flash("Please select a CSV file.", "error")
                 return redirect(url_for("upload"))
+            if file_type not in uploads.COVERED_BY:
+                flash(f"Unknown file type {file_type!r}; choose daily or interval.", "error")
+                return render_template("upload.html"), 400
 
-            from services.csv_parser import parse_daily_csv, parse_interval_csv
-
-            try:
-                text = csv_file.stream.read().decode("utf-8-sig")
-                file_obj = io.StringIO(text)
-
-                if file_type == "interval":
-                    rows = parse_interval_csv(file_obj)
-                else:
-                    rows = parse_daily_csv(file_obj)
-
-                imported, skipped = _upsert_usage_rows(rows)
-                result = {"imported": imported, "skipped": skipped}
-                flash(f"Imported {imported} records ({skipped} duplicates skipped).", "success")
-            except Exception as e:
-                flash(f"Error parsing CSV: {e}", "error")
+            # Spool to UPLOAD_FOLDER so the job can parse it after the request ends.
+            path = os.path.join(app.config["UPLOAD_FOLDER"], f"{uuid.uuid4().hex}.csv")
+            csv_file.save(path)
+            job_id = jobs.get_runner().submit("upload", jobs.ingest_upload, path, file_type)
+            return redirect(url_for("job_view", job_id=job_id))
 
-        return render_template("upload.html", result=result)
+        return render_template("upload.html")
 
     # ------------------------------------------------------------------
     # Usage visualization
     # ------------------------------------------------------------------
     @app.route("/usage")
+    @http_cache.versioned(versions.USAGE)
     def usage_view():
+        from services import export
+
         start = request.args.get("start", "")
         end = request.args.get("end", "")
-
-        query = UsageRecord.query.order_by(UsageRecord.date.asc())
-        if start:
-            query = query.filter(UsageRecord.date >= date.fromisoformat(start))
-        if end:
-            query = query.filter(UsageRecord.date <= date.fromisoformat(end))
-
-        records = query.all()
-
-        daily_data = [{"date": r.date.isoformat(), "kwh": r.usage_kwh} for r in records]
-        monthly_data = _aggregate_monthly(records)
-
+        cursor = request.args.get("cursor", "")
+        try:
+            stmt = export.usage_query(
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+                after=cursor or None,
+            )
+        except ValueError as e:
+            flash(str(e), "error")
+            start = end = cursor = ""
+            stmt = export.usage_query()
+
+        # The table is paged by keyset; the charts load the downsampled series.
+        page = export.fetch_page(
+            stmt, export.usage_row_dict, export.usage_cursor, app.config["USAGE_PAGE_SIZE"]
+        )
         return render_template(
             "usage.html",
-            records=records,
-            daily_data=daily_data,
-            monthly_data=monthly_data,
+            records=page["data"],
+            next_cursor=page["next_cursor"],
+            cursor=cursor,
             start=start,
             end=end,
         )
@@ -123,51 +153,76 @@ def register_routes(app: Flask) -> None:
     # Plans
     # ------------------------------------------------------------------
     @app.route("/plans")
+    @http_cache.versioned(versions.PLANS)
     def plans_view():
-        plans = ElectricityPlan.query.order_by(ElectricityPlan.price_kwh_1000.asc()).all()
-        return render_template("plans.html", plans=plans)
+        from services.plan_search import PlanQuery, current_catalog, filter_options, search_plans
+
+        try:
+            query = PlanQuery.from_args(request.args)
+        except ValueError as e:
+            flash(str(e), "error")
+            query = PlanQuery()
+        plan_catalog = current_catalog()
+        return render_template(
+            "plans.html",
+            result=search_plans(query, plan_catalog),
+            options=filter_options(plan_catalog),
+            plan_count=len(plan_catalog),
+            sorts=SORT_LABELS,
+        )
 
     @app.route("/plans/fetch", methods=["POST"])
     def fetch_plans():
-        from services.ptc_client import fetch_plans_from_api, save_plans_to_db
+        locations = request.form.get("zip_code", "").replace(",", " ").split() or [""]
+        job_id = jobs.get_runner().submit("plans_fetch", jobs.fetch_plans, locations)
+        return redirect(url_for("job_view", job_id=job_id))
 
-        zip_code = request.form.get("zip_code", "")
-        try:
-            raw_plans = fetch_plans_from_api(zip_code)
-            count = save_plans_to_db(raw_plans)
-            flash(f"Fetched and saved {count} plans.", "success")
-        except Exception as e:
-            flash(f"Error fetching plans: {e}", "error")
-        return redirect(url_for("plans_view"))
+    @app.route("/plans/import-csv", methods=["POST"])
+    def import_plans_csv():
+        job_id = jobs.get_runner().submit("plans_csv", jobs.import_plans_csv)
+        return redirect(url_for("job_view", job_id=job_id))
+
+    # ------------------------------------------------------------------
+    # Background jobs
+    # ------------------------------------------------------------------
+    @app.route("/jobs/<job_id>")
+    def job_view(job_id):
+        job = db.get_or_404(Job, job_id)
+        return render_template("job.html", job=job.to_dict())
 
     # ------------------------------------------------------------------
     # Reprice
     # ------------------------------------------------------------------
     @app.route("/reprice", methods=["GET", "POST"])
+    @http_cache.versioned(versions.USAGE, versions.PLANS)
     def reprice_view():
         esiids = [
             r[0] for r in db.session.query(UsageRecord.esiid).distinct().all()
         ]
         results = None
         reprice_chart_data = None
-        selected_esiid = ""
-        start = ""
-        end = ""
-
-        if request.method == "POST":
-            from services.repricer import reprice_usage
-
-            selected_esiid = request.form.get("esiid", "")
-            start = request.form.get("start", "")
-            end = request.form.get("end", "")
+        selected_esiid = request.values.get("esiid", "")
+        start = request.values.get("start", "")
+        end = request.values.get("end", "")
 
-            start_date = date.fromisoformat(start) if start else None
-            end_date = date.fromisoformat(end) if end else None
+        if selected_esiid:
+            from services.reprice_cache import cached_reprice
 
-            results = reprice_usage(selected_esiid, start=start_date, end=end_date)
-
-            # Prepare chart data (top 15 cheapest)
-            top = results[:15]
+            try:
+                # Summary rows only; the table pages and loads monthly
+                # breakdowns through /api/reprice.
+                results = cached_reprice(
+                    selected_esiid,
+                    start=date.fromisoformat(start) if start else None,
+                    end=date.fromisoformat(end) if end else None,
+                    top_k=REPRICE_PAGE_SIZE,
+                )
+            except ValueError as e:
+                flash(str(e), "error")
+
+        if results:
+            # Prepare chart data (top REPRICE_TOP_K cheapest)
+            top = results[:REPRICE_TOP_K]
             reprice_chart_data = {
                 "labels": [f"{r.plan.company_name} - {r.plan.plan_name}"[:40] for r in top],
                 "costs": [r.total_cost for r in top],
@@ -177,67 +232,335 @@ def register_routes(app: Flask) -> None:
             "reprice.html",
             esiids=esiids,
             results=results,
+            plans_considered=getattr(results, "plans_considered", 0),
             reprice_chart_data=reprice_chart_data,
             selected_esiid=selected_esiid,
             start=start,
             end=end,
         )
 
+    # ------------------------------------------------------------------
+    # Instrumentation
+    # ------------------------------------------------------------------
+    @app.route("/metrics")
+    def metrics_view():
+        if not app.config.get("METRICS_ENABLED", True):
+            return {"error": "metrics are disabled"}, 404
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
     # ------------------------------------------------------------------
     # API endpoints (JSON)
     # ------------------------------------------------------------------
     @app.route("/api/usage")
+    @http_cache.versioned(versions.USAGE)
     def api_usage():
-        esiid = request.args.get("esiid", "")
-        query = UsageRecord.query
-        if esiid:
-            query = query.filter_by(esiid=esiid)
-        records = query.order_by(UsageRecord.date.asc()).all()
-        return {"data": [r.to_dict() for r in records]}
+        from services import export
+
+        start = request.args.get("start", "")
+        end = request.args.get("end", "")
+        try:
+            stmt = export.usage_query(
+                esiid=request.args.get("esiid") or None,
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+                after=request.args.get("cursor") or None,
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return _api_rows(stmt, export.usage_row_dict, export.usage_cursor)
+
+    @app.route("/api/usage/series")
+    @http_cache.versioned(versions.USAGE)
+    def api_usage_series():
+        from services.timeseries import DEFAULT_POINTS, usage_chart_series
+
+        start = request.args.get("start", "")
+        end = request.args.get("end", "")
+        try:
+            return usage_chart_series(
+                esiid=request.args.get("esiid") or None,
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+                points=request.args.get("points", DEFAULT_POINTS, type=int),
+                method=request.args.get("method", "lttb"),
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
 
     @app.route("/api/plans")
+    @http_cache.versioned(versions.PLANS)
     def api_plans():
-        plans = ElectricityPlan.query.all()
-        return {"data": [p.to_dict() for p in plans]}
+        from services import export
+
+        after = request.args.get("cursor") or None
+        plan_catalog = catalog.get_catalog()
+        try:
+            if plan_catalog is not None:
+                positions = export.catalog_positions(plan_catalog, after)
+            else:
+                stmt = export.plan_query(after=after)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        if plan_catalog is not None:
+            return _api_catalog_rows(plan_catalog, positions)
+        return _api_rows(stmt, export.plan_row_dict, export.plan_cursor)
+
+    @app.route("/api/plans/search")
+    @http_cache.versioned(versions.PLANS)
+    def api_plans_search():
+        from services.plan_search import PlanQuery, search_plans
+
+        try:
+            query = PlanQuery.from_args(request.args)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return search_plans(query).to_dict()
+
+    @app.route("/api/jobs/<job_id>")
+    def api_job(job_id):
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return {"error": "unknown job"}, 404
+        return job.to_dict()
+
+    @app.route("/api/reprice")
+    @http_cache.versioned(versions.USAGE, versions.PLANS)
+    def api_reprice():
+        from services.reprice_cache import cached_reprice
+
+        esiid = request.args.get("esiid", "")
+        start = request.args.get("start", "")
+        end = request.args.get("end", "")
+        k = request.args.get("k", REPRICE_TOP_K, type=int)
+        offset = request.args.get("offset", 0, type=int)
+        if not esiid:
+            return {"error": "esiid is required"}, 400
+        if not 1 <= k <= MAX_REPRICE_TOP_K or offset < 0:
+            return {"error": f"k must be 1-{MAX_REPRICE_TOP_K} and offset >= 0"}, 400
+        try:
+            results = cached_reprice(
+                esiid,
+                plan_ids=request.args.getlist("plan_id", type=int) or None,
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+                top_k=offset + k,
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        considered = getattr(results, "plans_considered", 0)
+        return {
+            "data": [
+                {"rank": rank, **_estimate_dict(r)}
+                for rank, r in enumerate(results[offset : offset + k], start=offset + 1)
+            ],
+            "offset": offset,
+            "k": k,
+            "next_offset": offset + k if offset + k < considered else None,
+            "plans": considered,
+            "plans_evaluated": getattr(results, "plans_evaluated", 0),
+        }
+
+    @app.route("/api/reprice/plans/<int:plan_id>")
+    @http_cache.versioned(versions.USAGE, versions.PLANS)
+    def api_reprice_plan(plan_id):
+        from services.reprice_cache import cached_reprice
+
+        esiid = request.args.get("esiid", "")
+        start = request.args.get("start", "")
+        end = request.args.get("end", "")
+        if not esiid:
+            return {"error": "esiid is required"}, 400
+        try:
+            results = cached_reprice(
+                esiid,
+                plan_ids=[plan_id],
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        if not results:
+            return {"error": "unknown plan or no usage in range"}, 404
+        return {**_estimate_dict(results[0]), "monthly_costs": results[0].monthly_costs}
+
+    @app.route("/api/reprice/portfolio")
+    @http_cache.versioned(versions.USAGE, versions.PLANS)
+    def api_reprice_portfolio():
+        from services.portfolio import reprice_portfolio
+
+        start = request.args.get("start", "")
+        end = request.args.get("end", "")
+        try:
+            result = reprice_portfolio(
+                esiids=request.args.getlist("esiid") or None,
+                plan_ids=request.args.getlist("plan_id", type=int) or None,
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+                workers=1,  # no process pool inside a web worker
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return result.to_dict()
+
+    @app.route("/api/reprice/cache")
+    def api_reprice_cache():
+        from services.reprice_cache import get_cache
+
+        return get_cache().stats()
+
+    @app.route("/api/export/<dataset>")
+    def api_export(dataset):
+        from services.columnar import FORMATS, export_dataset
+
+        fmt = request.args.get("format", "parquet")
+        start = request.args.get("start", "")
+        end = request.args.get("end", "")
+        out = tempfile.TemporaryFile()
+        try:
+            export_dataset(
+                dataset,
+                out,
+                fmt=fmt,
+                esiid=request.args.get("esiid") or None,
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+            )
+        except ValueError as e:
+            out.close()
+            return {"error": str(e)}, 400
+        out.seek(0)
+        return send_file(out, mimetype=FORMATS[fmt], download_name=f"{dataset}.{fmt}")
 
 
 # ------------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------------
-def _upsert_usage_rows(rows) -> tuple[int, int]:
-    imported = 0
-    skipped = 0
-    for row in rows:
-        existing = UsageRecord.query.filter_by(esiid=row.esiid, date=row.date).first()
-        if existing:
-            skipped += 1
-            continue
-        rec = UsageRecord(
-            esiid=row.esiid,
-            date=row.date,
-            usage_kwh=row.usage_kwh,
-            reading_type=row.reading_type,
-            actual_estimated=row.actual_estimated,
+def _api_rows(stmt, to_dict, cursor_of):
+    """Serve a query as one keyset page, or as NDJSON with ?format=ndjson."""
+    from services import export
+
+    if request.args.get("format") == "ndjson":
+        return Response(
+            stream_with_context(export.stream_ndjson(stmt, to_dict)),
+            mimetype="application/x-ndjson",
+        )
+    limit = request.args.get("limit", export.DEFAULT_PAGE_SIZE, type=int)
+    return export.fetch_page(stmt, to_dict, cursor_of, limit)
+
+
+def _api_catalog_rows(plan_catalog, positions):
+    """Like _api_rows, for plans read from the catalog snapshot."""
+    from services import export
+
+    if request.args.get("format") == "ndjson":
+        return Response(
+            export.stream_catalog_ndjson(plan_catalog, positions),
+            mimetype="application/x-ndjson",
         )
-        db.session.add(rec)
-        imported += 1
-    db.session.commit()
-    return imported, skipped
+    limit = request.args.get("limit", export.DEFAULT_PAGE_SIZE, type=int)
+    return export.fetch_catalog_page(plan_catalog, positions, limit)
+
 
+def _estimate_dict(estimate) -> dict:
+    """Summary of a PlanCostEstimate, without the monthly breakdown."""
+    return {
+        "plan": estimate.plan.to_dict(),
+        "total_cost": estimate.total_cost,
+        "avg_monthly_cost": estimate.avg_monthly_cost,
+        "avg_price_per_kwh": estimate.avg_price_per_kwh,
+    }
 
-def _get_monthly_aggregates() -> list[dict]:
-    records = UsageRecord.query.order_by(UsageRecord.date.asc()).all()
-    return _aggregate_monthly(records)
 
+def _monthly_chart_data(months) -> list[dict]:
+    return [{"label": f"{m.year:04d}-{m.month:02d}", "kwh": round(m.total_kwh, 1)} for m in months]
 
-def _aggregate_monthly(records) -> list[dict]:
-    monthly: dict[str, float] = {}
-    for rec in records:
-        key = rec.date.strftime("%Y-%m")
-        monthly[key] = monthly.get(key, 0) + rec.usage_kwh
-    return [
-        {"label": k, "kwh": round(v, 1)} for k, v in sorted(monthly.items())
-    ]
+
+# ------------------------------------------------------------------
+# CLI commands
+# ------------------------------------------------------------------
+def register_commands(app: Flask) -> None:
+    @app.cli.command("check-rollup")
+    @click.option("--fix", is_flag=True, help="Rebuild the rollup from usage_records.")
+    def check_rollup_command(fix: bool) -> None:
+        """Compare the monthly usage rollup with the raw daily records."""
+        mismatched = rollup.check_rollup()
+        click.echo(f"{len(mismatched)} month(s) out of sync.")
+        for esiid, year, month in mismatched[:20]:
+            click.echo(f"  {esiid} {year:04d}-{month:02d}")
+        if mismatched and fix:
+            rollup.rebuild_rollup()
+            click.echo("Rollup rebuilt.")
+
+    @app.cli.command("import-plans-csv")
+    @click.option("--batch-size", default=500, show_default=True)
+    def import_plans_csv_command(batch_size: int) -> None:
+        """Stream the full Power to Choose CSV export into the plan table."""
+        from services.ptc_client import import_plans_csv
+
+        saved = import_plans_csv(batch_size=batch_size)
+        click.echo(
+            f"Imported {saved.total} plans in {saved.seconds:.1f}s "
+            f"({saved.inserted} new, {saved.updated} updated, {saved.unchanged} unchanged)."
+        )
+
+    @app.cli.command("reprice-portfolio")
+    @click.option("--esiid", "esiids", multiple=True, help="Repeatable; default all meters.")
+    @click.option("--start", default=None, help="YYYY-MM-DD")
+    @click.option("--end", default=None, help="YYYY-MM-DD")
+    @click.option("--workers", type=int, default=None, help="Process pool size.")
+    @click.option("--json", "as_json", is_flag=True, help="Print the full result as JSON.")
+    def reprice_portfolio_command(esiids, start, end, workers, as_json) -> None:
+        """Find the cheapest plan for every meter and for the whole portfolio."""
+        from services.portfolio import reprice_portfolio
+
+        result = reprice_portfolio(
+            esiids=list(esiids) or None,
+            start=date.fromisoformat(start) if start else None,
+            end=date.fromisoformat(end) if end else None,
+            workers=workers,
+        ).to_dict()
+        if as_json:
+            click.echo(json.dumps(result, indent=2))
+            return
+        for m in result["meters"]:
+            plan = m["best_plan"]
+            label = f"{plan['company_name']} - {plan['plan_name']}" if plan else "-"
+            cost = m["best_cost"] or 0
+            click.echo(f"{m['esiid']:<22} {m['months']:>3} mo  ${cost:>10,.2f}  {label}")
+        summary = result["portfolio"]
+        plan = summary["best_plan"]
+        click.echo(
+            f"{summary['meters']} meters, {result['plans']} plans in {result['seconds']:.2f}s "
+            f"({result['meters_per_second']} meters/s)"
+        )
+        click.echo(f"Sum of per-meter best: ${summary['sum_of_meter_best']:,.2f}")
+        if plan:
+            click.echo(
+                f"Best single plan: {plan['company_name']} - {plan['plan_name']} "
+                f"(${summary['best_plan_cost']:,.2f})"
+            )
+
+    @app.cli.command("export")
+    @click.argument("dataset", type=click.Choice(["usage", "monthly", "reprice"]))
+    @click.option("--output", "-o", required=True, type=click.Path(dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["parquet", "arrow"]), default="parquet")
+    @click.option("--esiid", default=None)
+    @click.option("--start", default=None, help="YYYY-MM-DD")
+    @click.option("--end", default=None, help="YYYY-MM-DD")
+    def export_command(dataset, output, fmt, esiid, start, end) -> None:
+        """Export usage, monthly rollups or repricing results as Parquet/Arrow."""
+        from services.columnar import export_dataset
+
+        with open(output, "wb") as out:
+            rows = export_dataset(
+                dataset,
+                out,
+                fmt=fmt,
+                esiid=esiid,
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+            )
+        click.echo(f"Wrote {rows} {dataset} rows to {output}.")
 
 
 # ------------------------------------------------------------------
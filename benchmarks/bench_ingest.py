@@ -0,0 +1,103 @@
+"""Benchmark usage ingest: legacy per-row lookups vs. set-based bulk insert.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingest --esiids 5 --years 3
+
+Each run ingests the same synthetic rows twice (the second pass is all
+duplicates, like a re-upload) into a fresh SQLite database and reports
+rows/second for both implementations.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import create_app
+from config import Config
+from models import UsageRecord, db
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+
+
+def make_rows(esiids: int, years: int) -> list[ParsedUsageRow]:
+    start = date(2020, 1, 1)
+    days = 365 * years
+    rows = []
+    for m in range(esiids):
+        esiid = f"10443720000{m:06d}"
+        for d in range(days):
+            rows.append(
+                ParsedUsageRow(
+                    esiid=esiid,
+                    date=start + timedelta(days=d),
+                    usage_kwh=round(20 + (d * 7 + m * 13) % 40 + 0.25, 3),
+                    reading_type="C",
+                    actual_estimated="A",
+                )
+            )
+    return rows
+
+
+def legacy_upsert(rows) -> tuple[int, int]:
+    """The original one-query-per-row implementation, kept for comparison."""
+    imported = 0
+    skipped = 0
+    for row in rows:
+        existing = UsageRecord.query.filter_by(esiid=row.esiid, date=row.date).first()
+        if existing:
+            skipped += 1
+            continue
+        db.session.add(
+            UsageRecord(
+                esiid=row.esiid,
+                date=row.date,
+                usage_kwh=row.usage_kwh,
+                reading_type=row.reading_type,
+                actual_estimated=row.actual_estimated,
+            )
+        )
+        imported += 1
+    db.session.commit()
+    return imported, skipped
+
+
+def _run(label: str, fn, rows) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            for pass_name in ("fresh", "re-upload"):
+                t0 = time.perf_counter()
+                imported, skipped = fn(rows)
+                elapsed = time.perf_counter() - t0
+                print(
+                    f"{label:<8} {pass_name:<10} imported={imported:<7} skipped={skipped:<7} "
+                    f"{elapsed:8.3f}s {len(rows) / elapsed:12,.0f} rows/s"
+                )
+            db.session.remove()
+            db.engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--esiids", type=int, default=5)
+    parser.add_argument("--years", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = make_rows(args.esiids, args.years)
+    print(f"{len(rows):,} rows ({args.esiids} ESIIDs x {args.years} years)")
+    _run("legacy", legacy_upsert, rows)
+    _run("bulk", ingest_usage_rows, rows)
+
+
+if __name__ == "__main__":
+    main()
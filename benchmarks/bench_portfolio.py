@@ -0,0 +1,102 @@
+"""Benchmark portfolio repricing: per-meter reprice_usage loop vs. reprice_portfolio.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_portfolio --meters 500 --plans 2000 --years 3 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+
+from app import create_app
+from config import Config
+from models import ElectricityPlan, MonthlyUsageRollup, db
+from services.portfolio import reprice_portfolio
+from services.repricer import reprice_usage
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+def seed(meters: int, plans: int, years: int, seed: int = 11) -> list[str]:
+    """Write monthly rollup rows directly; repricing reads only the rollup."""
+    rng = random.Random(seed)
+    esiids = [f"1044372{i:09d}" for i in range(meters)]
+    db.session.execute(
+        MonthlyUsageRollup.__table__.insert(),
+        [
+            {
+                "esiid": esiid,
+                "year": 2021 + m // 12,
+                "month": m % 12 + 1,
+                "total_kwh": rng.uniform(300, 3000),
+                "days": 30,
+                "estimated_days": 0,
+                "min_kwh": 5.0,
+                "max_kwh": 120.0,
+            }
+            for esiid in esiids
+            for m in range(12 * years)
+        ],
+    )
+    rows = []
+    for i in range(plans):
+        row = {
+            "plan_id": f"bench-{i}",
+            "company_name": f"Company {i % 90}",
+            "plan_name": f"Plan {i}",
+            "price_kwh_500": rng.uniform(9, 20),
+            "price_kwh_1000": rng.uniform(8, 18),
+            "price_kwh_2000": rng.uniform(7, 17),
+            "energy_charge": None,
+            "base_charge": 0.0,
+        }
+        if i % 3 == 0:
+            row.update(energy_charge=rng.uniform(0.07, 0.16), base_charge=9.95)
+        rows.append(row)
+    db.session.execute(ElectricityPlan.__table__.insert(), rows)
+    db.session.commit()
+    return esiids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--meters", type=int, default=500)
+    parser.add_argument("--plans", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        esiids = seed(args.meters, args.plans, args.years)
+        cells = args.meters * args.plans * args.years * 12
+
+        t0 = time.perf_counter()
+        loop_best = {esiid: reprice_usage(esiid)[0] for esiid in esiids}
+        loop_s = time.perf_counter() - t0
+
+        print(f"{args.meters} meters x {args.plans} plans x {args.years * 12} months")
+        print(f"{'per-meter loop':<18} {loop_s:8.3f}s {args.meters / loop_s:10,.1f} meters/s")
+        for workers in sorted({1, args.workers}):
+            result = reprice_portfolio(workers=workers)
+            print(
+                f"{f'portfolio w={workers}':<18} {result.seconds:8.3f}s "
+                f"{args.meters / result.seconds:10,.1f} meters/s "
+                f"{cells / result.seconds:14,.0f} cells/s  ({loop_s / result.seconds:.1f}x)"
+            )
+        same = all(
+            m.best_plan_id == loop_best[m.esiid].plan.id
+            and m.best_cost == loop_best[m.esiid].total_cost
+            for m in result.meters
+        )
+        print(f"identical per-meter best plans: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark repricing: legacy per-plan/per-month loop vs. NumPy cost matrix.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reprice --plans 3000 --years 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app import create_app
+from config import Config
+from models import ElectricityPlan, UsageRecord, db
+from services.repricer import PlanCostEstimate, get_monthly_usage, reprice_usage
+from services.rollup import rebuild_rollup
+
+ESIID = "1044372000000001"
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+def seed(plans: int, years: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    db.session.execute(
+        UsageRecord.__table__.insert(),
+        [
+            {"esiid": ESIID, "date": start + timedelta(days=d), "usage_kwh": rng.uniform(15, 80)}
+            for d in range(365 * years)
+        ],
+    )
+    rows = []
+    for i in range(plans):
+        row = {
+            "plan_id": f"bench-{i}",
+            "company_name": f"Company {i % 90}",
+            "plan_name": f"Plan {i}",
+            "price_kwh_500": rng.uniform(9, 20),
+            "price_kwh_1000": rng.uniform(8, 18),
+            "price_kwh_2000": rng.uniform(7, 17),
+            "energy_charge": None,
+            "base_charge": 0.0,
+            "tdu_delivery_charge": 0.0,
+            "tdu_per_kwh": 0.0,
+        }
+        if i % 3 == 0:
+            row.update(
+                energy_charge=rng.uniform(0.07, 0.16),
+                base_charge=rng.choice([0.0, 4.95, 9.95]),
+                tdu_delivery_charge=4.39,
+                tdu_per_kwh=0.0403,
+            )
+        rows.append(row)
+    db.session.execute(ElectricityPlan.__table__.insert(), rows)
+    db.session.commit()
+    rebuild_rollup()
+
+
+def legacy_reprice(esiid: str) -> list[PlanCostEstimate]:
+    """The original nested Python loop, kept for comparison."""
+    monthly_usage = get_monthly_usage(esiid)
+    results = []
+    for plan in ElectricityPlan.query.all():
+        monthly_costs = []
+        total = 0.0
+        total_kwh = 0.0
+        for mu in monthly_usage:
+            cost = plan.estimate_monthly_cost(mu.total_kwh)
+            if cost is not None:
+                monthly_costs.append(
+                    {
+                        "year": mu.year,
+                        "month": mu.month,
+                        "kwh": round(mu.total_kwh, 2),
+                        "estimated_cost": round(cost, 2),
+                    }
+                )
+                total += cost
+                total_kwh += mu.total_kwh
+        num_months = len(monthly_costs) or 1
+        results.append(
+            PlanCostEstimate(
+                plan=plan,
+                monthly_costs=monthly_costs,
+                total_cost=round(total, 2),
+                avg_monthly_cost=round(total / num_months, 2),
+                avg_price_per_kwh=round((total / total_kwh * 100) if total_kwh > 0 else 0, 2),
+            )
+        )
+    results.sort(key=lambda r: r.total_cost)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=3000)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        seed(args.plans, args.years)
+        cells = args.plans * args.years * 12
+
+        db.session.expunge_all()
+        t0 = time.perf_counter()
+        legacy = legacy_reprice(ESIID)
+        legacy_s = time.perf_counter() - t0
+
+        db.session.expunge_all()
+        t0 = time.perf_counter()
+        results = reprice_usage(ESIID)
+        top = results[:15]
+        new_s = time.perf_counter() - t0
+
+        print(f"{args.plans} plans x {args.years * 12} months = {cells:,} cells")
+        print(f"legacy  {legacy_s:8.3f}s {cells / legacy_s:14,.0f} cells/s")
+        print(f"numpy   {new_s:8.3f}s {cells / new_s:14,.0f} cells/s  ({legacy_s / new_s:.1f}x)")
+        same = [r.total_cost for r in legacy] == results.total_costs and all(
+            a.plan.id == b.plan.id and a.monthly_costs == b.monthly_costs
+            for a, b in zip(legacy, top)
+        )
+        print(f"identical ranking and top-15 detail: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""End-to-end benchmark suite on synthetic data, with machine-readable output.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --esiids 20 --years 2 --plans 2000 -o bench.json
+    python -m benchmarks.suite --compare bench-before.json -o bench-after.json
+
+Times parsing, ingest, plan saving and repricing, then the main pages and
+JSON endpoints through the Flask test client, against a fresh SQLite file
+database.  Results (best and median of ``--repeat`` runs, with throughput
+where it is meaningful) are written as JSON together with the commit, the
+interpreter and the data spec, so runs from different commits can be
+compared with ``--compare``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks import synthetic
+from config import Config
+
+
+def _timed(fn, repeat: int, setup=None) -> tuple[list[float], object]:
+    times, result = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return times, result
+
+
+class Suite:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: list[dict] = []
+
+    def run(self, name: str, fn, items: int | None = None, repeat: int | None = None, setup=None):
+        times, result = _timed(fn, repeat or self.repeat, setup)
+        best = min(times)
+        entry = {
+            "name": name,
+            "seconds": round(best, 6),
+            "median_seconds": round(statistics.median(times), 6),
+            "repeat": len(times),
+            "items": items,
+            "items_per_second": round(items / best, 1) if items and best else None,
+        }
+        self.results.append(entry)
+        rate = f"{entry['items_per_second']:>14,.0f}/s" if entry["items_per_second"] else ""
+        print(f"{name:<34} {best:9.4f}s {rate}", flush=True)
+        return result
+
+
+def run_suite(spec: synthetic.Spec, repeat: int) -> list[dict]:
+    from app import create_app
+    from models import db
+    from services.csv_parser import parse_daily_csv, parse_interval_csv
+    from services.ingest import ingest_usage_rows
+    from services.jobs import ingest_upload
+    from services.plan_search import PlanQuery, search_plans
+    from services.ptc_client import save_plans_to_db
+    from services.reprice_cache import get_cache
+    from services.repricer import reprice_usage
+
+    suite = Suite(repeat)
+    daily_text = synthetic.daily_csv(spec)
+    interval_text = synthetic.interval_csv(spec)
+    rows = spec.esiids * spec.days
+
+    suite.run("parse_daily_csv", lambda: parse_daily_csv(io.StringIO(daily_text)), rows)
+    suite.run("parse_interval_csv", lambda: parse_interval_csv(io.StringIO(interval_text)), rows)
+    parsed = parse_daily_csv(io.StringIO(daily_text))
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+            JOB_WORKERS = 0
+            REPRICE_WORKERS = 1
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            # Ingest and plan saves change the database, so each runs once.
+            suite.run("ingest_usage_rows", lambda: ingest_usage_rows(parsed), rows, repeat=1)
+            suite.run("ingest_usage_rows (re-upload)", lambda: ingest_usage_rows(parsed), rows, 1)
+
+            def upload(text):
+                path = os.path.join(tmp, "upload.csv")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                return ingest_upload(lambda parsed, written: None, path, "daily")
+
+            suite.run("ingest_upload (first upload)", lambda: upload(daily_text), rows, 1)
+            suite.run("ingest_upload (identical file)", lambda: upload(daily_text), rows, 1)
+            # Different bytes, same days: every row is covered by the first upload.
+            suite.run("ingest_upload (overlapping)", lambda: upload(daily_text + "\n"), rows, 1)
+            plans = synthetic.raw_plans(spec)
+            suite.run("save_plans_to_db (insert)", lambda: save_plans_to_db(plans), spec.plans, 1)
+            suite.run(
+                "save_plans_to_db (unchanged)", lambda: save_plans_to_db(plans), spec.plans, 1
+            )
+            revised = synthetic.raw_plans(spec, revision=1)
+            suite.run(
+                "save_plans_to_db (10% changed)", lambda: save_plans_to_db(revised), spec.plans, 1
+            )
+
+            meter = synthetic.esiid(0)
+            cells = spec.plans * spec.years * 12
+            suite.run("reprice_usage (top 15)", lambda: reprice_usage(meter)[:15], cells)
+            suite.run("reprice_usage (top_k=15)", lambda: reprice_usage(meter, top_k=15), cells)
+            query = PlanQuery(kwh=1500, max_cancellation_fee=200, sort="cost")
+            suite.run("search_plans", lambda: search_plans(query), spec.plans)
+            db.session.remove()
+
+            def cold_caches():
+                app.extensions.pop("dashboard_stats", None)
+                get_cache().clear()
+
+            client = app.test_client()
+            year = f"start={synthetic.START.year + spec.years - 1}-01-01"
+            routes = [
+                ("GET /", lambda: client.get("/")),
+                ("GET /usage (1 year)", lambda: client.get(f"/usage?{year}")),
+                ("POST /reprice", lambda: client.post("/reprice", data={"esiid": meter})),
+                ("GET /api/usage (1 page)", lambda: client.get("/api/usage")),
+                ("GET /api/usage/series", lambda: client.get("/api/usage/series")),
+                ("GET /api/plans (1 page)", lambda: client.get("/api/plans")),
+                ("GET /plans (search)", lambda: client.get("/plans?kwh=1500&fee_max=200")),
+                ("GET /api/reprice/portfolio", lambda: client.get("/api/reprice/portfolio")),
+            ]
+            for name, request in routes:
+                request()  # compile templates and warm the connection pool first
+                response = suite.run(name, request, setup=cold_caches)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{name} returned {response.status_code}")
+            suite.run("POST /reprice (cached)", routes[2][1])
+            etag = client.get(f"/reprice?esiid={meter}").headers["ETag"]
+            suite.run(
+                "GET /reprice (304)",
+                lambda: client.get(f"/reprice?esiid={meter}", headers={"If-None-Match": etag}),
+            )
+    return suite.results
+
+
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(before: dict, after: dict) -> None:
+    old = {r["name"]: r["seconds"] for r in before["results"]}
+    print(f"\nvs {before.get('commit')}:")
+    if before.get("spec") != after["spec"]:
+        print(f"warning: different data spec {before.get('spec')}")
+    for r in after["results"]:
+        if old.get(r["name"]):
+            was, now = old[r["name"]], r["seconds"]
+            flag = "  REGRESSION" if now / was > 1.2 else ""
+            print(f"{r['name']:<34} {was:9.4f}s -> {now:9.4f}s {now / was:6.2f}x{flag}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--esiids", type=int, default=20)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--plans", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", "-o", default="benchmark-results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against.")
+    args = parser.parse_args()
+
+    spec = synthetic.Spec(args.esiids, args.years, args.plans, args.seed)
+    report = {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "spec": spec.as_dict(),
+        "results": run_suite(spec, args.repeat),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Deterministic synthetic data for benchmarks.
+
+Everything is derived from a ``Spec`` and its seed, so two runs (or two
+commits) with the same spec see byte-identical inputs.
+"""
+
+from __future__ import annotations
+
+import io
+import math
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+
+START = date(2020, 1, 1)
+INTERVAL_HEADER = ["ESIID", "Date"] + [
+    f"{(i + 1) * 15 // 60:02d}:{(i + 1) * 15 % 60:02d}" for i in range(96)
+]
+
+
+@dataclass(frozen=True)
+class Spec:
+    esiids: int = 20
+    years: int = 2
+    plans: int = 2000
+    seed: int = 42
+
+    @property
+    def days(self) -> int:
+        return 365 * self.years
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def esiid(i: int) -> str:
+    return f"1044372{i:010d}"
+
+
+def _daily_kwh(rng: random.Random, meter: int, day: date) -> float:
+    # Seasonal load: peaks in summer, a smaller bump in winter, per-meter scale.
+    season = math.cos((day.timetuple().tm_yday - 200) / 365 * 2 * math.pi)
+    scale = 0.6 + (meter % 7) * 0.15
+    return round(scale * (30 + 18 * season + 6 * abs(season)) + rng.uniform(-5, 5), 3)
+
+
+def daily_csv(spec: Spec) -> str:
+    """A Smart Meter Texas daily export covering every ESIID and day."""
+    rng = random.Random(spec.seed)
+    out = io.StringIO()
+    out.write("Smart Meter Texas - Daily Usage Report\n\n")
+    out.write("ESIID,Date,Reading Type,Meter Reading (kWh),Actual/Estimated\n")
+    for m in range(spec.esiids):
+        meter = esiid(m)
+        for d in range(spec.days):
+            day = START + timedelta(days=d)
+            flag = "E" if rng.random() < 0.02 else "A"
+            out.write(f"{meter},{day:%m/%d/%Y},C,{_daily_kwh(rng, m, day)},{flag}\n")
+    return out.getvalue()
+
+
+def interval_csv(spec: Spec) -> str:
+    """A 15-minute interval export (96 readings per row, ~1% blank)."""
+    rng = random.Random(spec.seed + 1)
+    out = io.StringIO()
+    out.write("Smart Meter Texas - 15 Minute Interval Report\n\n")
+    out.write(",".join(INTERVAL_HEADER) + "\n")
+    for m in range(spec.esiids):
+        meter = esiid(m)
+        for d in range(spec.days):
+            day = START + timedelta(days=d)
+            readings = [
+                "" if rng.random() < 0.01 else f"{rng.uniform(0.05, 1.5):.3f}" for _ in range(96)
+            ]
+            out.write(f"{meter},{day:%m/%d/%Y}," + ",".join(readings) + "\n")
+    return out.getvalue()
+
+
+def raw_plans(spec: Spec, revision: int = 0) -> list[dict]:
+    """Power to Choose API records; about a third carry bill-credit terms.
+
+    A different ``revision`` reprices every tenth plan, to exercise updates.
+    """
+    rng = random.Random(spec.seed + 2)
+    plans = []
+    for i in range(spec.plans):
+        p1000 = rng.uniform(8, 18)
+        record = {
+            "plan_id": f"synthetic-{i}",
+            "company_name": f"Retailer {i % 90}",
+            "plan_name": f"Plan {i}",
+            "plan_type": rng.choice(["Fixed", "Variable", "Indexed"]),
+            "contract_length": rng.choice([1, 6, 12, 24, 36]),
+            "price_kwh500": round(p1000 + rng.uniform(0, 4), 1),
+            "price_kwh1000": round(p1000, 1),
+            "price_kwh2000": round(p1000 - rng.uniform(0, 2), 1),
+            "base_charge": rng.choice([0, 4.95, 9.95]),
+            "renewable_pct": rng.choice([0, 6, 100]),
+            "timeofuse": i % 25 == 0,
+        }
+        if i % 3 == 0:
+            record["special_terms"] = (
+                f"${rng.choice([50, 75, 100])} bill credit when usage is 1000 kWh or more."
+            )
+        if revision and i % 10 == 0:
+            record["price_kwh1000"] = round(record["price_kwh1000"] + 0.1 * revision, 1)
+        plans.append(record)
+    return plans
@@ -9,9 +9,52 @@ class Config:
         "DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'energy.db')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite connection tuning for several gunicorn workers on one database file
+    SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "1") != "0"
+    SQLITE_WAL = os.environ.get("SQLITE_WAL", "1") != "0"
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+    SQLITE_CACHE_MB = int(os.environ.get("SQLITE_CACHE_MB", "64"))
+    SQLITE_MMAP_MB = int(os.environ.get("SQLITE_MMAP_MB", "256"))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload
+    # Uploads are spooled to disk and parsed as a stream, so this only bounds disk use.
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_UPLOAD_MB", "256")) * 1024 * 1024
+
+    # Rows per page of the usage history table
+    USAGE_PAGE_SIZE = int(os.environ.get("USAGE_PAGE_SIZE", "100"))
+
+    # Shared, memory-mapped plan catalog snapshot (default path: next to the SQLite file)
+    PLAN_SNAPSHOT = os.environ.get("PLAN_SNAPSHOT", "1") != "0"
+    PLAN_SNAPSHOT_PATH = os.environ.get("PLAN_SNAPSHOT_PATH")
+
+    # Number of repricing results memoized per worker (0 disables the cache)
+    REPRICE_CACHE_SIZE = int(os.environ.get("REPRICE_CACHE_SIZE", "64"))
+    # Number of per-ESIID dashboard figures memoized per worker (0 disables the cache)
+    DASHBOARD_CACHE_SIZE = int(os.environ.get("DASHBOARD_CACHE_SIZE", "32"))
+    # Processes for the reprice-portfolio command (0 = one per CPU, 1 = in-process);
+    # the web API always prices in-process
+    REPRICE_WORKERS = int(os.environ.get("REPRICE_WORKERS", "0"))
 
     # Power to Choose API
     PTC_API_URL = "http://api.powertochoose.org/api/PowerToChoose/plans"
     PTC_CSV_URL = "http://www.powertochoose.org/en-us/Plan/ExportToCsv"
+    PTC_PAGE_SIZE = 200
+    PTC_MAX_PAGES = int(os.environ.get("PTC_MAX_PAGES", "500"))  # per ZIP code
+    PTC_MAX_WORKERS = int(os.environ.get("PTC_MAX_WORKERS", "8"))
+    PTC_RETRIES = 3
+    PTC_BACKOFF = 0.5  # seconds, doubled on each retry
+
+    # HTTP: gzip bodies of at least HTTP_GZIP_MIN_BYTES (level 0 disables); ETags and 304s
+    HTTP_GZIP_LEVEL = int(os.environ.get("HTTP_GZIP_LEVEL", "6"))
+    HTTP_GZIP_MIN_BYTES = int(os.environ.get("HTTP_GZIP_MIN_BYTES", "1024"))
+    HTTP_ETAGS = os.environ.get("HTTP_ETAGS", "1") != "0"
+
+    # Background jobs (uploads, plan refreshes): threads per worker; 0 runs them inline
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+    # Instrumentation: /metrics, and cProfile dumps of requests slower than PROFILE_SLOW_MS
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+    PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+    PROFILE_SLOW_MS = int(os.environ.get("PROFILE_SLOW_MS", "500"))
+    PROFILE_DIR = os.path.join(BASE_DIR, "profiles")
@@ -1,3 +1,6 @@
+import json
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
@@ -30,6 +33,138 @@ class UsageRecord(db.Model):
         }
 
 
+class DataVersion(db.Model):
+    """Monotonic change counters ("usage", "plans") shared by all workers."""
+
+    __tablename__ = "data_versions"
+
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class MonthlyUsageRollup(db.Model):
+    """Per-ESIID monthly totals derived from usage_records.
+
+    Maintained by services.rollup whenever usage records are written; it can
+    always be rebuilt from the raw daily rows.
+    """
+
+    __tablename__ = "monthly_usage"
+
+    id = db.Column(db.Integer, primary_key=True)
+    esiid = db.Column(db.String(22), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    total_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    days = db.Column(db.Integer, nullable=False, default=0)
+    estimated_days = db.Column(db.Integer, nullable=False, default=0)
+    min_kwh = db.Column(db.Float)
+    max_kwh = db.Column(db.Float)
+
+    __table_args__ = (
+        db.UniqueConstraint("esiid", "year", "month", name="uq_rollup_esiid_month"),
+    )
+
+
+class IntervalRecord(db.Model):
+    """One day of 15-minute interval readings, packed as float32 values.
+
+    ``readings`` holds INTERVALS_PER_DAY little-endian float32 values (NaN
+    where the export had a blank); see services.intervals for helpers.
+    """
+
+    __tablename__ = "interval_records"
+
+    id = db.Column(db.Integer, primary_key=True)
+    esiid = db.Column(db.String(22), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    readings = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("esiid", "date", name="uq_interval_esiid_date"),
+    )
+
+
+class Upload(db.Model):
+    """A usage export that was ingested completely, keyed by a hash of its bytes."""
+
+    __tablename__ = "uploads"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    file_type = db.Column(db.String(16), nullable=False)  # daily, interval
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("sha256", "file_type", name="uq_upload_sha256_type"),
+    )
+
+
+class UploadCoverage(db.Model):
+    """A run of consecutive days of one ESIID contained in an upload.
+
+    Written by services.uploads; every day in the run is known to be stored
+    (usage records, plus interval records for interval uploads).
+    """
+
+    __tablename__ = "upload_coverage"
+
+    id = db.Column(db.Integer, primary_key=True)
+    upload_id = db.Column(db.Integer, db.ForeignKey("uploads.id"), nullable=False)
+    file_type = db.Column(db.String(16), nullable=False)
+    esiid = db.Column(db.String(22), nullable=False, index=True)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+
+
+class Job(db.Model):
+    """A background task (upload ingest, plan refresh) and its progress.
+
+    Rows are written by services.jobs; progress counters are committed as the
+    task goes, so any worker can report on a job started by another.
+    """
+
+    __tablename__ = "jobs"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(32), nullable=False)  # upload, plans_fetch, plans_csv
+    status = db.Column(db.String(16), nullable=False, default="queued")
+    message = db.Column(db.Text)
+    rows_parsed = db.Column(db.Integer, nullable=False, default=0)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.Text)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    owner = db.Column(db.String(128))  # "host:pid" of the worker whose pool runs it
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self):
+        elapsed = None
+        if self.started_at:
+            end = self.finished_at or datetime.utcnow()
+            elapsed = (end - self.started_at).total_seconds()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "message": self.message,
+            "rows_parsed": self.rows_parsed,
+            "rows_written": self.rows_written,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": self.rows_parsed / elapsed if elapsed else None,
+            "result": json.loads(self.result) if self.result else None,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
 class ElectricityPlan(db.Model):
     """Electricity plan from Power to Choose."""
 
@@ -59,6 +194,8 @@ class ElectricityPlan(db.Model):
     renewable_pct = db.Column(db.Float)
     is_time_of_use = db.Column(db.Boolean, default=False)
     fetched_at = db.Column(db.DateTime)
+    content_hash = db.Column(db.String(40))  # sha1 of normalized fields
+    rate_curve = db.Column(db.Text)  # JSON bill curve, see services.rate_curve
 
     def to_dict(self):
         return {
@@ -83,19 +220,12 @@ class ElectricityPlan(db.Model):
     def estimate_monthly_cost(self, monthly_kwh):
         """Estimate monthly cost for a given usage in kWh.
 
-        Uses the energy_charge + base_charge + TDU components if available.
-        Falls back to interpolating from the 500/1000/2000 tier prices.
+        Evaluates the plan's piecewise-linear bill curve: the energy_charge +
+        base_charge + TDU components if available, otherwise a curve fitted
+        through the 500/1000/2000 tier prices, plus any parsed bill credits
+        and minimum-usage fees.  Returns None if the plan has no prices.
         """
-        if self.energy_charge is not None:
-            energy_cost = self.energy_charge * monthly_kwh
-            tdu_cost = (self.tdu_delivery_charge or 0) + (self.tdu_per_kwh or 0) * monthly_kwh
-            return (self.base_charge or 0) + energy_cost + tdu_cost
-
-        # Fallback: interpolate from tier prices (these are cents/kWh all-in)
-        if monthly_kwh <= 500 and self.price_kwh_500:
-            return self.price_kwh_500 * monthly_kwh / 100
-        elif monthly_kwh <= 1000 and self.price_kwh_1000:
-            return self.price_kwh_1000 * monthly_kwh / 100
-        elif self.price_kwh_2000:
-            return self.price_kwh_2000 * monthly_kwh / 100
-        return None
+        from services.rate_curve import plan_curve
+
+        curve = plan_curve(self)
+        return None if curve is None else curve.cost(monthly_kwh)
@@ -0,0 +1,322 @@
+"""Memory-mapped snapshot of the plan catalog shared by all workers.
+
+The snapshot is one file holding the numeric columns of ``electricity_plans``
+and their compiled bill curves as fixed-width arrays, plus an interned table
+of the plan's strings (company names, plan types, ...) that the string
+columns index into.  Layout::
+
+    MAGIC | uint32 header length | JSON header | arrays (64-byte aligned)
+
+The header records the "plans" data version the snapshot was built at and,
+for each array, its dtype, shape and offset.  Every worker maps the file
+read-only, so the arrays are shared through the page cache instead of each
+worker holding ORM copies of the catalog.
+
+:func:`get_catalog` returns the mapped snapshot of the current "plans"
+version.  When the version has moved on (a plan fetch or an ORM edit in any
+worker) it maps the newer file if another worker already wrote one, or
+rebuilds it from the database.  Files are replaced atomically, so mappings
+held by in-flight requests stay valid.  ``save_plan_batches`` refreshes the
+snapshot eagerly after it commits.
+
+The snapshot sits next to the SQLite file unless ``PLAN_SNAPSHOT_PATH`` is
+set; in-memory databases have none, and callers fall back to SQL.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+from flask import Flask, current_app
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from models import ElectricityPlan, db
+from services import metrics, versions
+from services.rate_curve import CurveArrays, RateCurve, plan_curve
+
+MAGIC = b"EMPLANS1"
+ALIGN = 64
+
+FLOAT_COLUMNS = (
+    "price_kwh_500",
+    "price_kwh_1000",
+    "price_kwh_2000",
+    "base_charge",
+    "energy_charge",
+    "tdu_delivery_charge",
+    "tdu_per_kwh",
+    "cancellation_fee",
+    "renewable_pct",
+)
+STRING_COLUMNS = ("plan_id", "company_name", "plan_name", "plan_type", "rate_type")
+NULL = -1  # in integer and string-index columns
+
+
+class PlanCatalog:
+    """A mapped snapshot: column arrays (read-only views) in plan id order."""
+
+    def __init__(self, version: int, arrays: dict[str, np.ndarray], buffer=None):
+        self.version = version
+        self.arrays = arrays
+        self.ids = arrays["id"]
+        self.curves = CurveArrays(
+            costs=arrays["curve_costs"],
+            slopes=arrays["curve_slopes"],
+            step_kwh=arrays["step_kwh"],
+            step_delta=arrays["step_delta"],
+        )
+        self._buffer = buffer  # the mmap, kept open while arrays reference it
+        self._offsets = arrays["string_offsets"]
+        self._data = arrays["string_data"]
+        self._strings: dict[int, str] = {}
+        self._string_ids: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, plan_ids) -> np.ndarray:
+        """Row positions of the given plan ids that exist, in id order."""
+        return np.flatnonzero(np.isin(self.ids, np.asarray(plan_ids, dtype=np.int64)))
+
+    def lookup(self, values) -> np.ndarray:
+        """String-table indexes of the given strings (unknown ones are dropped)."""
+        if self._string_ids is None:
+            count = len(self._offsets) - 1
+            self._string_ids = {self.string(i): i for i in range(count)}
+        return np.array(
+            [self._string_ids[v] for v in values if v in self._string_ids], dtype=np.int32
+        )
+
+    def distinct(self, column: str) -> list[str]:
+        """Sorted distinct non-NULL values of a string column."""
+        indexes = np.unique(self.arrays[column])
+        return sorted(self.string(int(i)) for i in indexes if i != NULL)
+
+    def string(self, index: int) -> str | None:
+        if index == NULL:
+            return None
+        if index not in self._strings:
+            lo, hi = self._offsets[index], self._offsets[index + 1]
+            self._strings[index] = self._data[lo:hi].tobytes().decode("utf-8")
+        return self._strings[index]
+
+    def row(self, i: int) -> dict:
+        """Plan ``i`` in the shape of ElectricityPlan.to_dict()."""
+        a = self.arrays
+        contract = int(a["contract_length"][i])
+        tou = int(a["is_time_of_use"][i])
+        floats = {name: _float_or_none(a[name][i]) for name in FLOAT_COLUMNS}
+        return {
+            "id": int(self.ids[i]),
+            "plan_id": self.string(int(a["plan_id"][i])),
+            "company_name": self.string(int(a["company_name"][i])),
+            "plan_name": self.string(int(a["plan_name"][i])),
+            "plan_type": self.string(int(a["plan_type"][i])),
+            "contract_length": None if contract == NULL else contract,
+            "price_kwh_500": floats["price_kwh_500"],
+            "price_kwh_1000": floats["price_kwh_1000"],
+            "price_kwh_2000": floats["price_kwh_2000"],
+            "base_charge": floats["base_charge"],
+            "energy_charge": floats["energy_charge"],
+            "tdu_delivery_charge": floats["tdu_delivery_charge"],
+            "tdu_per_kwh": floats["tdu_per_kwh"],
+            "cancellation_fee": floats["cancellation_fee"],
+            "renewable_pct": floats["renewable_pct"],
+            "is_time_of_use": None if tou == NULL else bool(tou),
+        }
+
+    def plan(self, i: int) -> ElectricityPlan:
+        """Plan ``i`` as a transient (session-less) ElectricityPlan."""
+        fields = self.row(i)
+        fields["rate_type"] = self.string(int(self.arrays["rate_type"][i]))
+        curve = self.curve(i)
+        fields["rate_curve"] = curve.to_json() if curve is not None else None
+        return ElectricityPlan(**fields)
+
+    def curve(self, i: int) -> RateCurve | None:
+        c = self.curves
+        if np.isnan(c.costs[i]).all():
+            return None
+        steps = [
+            (float(k), float(d)) for k, d in zip(c.step_kwh[i], c.step_delta[i]) if k != np.inf
+        ]
+        return RateCurve(c.costs[i].tolist(), c.slopes[i].tolist(), steps)
+
+
+def _float_or_none(value) -> float | None:
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+# ------------------------------------------------------------------
+# Building, writing and mapping snapshots
+# ------------------------------------------------------------------
+@metrics.timed(items=len)
+def build_catalog() -> PlanCatalog:
+    """Read the plan table into an in-memory (unmapped) catalog."""
+    (version,) = versions.get(versions.PLANS)
+    table = ElectricityPlan.__table__
+    rows = db.session.execute(select(table).order_by(table.c.id)).all()
+
+    interned: dict[str, int] = {}
+
+    def intern(value: str | None) -> int:
+        if value is None:
+            return NULL
+        return interned.setdefault(value, len(interned))
+
+    arrays: dict[str, np.ndarray] = {"id": np.array([r.id for r in rows], dtype=np.int64)}
+    for name in FLOAT_COLUMNS:
+        arrays[name] = np.array(
+            [np.nan if r._mapping[name] is None else r._mapping[name] for r in rows],
+            dtype=np.float64,
+        )
+    arrays["contract_length"] = np.array(
+        [NULL if r.contract_length is None else r.contract_length for r in rows], dtype=np.int32
+    )
+    arrays["is_time_of_use"] = np.array(
+        [NULL if r.is_time_of_use is None else int(r.is_time_of_use) for r in rows],
+        dtype=np.int8,
+    )
+    for name in STRING_COLUMNS:
+        arrays[name] = np.array([intern(r._mapping[name]) for r in rows], dtype=np.int32)
+
+    curves = CurveArrays.from_curves([plan_curve(r) for r in rows])
+    arrays["curve_costs"] = curves.costs
+    arrays["curve_slopes"] = curves.slopes
+    arrays["step_kwh"] = curves.step_kwh
+    arrays["step_delta"] = curves.step_delta
+
+    encoded = [s.encode("utf-8") for s in interned]
+    arrays["string_offsets"] = np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64)
+    arrays["string_data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return PlanCatalog(version, arrays)
+
+
+def write_snapshot(catalog: PlanCatalog, path: str) -> None:
+    """Write ``catalog`` to ``path`` atomically (temp file + rename)."""
+    header = {"version": catalog.version, "count": len(catalog), "arrays": {}}
+    offset = 0
+    for name, array in catalog.arrays.items():
+        header["arrays"][name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset = _aligned(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for name, array in catalog.arrays.items():
+            f.seek(start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def open_snapshot(path: str) -> PlanCatalog | None:
+    """Map the snapshot at ``path``; None if it is missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if buffer[: len(MAGIC)] != MAGIC:
+            raise ValueError("not a plan catalog snapshot")
+        (length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        header_end = len(MAGIC) + 4 + length
+        header = json.loads(buffer[len(MAGIC) + 4 : header_end])
+        start = _aligned(header_end)
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=start + spec["offset"]
+            ).reshape(spec["shape"])
+        return PlanCatalog(header["version"], arrays, buffer)
+    except (ValueError, KeyError, struct.error):
+        buffer.close()
+        return None
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+# ------------------------------------------------------------------
+# Per-worker access
+# ------------------------------------------------------------------
+@dataclass
+class _Snapshot:
+    path: str
+    catalog: PlanCatalog | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def init_app(app: Flask) -> None:
+    """Map (or build) the snapshot at worker startup."""
+    path = snapshot_path(app.config)
+    if not path:
+        return
+    app.extensions["plan_catalog"] = _Snapshot(path)
+    with app.app_context():
+        get_catalog()
+
+
+def snapshot_path(config) -> str | None:
+    """Where the snapshot lives: PLAN_SNAPSHOT_PATH, else beside the SQLite file."""
+    if not config.get("PLAN_SNAPSHOT", True):
+        return None
+    if config.get("PLAN_SNAPSHOT_PATH"):
+        return config["PLAN_SNAPSHOT_PATH"]
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    database = url.database or ""
+    if url.get_backend_name() != "sqlite" or database in ("", ":memory:"):
+        return None
+    if url.query.get("mode") == "memory":
+        return None
+    return f"{database}.plans"
+
+
+def get_catalog() -> PlanCatalog | None:
+    """The current app's mapped catalog at the latest plans version, or None."""
+    snapshot: _Snapshot | None = current_app.extensions.get("plan_catalog")
+    if snapshot is None:
+        return None
+    (version,) = versions.get(versions.PLANS)
+    catalog = snapshot.catalog
+    if catalog is not None and catalog.version >= version:
+        return catalog
+
+    with snapshot.lock:
+        if snapshot.catalog is not None and snapshot.catalog.version >= version:
+            return snapshot.catalog
+        catalog = open_snapshot(snapshot.path)
+        if catalog is None or catalog.version < version:
+            write_snapshot(build_catalog(), snapshot.path)
+            catalog = open_snapshot(snapshot.path)
+        snapshot.catalog = catalog
+    return catalog
+
+
+def refresh_catalog() -> None:
+    """Rewrite the snapshot from the committed plan table (after plan writes)."""
+    snapshot: _Snapshot | None = current_app.extensions.get("plan_catalog")
+    if snapshot is None:
+        return
+    with snapshot.lock:
+        write_snapshot(build_catalog(), snapshot.path)
+        snapshot.catalog = open_snapshot(snapshot.path)
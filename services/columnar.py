@@ -0,0 +1,147 @@
+"""Parquet / Arrow IPC export of usage, monthly rollups and repricing results.
+
+Data is read in column batches through a server-side cursor and written
+batch by batch, so exports never build one dict per row.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import BinaryIO, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from sqlalchemy import select
+
+from models import ElectricityPlan, MonthlyUsageRollup, db
+from services import export, metrics
+
+FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+DATASETS = ("usage", "monthly", "reprice")
+
+USAGE_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("esiid", pa.string()),
+        ("date", pa.date32()),
+        ("usage_kwh", pa.float64()),
+        ("reading_type", pa.string()),
+        ("actual_estimated", pa.string()),
+    ]
+)
+
+MONTHLY_SCHEMA = pa.schema(
+    [
+        ("esiid", pa.string()),
+        ("year", pa.int32()),
+        ("month", pa.int32()),
+        ("total_kwh", pa.float64()),
+        ("days", pa.int32()),
+        ("estimated_days", pa.int32()),
+        ("min_kwh", pa.float64()),
+        ("max_kwh", pa.float64()),
+    ]
+)
+
+REPRICE_SCHEMA = pa.schema(
+    [
+        ("rank", pa.int32()),
+        ("plan_id", pa.string()),
+        ("company_name", pa.string()),
+        ("plan_name", pa.string()),
+        ("total_cost", pa.float64()),
+        ("year", pa.int32()),
+        ("month", pa.int32()),
+        ("kwh", pa.float64()),
+        ("estimated_cost", pa.float64()),
+    ]
+)
+
+
+@metrics.timed(items=int)
+def export_dataset(
+    dataset: str,
+    sink: BinaryIO,
+    fmt: str = "parquet",
+    esiid: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+) -> int:
+    """Write ``dataset`` to ``sink`` in ``fmt``; returns the number of rows."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    if dataset == "usage":
+        schema, batches = USAGE_SCHEMA, _usage_batches(esiid, start, end)
+    elif dataset == "monthly":
+        schema, batches = MONTHLY_SCHEMA, _monthly_batches(esiid, start, end)
+    elif dataset == "reprice":
+        if not esiid:
+            raise ValueError("The reprice export requires an esiid.")
+        schema, batches = REPRICE_SCHEMA, _reprice_batches(esiid, start, end)
+    else:
+        raise ValueError(f"Unknown dataset: {dataset!r}")
+    return _write(batches, schema, sink, fmt)
+
+
+def _write(batches: Iterator[pd.DataFrame], schema: pa.Schema, sink: BinaryIO, fmt: str) -> int:
+    rows = 0
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for frame in batches:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            rows += len(frame)
+    return rows
+
+
+def _column_batches(stmt, columns: list[str]) -> Iterator[pd.DataFrame]:
+    result = db.session.execute(stmt.execution_options(yield_per=export.STREAM_BATCH))
+    for partition in result.partitions():
+        yield pd.DataFrame(dict(zip(columns, zip(*partition))), columns=columns)
+
+
+def _usage_batches(esiid, start, end) -> Iterator[pd.DataFrame]:
+    return _column_batches(export.usage_query(esiid, start, end), USAGE_SCHEMA.names)
+
+
+def _monthly_batches(esiid, start, end) -> Iterator[pd.DataFrame]:
+    roll_index = MonthlyUsageRollup.year * 12 + MonthlyUsageRollup.month
+    stmt = select(*[getattr(MonthlyUsageRollup, c) for c in MONTHLY_SCHEMA.names]).order_by(
+        MonthlyUsageRollup.esiid, MonthlyUsageRollup.year, MonthlyUsageRollup.month
+    )
+    if esiid:
+        stmt = stmt.where(MonthlyUsageRollup.esiid == esiid)
+    if start:
+        stmt = stmt.where(roll_index >= start.year * 12 + start.month)
+    if end:
+        stmt = stmt.where(roll_index <= end.year * 12 + end.month)
+    return _column_batches(stmt, MONTHLY_SCHEMA.names)
+
+
+def _reprice_batches(esiid, start, end) -> Iterator[pd.DataFrame]:
+    from services.repricer import reprice_usage
+
+    results = reprice_usage(esiid, start=start, end=end)
+    if not results:
+        return
+    frame = results.cost_frame()
+    labels = pd.DataFrame(
+        db.session.execute(
+            select(
+                ElectricityPlan.id,
+                ElectricityPlan.plan_id,
+                ElectricityPlan.company_name,
+                ElectricityPlan.plan_name,
+            )
+        ).all(),
+        columns=["plan_db_id", "plan_id", "company_name", "plan_name"],
+    )
+    frame = frame.merge(labels, on="plan_db_id", how="left", sort=False)
+    yield frame[REPRICE_SCHEMA.names]
@@ -6,7 +6,15 @@ import csv
 import io
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import TextIO
+from itertools import chain
+from typing import Iterator, TextIO
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from services import metrics
 
 
 @dataclass
@@ -18,122 +26,310 @@ class ParsedUsageRow:
     actual_estimated: str  # A or E
 
 
+INTERVALS_PER_DAY = 96
+
+
+@dataclass
+class ParsedIntervalDay:
+    esiid: str
+    date: date
+    usage_kwh: float  # sum of all readings in the row
+    readings: np.ndarray  # float32[INTERVALS_PER_DAY], NaN where blank
+
+    def to_usage_row(self) -> ParsedUsageRow:
+        return ParsedUsageRow(
+            esiid=self.esiid,
+            date=self.date,
+            usage_kwh=self.usage_kwh,
+            reading_type="C",
+            actual_estimated="A",
+        )
+
+
+@metrics.timed(items=len)
 def parse_daily_csv(file: TextIO) -> list[ParsedUsageRow]:
-    """Parse a Smart Meter Texas *Daily* usage CSV.
+    """Parse a Smart Meter Texas *Daily* usage CSV into a list.
+
+    Convenience wrapper around :func:`iter_daily_csv` for small files.
+    """
+    return list(iter_daily_csv(file))
+
+
+def iter_daily_csv(file: TextIO) -> Iterator[ParsedUsageRow]:
+    """Stream rows from a Smart Meter Texas *Daily* usage CSV.
 
     Expected columns (order may vary):
         ESIID, Date, Reading Type, Meter Reading (kWh), Actual/Estimated
 
     The file may include header metadata lines before the actual CSV header.
     We detect the header row by looking for a row that contains 'ESIID'.
+    The file is read line by line, so memory use does not grow with its size.
     """
-    content = file.read()
-    lines = content.splitlines()
-
-    # Find the header row
-    header_idx = None
-    for i, line in enumerate(lines):
-        if "ESIID" in line.upper():
-            header_idx = i
-            break
-
-    if header_idx is None:
+    header_line = _skip_to_header(file)
+    if header_line is None:
         raise ValueError(
             "Could not find header row containing 'ESIID'. "
             "Please upload a daily usage CSV from Smart Meter Texas."
         )
 
-    csv_text = "\n".join(lines[header_idx:])
-    reader = csv.DictReader(io.StringIO(csv_text))
+    reader = csv.reader(chain([header_line], file))
+    header = [h.strip().upper() for h in next(reader)]
+
+    esiid_idx = _column_index(header, ["ESIID", "ESI ID", "ELECTRIC SERVICE IDENTIFIER"])
+    date_idx = _column_index(header, ["DATE", "READ DATE", "USAGE DATE"])
+    kwh_idx = _column_index(
+        header, ["METER READING (KWH)", "METER READING", "USAGE (KWH)", "KWH", "USAGE_KWH"]
+    )
+    type_idx = _column_index(header, ["READING TYPE", "TYPE"], required=False)
+    ae_idx = _column_index(header, ["ACTUAL/ESTIMATED", "ACTUAL_ESTIMATED"], required=False)
 
-    # Normalize column names: strip whitespace and lowercase
-    rows: list[ParsedUsageRow] = []
+    parse_date = _DateParser()
     for raw_row in reader:
-        row = {k.strip().upper(): v.strip() for k, v in raw_row.items() if k}
-        esiid = _get_field(row, ["ESIID", "ESI ID", "ELECTRIC SERVICE IDENTIFIER"])
-        date_str = _get_field(row, ["DATE", "READ DATE", "USAGE DATE"])
-        kwh_str = _get_field(
-            row, ["METER READING (KWH)", "METER READING", "USAGE (KWH)", "KWH", "USAGE_KWH"]
-        )
-        reading_type = _get_field(row, ["READING TYPE", "TYPE"], default="C")
-        actual_est = _get_field(row, ["ACTUAL/ESTIMATED", "ACTUAL_ESTIMATED"], default="A")
-
-        parsed_date = _parse_date(date_str)
-        usage_kwh = float(kwh_str)
-
-        rows.append(
-            ParsedUsageRow(
-                esiid=esiid,
-                date=parsed_date,
-                usage_kwh=usage_kwh,
-                reading_type=reading_type[0].upper() if reading_type else "C",
-                actual_estimated=actual_est[0].upper() if actual_est else "A",
-            )
-        )
+        if not raw_row:
+            continue
+        reading_type = _cell(raw_row, type_idx)
+        actual_est = _cell(raw_row, ae_idx)
 
-    return rows
+        yield ParsedUsageRow(
+            esiid=_cell(raw_row, esiid_idx),
+            date=parse_date(_cell(raw_row, date_idx)),
+            usage_kwh=float(_cell(raw_row, kwh_idx)),
+            reading_type=reading_type[0].upper() if reading_type else "C",
+            actual_estimated=actual_est[0].upper() if actual_est else "A",
+        )
 
 
+@metrics.timed(items=len)
 def parse_interval_csv(file: TextIO) -> list[ParsedUsageRow]:
     """Parse a Smart Meter Texas 15-minute interval CSV into daily totals.
 
+    Convenience wrapper around :func:`iter_interval_csv` for small files.
+    """
+    return list(iter_interval_csv(file))
+
+
+def iter_interval_csv(file: TextIO, block_chars: int = 1 << 23) -> Iterator[ParsedUsageRow]:
+    """Stream daily totals from a Smart Meter Texas 15-minute interval CSV.
+
     Interval CSVs have columns: ESIID, Date, then 96 interval readings
     (one per 15-minute period). We sum them to get daily kWh.
     """
-    content = file.read()
-    lines = content.splitlines()
+    for esiids, dates, totals, _ in _iter_interval_chunks(file, block_chars):
+        yield from [
+            ParsedUsageRow(esiid, day, round(total, 3), "C", "A")
+            for esiid, day, total in zip(esiids, dates, totals)
+        ]
 
-    header_idx = None
-    for i, line in enumerate(lines):
-        if "ESIID" in line.upper():
-            header_idx = i
-            break
 
-    if header_idx is None:
+def iter_interval_days(file: TextIO, block_chars: int = 1 << 23) -> Iterator[ParsedIntervalDay]:
+    """Stream per-day interval readings from a 15-minute interval CSV.
+
+    Like :func:`iter_interval_csv`, but each day also carries its readings
+    packed into a float32 array of INTERVALS_PER_DAY values (NaN where blank,
+    padded or trimmed if the export has a different number of columns).
+    """
+    for esiids, dates, totals, readings in _iter_interval_chunks(file, block_chars):
+        packed = _fit_intervals(readings)
+        yield from [
+            ParsedIntervalDay(esiid, day, round(total, 3), row)
+            for esiid, day, total, row in zip(esiids, dates, totals, packed)
+        ]
+
+
+def _iter_interval_chunks(file: TextIO, block_chars: int):
+    """Yield (esiids, dates, daily totals, reading matrix) per block of rows.
+
+    The file is read in blocks of about ``block_chars`` characters, cut at
+    a line end.  A block is parsed with pyarrow's CSV reader when every row
+    has the width of the first data row and every reading is a plain
+    number; otherwise (ragged rows, padded or malformed values) the block
+    goes through :func:`_parse_interval_rows` row by row.  Both give the
+    same result: rows with fewer than three fields are skipped, every cell
+    after the date is a reading, blank readings are NaN in the matrix and
+    count as zero in the totals, which are summed left to right, and a row
+    without an ESIID or date raises ValueError.
+    """
+    header_line = _skip_to_header(file)
+    if header_line is None:
         raise ValueError("Could not find header row containing 'ESIID'.")
 
-    csv_text = "\n".join(lines[header_idx:])
-    reader = csv.reader(io.StringIO(csv_text))
-    header = next(reader)
+    header = next(csv.reader([header_line]))
+    parse_date = _DateParser()
+    dates: dict[str, date] = {}
+    n_cols = None
+    while True:
+        block = file.read(block_chars)
+        if not block:
+            return
+        if not block.endswith("\n"):
+            block += file.readline()
+        if n_cols is None:
+            first = next((r for r in csv.reader(io.StringIO(block)) if r), [])
+            n_cols = len(first) if len(first) >= 3 else max(len(header), 3)
+        chunk = _read_interval_block(block, n_cols)
+        if chunk is None:
+            chunk = _parse_interval_rows(block)
+        esiids, date_strs, readings = chunk
+        if "" in esiids or "" in date_strs:
+            row = next(i for i, (e, d) in enumerate(zip(esiids, date_strs)) if not e or not d)
+            raise ValueError(f"Interval row has no ESIID or date: {row + 1}")
 
-    rows: list[ParsedUsageRow] = []
-    for raw_row in reader:
+        for date_str in set(date_strs).difference(dates):
+            dates[date_str] = parse_date(date_str)
+
+        # Column by column, so each total adds its readings in file order.
+        totals = np.zeros(readings.shape[0])
+        for column in readings.T:
+            totals += np.where(np.isnan(column), 0.0, column)
+        yield esiids, [dates[d] for d in date_strs], totals.tolist(), readings
+
+
+def _read_interval_block(block: str, n_cols: int):
+    """Parse a regular block with pyarrow; None if it needs the row-by-row path."""
+    ragged = False
+
+    def on_invalid_row(row) -> str:
+        nonlocal ragged
+        ragged = ragged or row.actual_columns >= 3
+        return "skip"
+
+    names = [str(i) for i in range(n_cols)]
+    try:
+        table = pa_csv.read_csv(
+            io.BytesIO(block.encode("utf-8")),
+            read_options=pa_csv.ReadOptions(column_names=names),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=on_invalid_row),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={
+                    name: pa.float64() if i >= 2 else pa.string() for i, name in enumerate(names)
+                },
+                null_values=[""],
+                strings_can_be_null=True,
+            ),
+        )
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    if ragged:
+        return None
+
+    readings = np.empty((table.num_rows, n_cols - 2), order="F")
+    for i in range(2, n_cols):
+        readings[:, i - 2] = table.column(i).to_numpy()
+    return _dictionary_strings(table.column(0)), _dictionary_strings(table.column(1)), readings
+
+
+def _dictionary_strings(column) -> list[str]:
+    """A string column, stripped, as a list; each distinct value is one object."""
+    encoded = pc.dictionary_encode(pc.utf8_trim_whitespace(column.fill_null(""))).combine_chunks()
+    values = np.array(encoded.dictionary.to_pylist(), dtype=object)
+    return values[encoded.indices.to_numpy()].tolist()
+
+
+def _parse_interval_rows(block: str):
+    """Parse a block with csv.reader and float(), one row at a time."""
+    esiids: list[str] = []
+    date_strs: list[str] = []
+    rows: list[list[float]] = []
+    for raw_row in csv.reader(io.StringIO(block)):
         if len(raw_row) < 3:
             continue
-        esiid = raw_row[0].strip()
-        date_str = raw_row[1].strip()
-        # Columns 2..97 (or onward) are the 96 interval readings
-        intervals = raw_row[2:]
-        daily_kwh = sum(float(v) for v in intervals if v.strip())
-        parsed_date = _parse_date(date_str)
-
-        rows.append(
-            ParsedUsageRow(
-                esiid=esiid,
-                date=parsed_date,
-                usage_kwh=round(daily_kwh, 3),
-                reading_type="C",
-                actual_estimated="A",
-            )
-        )
+        esiids.append(raw_row[0].strip())
+        date_strs.append(raw_row[1].strip())
+        rows.append([float(v) if v.strip() else np.nan for v in raw_row[2:]])
+    readings = np.full((len(rows), max(map(len, rows), default=0)), np.nan)
+    for i, values in enumerate(rows):
+        readings[i, : len(values)] = values
+    return esiids, date_strs, readings
+
+
+def _fit_intervals(readings: np.ndarray) -> np.ndarray:
+    """Pad or trim a (rows, n) reading matrix to INTERVALS_PER_DAY float32 columns."""
+    out = np.full((readings.shape[0], INTERVALS_PER_DAY), np.nan, dtype=np.float32)
+    width = min(readings.shape[1], INTERVALS_PER_DAY)
+    out[:, :width] = readings[:, :width]
+    return out
 
-    return rows
 
+def _skip_to_header(file: TextIO) -> str | None:
+    """Consume metadata lines up to and including the 'ESIID' header row.
 
-def _get_field(row: dict, candidates: list[str], default: str | None = None) -> str:
+    Returns the header line, or None if the file has no such row.  The file
+    is left positioned at the first data row.
+    """
+    for line in file:
+        if "ESIID" in line.upper():
+            return line
+    return None
+
+
+def _column_index(header: list[str], candidates: list[str], required: bool = True) -> int | None:
     for key in candidates:
-        if key in row:
-            return row[key]
-    if default is not None:
-        return default
+        if key in header:
+            return header.index(key)
+    if not required:
+        return None
     raise ValueError(f"Missing required column. Expected one of: {candidates}")
 
 
+def _cell(row: list[str], idx: int | None) -> str:
+    if idx is None or idx >= len(row):
+        return ""
+    return row[idx].strip()
+
+
+_DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d", "%m-%d-%Y", "%m/%d/%y")
+
+
 def _parse_date(date_str: str) -> date:
     """Try common date formats from SMT exports."""
-    for fmt in ("%m/%d/%Y", "%Y-%m-%d", "%m-%d-%Y", "%m/%d/%y"):
+    return datetime.strptime(date_str, _detect_date_format(date_str)).date()
+
+
+def _detect_date_format(date_str: str) -> str:
+    for fmt in _DATE_FORMATS:
         try:
-            return datetime.strptime(date_str, fmt).date()
+            datetime.strptime(date_str, fmt)
+            return fmt
         except ValueError:
             continue
     raise ValueError(f"Unable to parse date: {date_str!r}")
+
+
+class _DateParser:
+    """Parse dates using the format detected from the first value seen.
+
+    An export uses one date format throughout, so detection runs once per
+    file; a value that does not match triggers re-detection.
+    """
+
+    def __init__(self) -> None:
+        self._fmt: str | None = None
+
+    def __call__(self, date_str: str) -> date:
+        if self._fmt == "%m/%d/%Y":
+            # strptime is slow; accept exactly what it would for this format.
+            month, _, rest = date_str.partition("/")
+            day, _, year = rest.partition("/")
+            if (
+                0 < len(month) <= 2
+                and 0 < len(day) <= 2
+                and len(year) == 4
+                and (month + day + year).isascii()
+                and (month + day + year).isdigit()
+            ):
+                try:
+                    return date(int(year), int(month), int(day))
+                except ValueError:
+                    pass
+        elif self._fmt == "%Y-%m-%d":
+            try:
+                return date.fromisoformat(date_str)
+            except ValueError:
+                pass
+        elif self._fmt is not None:
+            try:
+                return datetime.strptime(date_str, self._fmt).date()
+            except ValueError:
+                pass
+        self._fmt = _detect_date_format(date_str)
+        return datetime.strptime(date_str, self._fmt).date()
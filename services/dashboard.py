@@ -0,0 +1,86 @@
+"""Dashboard statistics, cached per process and keyed on data versions."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import ElectricityPlan, MonthlyUsageRollup, UsageRecord, db
+from services import metrics, rollup, versions
+from services.cache import LRUCache
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    total_records: int
+    first_date: date | None
+    last_date: date | None
+    avg_daily_kwh: float
+    plan_count: int
+    esiids: tuple[str, ...]
+    monthly: tuple[rollup.MonthlyUsage, ...]
+
+    @property
+    def date_range(self) -> str:
+        if self.first_date and self.last_date:
+            return f"{self.first_date} to {self.last_date}"
+        return "No data"
+
+
+@metrics.timed()
+def get_dashboard_stats(esiid: str | None = None) -> DashboardStats:
+    """Dashboard figures for one ESIID, or all of them when esiid is None.
+
+    Each worker keeps the last computed figures for the most recently
+    viewed ESIIDs (``DASHBOARD_CACHE_SIZE``) and reuses them until the usage
+    or plan version changes, so a page view normally costs one small
+    version lookup.  The bound keeps arbitrary ``?esiid=`` values from
+    growing the cache.
+    """
+    key = versions.get(versions.USAGE, versions.PLANS)
+    cache = _cache()
+    hit = cache.get(esiid)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+
+    stats = _compute(esiid)
+    cache.put(esiid, (key, stats))
+    return stats
+
+
+def _cache() -> LRUCache:
+    ext = current_app.extensions
+    if "dashboard_stats" not in ext:
+        ext["dashboard_stats"] = LRUCache(current_app.config.get("DASHBOARD_CACHE_SIZE", 32))
+    return ext["dashboard_stats"]
+
+
+def _compute(esiid: str | None) -> DashboardStats:
+    monthly = tuple(rollup.monthly_totals(esiid))
+    total_records = sum(m.days for m in monthly)
+    total_kwh = sum(m.total_kwh for m in monthly)
+
+    bounds = select(func.min(UsageRecord.date), func.max(UsageRecord.date))
+    if esiid:
+        bounds = bounds.where(UsageRecord.esiid == esiid)
+    first_date, last_date = db.session.execute(bounds).one()
+
+    esiids = tuple(
+        db.session.execute(
+            select(MonthlyUsageRollup.esiid).distinct().order_by(MonthlyUsageRollup.esiid)
+        ).scalars()
+    )
+    plan_count = db.session.execute(select(func.count(ElectricityPlan.id))).scalar_one()
+
+    return DashboardStats(
+        total_records=total_records,
+        first_date=first_date,
+        last_date=last_date,
+        avg_daily_kwh=round(total_kwh / total_records, 1) if total_records else 0.0,
+        plan_count=plan_count,
+        esiids=esiids,
+        monthly=monthly,
+    )
@@ -0,0 +1,138 @@
+"""SQLite tuning for multi-worker deployments and the single-writer path.
+
+``init_app`` sets up every new SQLite connection with:
+
+* WAL journaling, so readers see the last committed state and never wait
+  for a writer (and writers never wait for readers);
+* a busy timeout, so a writer queues behind another writer instead of
+  failing with "database is locked";
+* ``synchronous=NORMAL`` (safe with WAL), a larger page cache and mmap'd
+  reads.
+
+In-memory databases (tests) are left alone.  It also lets SQLAlchemy,
+rather than the sqlite3 module, emit ``BEGIN``.
+Transactions that write call :func:`begin_write` first, which starts them
+with ``BEGIN IMMEDIATE``: the write lock is taken up front, so concurrent
+writers in any process are serialized by the busy timeout.  A deferred
+transaction that reads and then writes could otherwise fail outright when
+another process committed in between.  Bulk writers commit per chunk, so
+the lock is only ever held for one chunk.
+"""
+
+from __future__ import annotations
+
+from flask import Flask
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import db
+
+WRITE_OPTION = "sqlite_begin_immediate"
+_SYNCHRONOUS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def init_app(app: Flask) -> None:
+    if not app.config.get("SQLITE_TUNING", True):
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite" or _in_memory(engine.url):
+        return
+
+    pragmas = _pragmas(app.config)
+
+    def on_connect(dbapi_connection, connection_record) -> None:
+        # Let SQLAlchemy emit BEGIN itself (see _on_begin); the driver's own
+        # implicit transactions cannot be made IMMEDIATE.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "begin", _on_begin)
+    # Connections opened before the listeners existed would miss the pragmas.
+    engine.dispose()
+
+
+def begin_write(session: Session | None = None) -> None:
+    """Start the session's next transaction as a writer (BEGIN IMMEDIATE).
+
+    Call it before the first statement of a transaction that will write.
+    Inside a transaction that has already begun it does nothing.
+    """
+    session = session or db.session()
+    if not session.in_transaction():
+        session.connection(execution_options={WRITE_OPTION: True})
+
+
+def add_missing_columns() -> list[str]:
+    """Add model columns that an existing table lacks; returns "table.column" names.
+
+    ``db.create_all()`` creates missing tables but never alters existing
+    ones, so a database created before a column was added to a model (e.g.
+    electricity_plans.content_hash and rate_curve) is upgraded here with
+    ``ALTER TABLE ... ADD COLUMN``.  Existing rows read the new column as
+    NULL.  Safe to run on every start: the write lock is only taken when
+    something is missing, and the tables are checked again under it, so
+    concurrent workers add each column once.
+    """
+    with db.engine.connect() as conn:
+        if not _missing_columns(conn):
+            return []
+    added = []
+    with db.engine.connect() as conn:
+        conn = conn.execution_options(**{WRITE_OPTION: True})
+        with conn.begin():
+            for table, column in _missing_columns(conn):
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(
+                        f"Cannot add NOT NULL column {table.name}.{column.name} "
+                        "to an existing table"
+                    )
+                ddl_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl_type}'
+                )
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _missing_columns(conn) -> list:
+    inspector = inspect(conn)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        missing += [(table, c) for c in table.columns if c.name not in existing]
+    return missing
+
+
+def _on_begin(conn) -> None:
+    immediate = conn.get_execution_options().get(WRITE_OPTION)
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
+
+
+def _in_memory(url) -> bool:
+    # One shared connection and no other processes: nothing to tune, and
+    # explicit BEGINs from interleaved sessions would collide on it.
+    database = url.database or ""
+    return database in ("", ":memory:") or url.query.get("mode") == "memory"
+
+
+def _pragmas(config) -> list[str]:
+    synchronous = str(config.get("SQLITE_SYNCHRONOUS", "NORMAL")).upper()
+    if synchronous not in _SYNCHRONOUS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {sorted(_SYNCHRONOUS)}")
+    pragmas = [f"PRAGMA busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT_MS', 30_000))}"]
+    if config.get("SQLITE_WAL", True):
+        pragmas.append("PRAGMA journal_mode = WAL")
+    pragmas += [
+        f"PRAGMA synchronous = {synchronous}",
+        f"PRAGMA cache_size = -{int(config.get('SQLITE_CACHE_MB', 64)) * 1024}",
+        f"PRAGMA mmap_size = {int(config.get('SQLITE_MMAP_MB', 256)) * 1024 * 1024}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    return pragmas
@@ -0,0 +1,174 @@
+"""Keyset-paginated and streaming reads of usage records and plans.
+
+Rows are read as plain column tuples (no ORM objects) and converted to the
+same dict shape as UsageRecord.to_dict() / ElectricityPlan.to_dict().  Plans
+are served from the shared catalog snapshot (services.catalog) when there is
+one.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date
+from typing import Iterator
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+
+from models import ElectricityPlan, UsageRecord, db
+from services import metrics
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10_000
+STREAM_BATCH = 2000
+
+USAGE_COLUMNS = [
+    UsageRecord.id,
+    UsageRecord.esiid,
+    UsageRecord.date,
+    UsageRecord.usage_kwh,
+    UsageRecord.reading_type,
+    UsageRecord.actual_estimated,
+]
+
+PLAN_COLUMNS = [
+    ElectricityPlan.id,
+    ElectricityPlan.plan_id,
+    ElectricityPlan.company_name,
+    ElectricityPlan.plan_name,
+    ElectricityPlan.plan_type,
+    ElectricityPlan.contract_length,
+    ElectricityPlan.price_kwh_500,
+    ElectricityPlan.price_kwh_1000,
+    ElectricityPlan.price_kwh_2000,
+    ElectricityPlan.base_charge,
+    ElectricityPlan.energy_charge,
+    ElectricityPlan.tdu_delivery_charge,
+    ElectricityPlan.tdu_per_kwh,
+    ElectricityPlan.cancellation_fee,
+    ElectricityPlan.renewable_pct,
+    ElectricityPlan.is_time_of_use,
+]
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def usage_query(
+    esiid: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    after: str | None = None,
+):
+    """Usage rows ordered by (esiid, date), optionally after a page cursor."""
+    stmt = select(*USAGE_COLUMNS).order_by(UsageRecord.esiid, UsageRecord.date)
+    if esiid:
+        stmt = stmt.where(UsageRecord.esiid == esiid)
+    if start:
+        stmt = stmt.where(UsageRecord.date >= start)
+    if end:
+        stmt = stmt.where(UsageRecord.date <= end)
+    if after:
+        try:
+            last_esiid, last_date = decode_cursor(after)
+            last_date = date.fromisoformat(last_date)
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+        stmt = stmt.where(
+            or_(
+                UsageRecord.esiid > last_esiid,
+                and_(UsageRecord.esiid == last_esiid, UsageRecord.date > last_date),
+            )
+        )
+    return stmt
+
+
+def plan_query(after: str | None = None):
+    """Plan rows ordered by id, optionally after a page cursor."""
+    stmt = select(*PLAN_COLUMNS).order_by(ElectricityPlan.id)
+    if after:
+        stmt = stmt.where(ElectricityPlan.id > _plan_cursor_id(after))
+    return stmt
+
+
+def catalog_positions(catalog, after: str | None = None) -> range:
+    """Row positions of the plan catalog snapshot after a page cursor.
+
+    The snapshot is in id order, so this is the same page sequence as
+    :func:`plan_query`.
+    """
+    start = 0
+    if after:
+        start = int(np.searchsorted(catalog.ids, _plan_cursor_id(after), side="right"))
+    return range(start, len(catalog))
+
+
+def _plan_cursor_id(after: str) -> int:
+    try:
+        (last_id,) = decode_cursor(after)
+        return int(last_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def usage_row_dict(row) -> dict:
+    d = dict(row._mapping)
+    d["date"] = d["date"].isoformat()
+    return d
+
+
+def plan_row_dict(row) -> dict:
+    return dict(row._mapping)
+
+
+@metrics.timed(items=lambda page: len(page["data"]))
+def fetch_page(stmt, to_dict, cursor_of, limit: int) -> dict:
+    """Run ``stmt`` for one page; ``next_cursor`` is None on the last page."""
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    rows = db.session.execute(stmt.limit(limit + 1)).all()
+    next_cursor = encode_cursor(*cursor_of(rows[limit - 1])) if len(rows) > limit else None
+    return {"data": [to_dict(r) for r in rows[:limit]], "next_cursor": next_cursor}
+
+
+@metrics.timed(items=lambda page: len(page["data"]))
+def fetch_catalog_page(catalog, positions: range, limit: int) -> dict:
+    """One page of plans read from the catalog snapshot, like :func:`fetch_page`."""
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    page = positions[:limit]
+    next_cursor = None
+    if len(positions) > limit:
+        next_cursor = encode_cursor(int(catalog.ids[page[-1]]))
+    return {"data": [catalog.row(i) for i in page], "next_cursor": next_cursor}
+
+
+def stream_catalog_ndjson(catalog, positions: range) -> Iterator[str]:
+    """Yield one JSON line per plan of the catalog snapshot."""
+    for start in range(0, len(positions), STREAM_BATCH):
+        batch = positions[start : start + STREAM_BATCH]
+        yield "".join(json.dumps(catalog.row(i)) + "\n" for i in batch)
+
+
+def stream_ndjson(stmt, to_dict) -> Iterator[str]:
+    """Yield one JSON line per row, reading through a server-side cursor."""
+    result = db.session.execute(stmt.execution_options(yield_per=STREAM_BATCH))
+    for partition in result.partitions():
+        yield "".join(json.dumps(to_dict(r)) + "\n" for r in partition)
+
+
+def usage_cursor(row) -> tuple:
+    return row.esiid, row.date
+
+
+def plan_cursor(row) -> tuple:
+    return (row.id,)
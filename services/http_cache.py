@@ -0,0 +1,143 @@
+"""Response compression and ETag revalidation.
+
+``init_app`` adds an after-request hook for buffered JSON, HTML and text
+responses to GET requests.  Each one gets a strong ETag (a hash of the
+body, unless the view already set one), a matching ``If-None-Match`` is
+answered with an empty 304 Not Modified, and the body is gzip-compressed
+for clients that accept it.  Compression is deterministic (no timestamp
+in the gzip header) and the ETag covers whether the client takes gzip,
+so one tag always names one exact byte string, as a strong tag must.
+
+Views whose output depends only on the URL and the data versions
+(services.versions) are wrapped in :func:`versioned`.  Their ETag is
+derived from those versions before the view runs.  Revalidating an
+unchanged page then costs a single version lookup and never renders the
+response.  Tags also cover a fingerprint of the templates and Python
+sources, so a deploy invalidates every tag.
+"""
+
+from __future__ import annotations
+
+import functools
+import glob
+import gzip
+import hashlib
+import os
+
+from flask import Flask, Response, current_app, request, session
+
+from services import versions
+
+COMPRESSIBLE = {"application/json", "text/html", "text/plain", "text/csv"}
+# Sources whose changes alter rendered output, relative to the app root.
+FINGERPRINT_GLOBS = ("*.py", "services/*.py", "templates/**/*.html")
+
+
+def init_app(app: Flask) -> None:
+    app.extensions["http_cache_salt"] = _code_fingerprint(app.root_path)
+    app.after_request(_finish_response)
+
+
+def versioned(*names: str):
+    """Tag a view's responses with the current values of the named versions.
+
+    The tag hashes the request path and query string with the versions,
+    so the view must render the same bytes for the same URL while they
+    are unchanged.  Requests with pending flashed messages bypass the
+    check, because the page would show the messages.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or not current_app.config.get("HTTP_ETAGS", True)
+                or _has_flashes()
+            ):
+                return view(*args, **kwargs)
+            etag = _etag(
+                request.endpoint or "",
+                request.full_path,
+                *(f"{name}={v}" for name, v in zip(names, versions.get(*names))),
+            )
+            if request.if_none_match.contains(etag):
+                return _not_modified(etag)
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _finish_response(response: Response) -> Response:
+    if (
+        request.method not in ("GET", "HEAD")
+        or response.status_code != 200
+        or response.is_streamed
+        or response.direct_passthrough
+        or response.mimetype not in COMPRESSIBLE
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    config = current_app.config
+    response.vary.add("Accept-Encoding")
+    if config.get("HTTP_ETAGS", True):
+        etag, _ = response.get_etag()
+        if etag is None:
+            etag = _etag(response.get_data())
+            response.set_etag(etag)
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+        if not response.cache_control.no_store:
+            # Cache, but revalidate on every use.
+            response.cache_control.no_cache = True
+    data = response.get_data()
+    if _accepts_gzip() and len(data) >= config.get("HTTP_GZIP_MIN_BYTES", 1024):
+        response.set_data(gzip.compress(data, config.get("HTTP_GZIP_LEVEL", 6), mtime=0))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+def _has_flashes() -> bool:
+    # Only open the session if there is one, or responses would vary on Cookie.
+    cookie = current_app.config.get("SESSION_COOKIE_NAME", "session")
+    return cookie in request.cookies and "_flashes" in session
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.no_cache = True
+    return response
+
+
+def _accepts_gzip() -> bool:
+    return (
+        current_app.config.get("HTTP_GZIP_LEVEL", 6) > 0
+        and request.accept_encodings.quality("gzip") > 0
+    )
+
+
+def _etag(*parts: str | bytes) -> str:
+    h = hashlib.sha256(current_app.extensions.get("http_cache_salt", "").encode())
+    h.update(b"gzip" if _accepts_gzip() else b"identity")
+    for part in parts:
+        h.update(b"\0")
+        h.update(part if isinstance(part, bytes) else part.encode())
+    return h.hexdigest()[:32]
+
+
+def _code_fingerprint(root: str) -> str:
+    """Hash of the sources that shape responses; identical across workers."""
+    h = hashlib.sha256()
+    for pattern in FINGERPRINT_GLOBS:
+        for path in sorted(glob.glob(os.path.join(root, pattern), recursive=True)):
+            h.update(os.path.relpath(path, root).encode())
+            with open(path, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()[:16]
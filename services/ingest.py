@@ -0,0 +1,185 @@
+"""Bulk ingest of parsed usage rows into the usage_records table."""
+
+from __future__ import annotations
+
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy import insert, select
+
+from models import IntervalRecord, UsageRecord, db
+from services.csv_parser import ParsedIntervalDay, ParsedUsageRow
+from services.intervals import pack_readings
+from services import database, metrics, versions
+from services.rollup import month_keys, refresh_rollup
+
+DEFAULT_BATCH_SIZE = 500
+
+Key = tuple[str, object]
+
+# progress(rows_parsed, rows_written), called after each chunk.
+Progress = Callable[[int, int], None]
+
+
+@metrics.timed(items=sum)
+def ingest_usage_rows(
+    rows: Iterable[ParsedUsageRow],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Progress | None = None,
+) -> tuple[int, int]:
+    """Insert parsed rows, skipping any (esiid, date) already stored.
+
+    Rows are processed in chunks: each chunk is deduplicated in memory,
+    checked against the table with one query per ESIID, and the remaining
+    rows are written with a single executemany INSERT.  Duplicates within
+    the upload count as skipped, exactly like rows already in the database.
+
+    Each chunk is written in its own write transaction (see
+    :func:`services.database.begin_write`) together with the rollup refresh
+    for its months and the usage version bump, and committed before the next
+    chunk is parsed.  The write lock is therefore held for one chunk at a
+    time, and ``progress`` (if given) is committed with the chunk so other
+    connections can see it.  Returns (imported, skipped).
+    """
+    imported = 0
+    skipped = 0
+    parsed = 0
+    seen: set[Key] = set()
+    touched: set[str] = set()
+
+    for chunk in _chunked(rows, batch_size):
+        database.begin_write()
+        new_rows, dupes = _insert_new(UsageRecord, chunk, seen, _usage_values)
+        refresh_rollup(month_keys(new_rows))
+        touched.update(r["esiid"] for r in new_rows)
+        imported += len(new_rows)
+        skipped += dupes
+        parsed += len(chunk)
+        _commit_chunk(touched, progress, parsed, imported)
+
+    return imported, skipped
+
+
+@metrics.timed(items=sum)
+def ingest_interval_days(
+    days: Iterable[ParsedIntervalDay],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Progress | None = None,
+) -> tuple[int, int]:
+    """Store interval readings and their daily totals in one pass.
+
+    Each day is written to interval_records (packed readings) and to
+    usage_records (daily total).  The returned (imported, skipped) counts
+    refer to daily usage records, as reported on the upload page.  Each
+    chunk is committed as in :func:`ingest_usage_rows`.
+    """
+    imported = 0
+    skipped = 0
+    parsed = 0
+    seen_usage: set[Key] = set()
+    seen_interval: set[Key] = set()
+    touched: set[str] = set()
+
+    for chunk in _chunked(days, batch_size):
+        database.begin_write()
+        new_rows, dupes = _insert_new(
+            UsageRecord, chunk, seen_usage, lambda d: _usage_values(d.to_usage_row())
+        )
+        refresh_rollup(month_keys(new_rows))
+        touched.update(r["esiid"] for r in new_rows)
+        imported += len(new_rows)
+        skipped += dupes
+        _insert_new(IntervalRecord, chunk, seen_interval, _interval_values)
+        parsed += len(chunk)
+        _commit_chunk(touched, progress, parsed, imported)
+
+    return imported, skipped
+
+
+def _commit_chunk(
+    touched: set[str], progress: Progress | None, parsed: int, written: int
+) -> None:
+    _bump_usage_versions(touched)
+    touched.clear()
+    if progress is not None:
+        progress(parsed, written)
+    db.session.commit()
+
+
+def _bump_usage_versions(esiids: set[str]) -> None:
+    if esiids:
+        versions.bump(versions.USAGE, *(versions.usage_key(e) for e in sorted(esiids)))
+
+
+def _usage_values(row: ParsedUsageRow) -> dict:
+    return {
+        "esiid": row.esiid,
+        "date": row.date,
+        "usage_kwh": row.usage_kwh,
+        "reading_type": row.reading_type,
+        "actual_estimated": row.actual_estimated,
+    }
+
+
+def _interval_values(day: ParsedIntervalDay) -> dict:
+    return {"esiid": day.esiid, "date": day.date, "readings": pack_readings(day.readings)}
+
+
+def _insert_new(model, chunk, seen: set[Key], to_values) -> tuple[list[dict], int]:
+    """Insert the rows of ``chunk`` whose (esiid, date) is not yet stored.
+
+    ``seen`` carries keys from earlier chunks of the same upload.  Returns
+    the inserted value dicts and the number of duplicates skipped.
+    """
+    pending: dict[Key, object] = {}
+    skipped = 0
+    for item in chunk:
+        key = (item.esiid, item.date)
+        if key in seen or key in pending:
+            skipped += 1
+            continue
+        pending[key] = item
+
+    existing = _existing_keys(model, pending.keys())
+    new_rows = [to_values(item) for key, item in pending.items() if key not in existing]
+    skipped += len(pending) - len(new_rows)
+    seen.update(pending.keys())
+
+    if new_rows:
+        db.session.execute(_insert_ignore_stmt(model), new_rows)
+    return new_rows, skipped
+
+
+def _chunked(rows: Iterable, size: int) -> Iterator[list]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _existing_keys(model, keys: Iterable[Key]) -> set[Key]:
+    """Return the subset of (esiid, date) keys already present in the table."""
+    by_esiid: dict[str, list] = {}
+    for esiid, day in keys:
+        by_esiid.setdefault(esiid, []).append(day)
+
+    found: set[Key] = set()
+    for esiid, days in by_esiid.items():
+        stmt = select(model.esiid, model.date).where(model.esiid == esiid, model.date.in_(days))
+        found.update((r.esiid, r.date) for r in db.session.execute(stmt))
+    return found
+
+
+def _insert_ignore_stmt(model):
+    """INSERT that tolerates a concurrent writer racing on the (esiid, date) key."""
+    table = model.__table__
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=["esiid", "date"])
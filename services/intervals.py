@@ -0,0 +1,106 @@
+"""Packed storage and range reads for 15-minute interval readings."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from sqlalchemy import func, select
+
+from models import IntervalRecord, db
+from services.csv_parser import INTERVALS_PER_DAY
+
+_DTYPE = np.dtype("<f4")
+
+
+def pack_readings(readings: np.ndarray) -> bytes:
+    """Serialize one day of readings as INTERVALS_PER_DAY float32 values."""
+    arr = np.asarray(readings, dtype=_DTYPE)
+    if arr.shape != (INTERVALS_PER_DAY,):
+        raise ValueError(f"Expected {INTERVALS_PER_DAY} readings, got shape {arr.shape}")
+    return arr.tobytes()
+
+
+def unpack_readings(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=_DTYPE)
+
+
+@dataclass
+class IntervalSeries:
+    """Interval readings for one ESIID over a contiguous range of days.
+
+    ``readings`` has shape (len(dates), INTERVALS_PER_DAY); days with no
+    stored data are all-NaN rows, so row i always corresponds to dates[i].
+    """
+
+    esiid: str
+    dates: np.ndarray  # datetime64[D]
+    readings: np.ndarray  # float32
+
+    @property
+    def flat(self) -> np.ndarray:
+        """All readings as one contiguous 15-minute series."""
+        return self.readings.reshape(-1)
+
+    def hourly(self) -> np.ndarray:
+        """Hourly kWh, shape (days, 24); NaN only where a whole hour is missing."""
+        per_hour = self.readings.reshape(len(self.dates), 24, INTERVALS_PER_DAY // 24)
+        totals = np.nansum(per_hour, axis=2, dtype=np.float64)
+        totals[np.isnan(per_hour).all(axis=2)] = np.nan
+        return totals
+
+    def daily_totals(self) -> np.ndarray:
+        """Daily kWh per row of ``dates``; NaN for days with no data."""
+        totals = np.nansum(self.readings, axis=1, dtype=np.float64)
+        totals[np.isnan(self.readings).all(axis=1)] = np.nan
+        return totals
+
+    def monthly_totals(self) -> list[dict]:
+        """Monthly kWh in the same shape as the dashboard's monthly aggregates."""
+        daily = self.daily_totals()
+        has_data = ~np.isnan(daily)
+        months = self.dates[has_data].astype("datetime64[M]")
+        if months.size == 0:
+            return []
+        labels, inverse, counts = np.unique(months, return_inverse=True, return_counts=True)
+        sums = np.bincount(inverse, weights=daily[has_data])
+        return [
+            {"label": str(label), "kwh": round(float(kwh), 1), "days": int(days)}
+            for label, kwh, days in zip(labels, sums, counts)
+        ]
+
+
+def load_intervals(esiid: str, start: date | None = None, end: date | None = None) -> IntervalSeries:
+    """Read interval data for ``esiid`` between start and end (inclusive).
+
+    Open-ended bounds default to the first/last stored day for the ESIID.
+    """
+    if start is None or end is None:
+        lo, hi = db.session.execute(
+            select(func.min(IntervalRecord.date), func.max(IntervalRecord.date)).where(
+                IntervalRecord.esiid == esiid
+            )
+        ).one()
+        start = start or lo
+        end = end or hi
+    if start is None or end is None or end < start:
+        return IntervalSeries(
+            esiid=esiid,
+            dates=np.array([], dtype="datetime64[D]"),
+            readings=np.empty((0, INTERVALS_PER_DAY), dtype=np.float32),
+        )
+
+    dates = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    readings = np.full((len(dates), INTERVALS_PER_DAY), np.nan, dtype=np.float32)
+
+    stmt = select(IntervalRecord.date, IntervalRecord.readings).where(
+        IntervalRecord.esiid == esiid,
+        IntervalRecord.date >= start,
+        IntervalRecord.date <= end,
+    )
+    origin = dates[0]
+    for day, blob in db.session.execute(stmt):
+        readings[(np.datetime64(day, "D") - origin).astype(int)] = unpack_readings(blob)
+
+    return IntervalSeries(esiid=esiid, dates=dates, readings=readings)
@@ -0,0 +1,262 @@
+"""In-process background jobs for uploads and plan refreshes.
+
+Each job is a row in the ``jobs`` table; a per-worker thread pool runs the
+task with its own app context and session, and the task reports progress
+through a callback that updates the row.  Progress is committed together
+with each chunk of data the task writes, so ``/api/jobs/<id>`` answers from
+any worker.  With ``JOB_WORKERS = 0`` tasks run inline in the request.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable
+
+from flask import Flask, current_app
+
+from sqlalchemy import select, update
+
+from models import Job, db
+from services import database
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobProgress:
+    """progress(rows_parsed, rows_written) callback bound to one job row.
+
+    Counters are set on the session's Job object; they are persisted by the
+    task's next commit.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+
+    def __call__(self, rows_parsed: int, rows_written: int) -> None:
+        self.job.rows_parsed = rows_parsed
+        self.job.rows_written = rows_written
+
+
+class JobRunner:
+    """Submits tasks to a thread pool and records their outcome in ``jobs``."""
+
+    def __init__(self, app: Flask, max_workers: int):
+        self.app = app
+        self._executor = (
+            ThreadPoolExecutor(max_workers, thread_name_prefix="job") if max_workers > 0 else None
+        )
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, task: Callable[..., dict], *args) -> str:
+        """Queue ``task(progress, *args)`` and return the new job id.
+
+        The task returns a JSON-serializable dict; its ``message`` entry is
+        shown to the user.
+        """
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status=QUEUED,
+            created_at=datetime.utcnow(),
+            owner=_owner(),
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        if self._executor is None:
+            self._run(job.id, task, args)
+        else:
+            future = self._executor.submit(self._run, job.id, task, args)
+            with self._lock:
+                self._futures[job.id] = future
+            future.add_done_callback(lambda _f, job_id=job.id: self._forget(job_id))
+        return job.id
+
+    def wait(self, job_id: str, timeout: float | None = None) -> None:
+        """Block until a job submitted by this worker has finished."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _forget(self, job_id: str) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id: str, task: Callable[..., dict], args: tuple) -> None:
+        with self.app.app_context():
+            database.begin_write()
+            job = db.session.get(Job, job_id)
+            job.status = RUNNING
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+
+            try:
+                result = task(JobProgress(job), *args)
+            except Exception as e:
+                db.session.rollback()
+                database.begin_write()
+                self.app.logger.exception("Job %s (%s) failed", job_id, job.kind)
+                job.status = FAILED
+                job.message = str(e) or type(e).__name__
+            else:
+                database.begin_write()
+                job.status = SUCCEEDED
+                job.message = result.get("message")
+                job.result = json.dumps(result, default=str)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+
+def init_app(app: Flask) -> None:
+    app.extensions["jobs"] = JobRunner(app, app.config.get("JOB_WORKERS", 2))
+
+
+def fail_interrupted_jobs() -> int:
+    """Mark queued and running jobs whose worker process is gone as failed.
+
+    Jobs run in the thread pool of the process that submitted them, so a
+    job whose owner exited will never finish.  Called as each worker
+    starts; jobs owned by live workers on this host, and by workers on
+    other hosts, are left alone.  Jobs without an owner predate the column
+    and are failed.  Returns the number of jobs marked.
+    """
+    unfinished = Job.status.in_((QUEUED, RUNNING))
+    rows = db.session.execute(select(Job.id, Job.owner).where(unfinished)).all()
+    orphaned = [job_id for job_id, owner in rows if not _owner_alive(owner)]
+    if not orphaned:
+        return 0
+    database.begin_write()
+    marked = db.session.execute(
+        update(Job)
+        .where(Job.id.in_(orphaned), unfinished)
+        .values(
+            status=FAILED,
+            message="Interrupted: the worker running it exited.",
+            finished_at=datetime.utcnow(),
+        )
+    ).rowcount
+    db.session.commit()
+    return marked
+
+
+def _owner() -> str:
+    # Read at call time: the pid changes when a pre-forking server forks.
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: str | None) -> bool:
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True  # cannot tell; the worker on that host will check
+    if int(pid) == os.getpid():
+        return False  # a reused pid: this process has only just started
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_runner() -> JobRunner:
+    """The job runner of the current app (one pool per worker process)."""
+    return current_app.extensions["jobs"]
+
+
+# ----------------------------------------------------------------------
+# Tasks
+# ----------------------------------------------------------------------
+def ingest_upload(progress: JobProgress, path: str, file_type: str) -> dict:
+    """Parse and ingest a spooled upload, then delete the file.
+
+    Files already ingested are recognized by their content hash and not
+    parsed again; days covered by earlier uploads are skipped without a
+    database lookup (see services.uploads).
+    """
+    from services.csv_parser import iter_daily_csv, iter_interval_days
+    from services.ingest import ingest_interval_days, ingest_usage_rows
+    from services.uploads import UploadTracker, file_digest, find_upload
+
+    try:
+        digest = file_digest(path)
+        previous = find_upload(digest, file_type)
+        if previous is not None:
+            return {
+                "imported": 0,
+                "skipped": previous.rows,
+                "message": (
+                    f"Identical to the file uploaded {previous.created_at:%Y-%m-%d %H:%M}; "
+                    f"{previous.rows} records already imported."
+                ),
+            }
+        tracker = UploadTracker(digest, file_type)
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            if file_type == "interval":
+                rows = tracker.filter(iter_interval_days(f))
+                imported, skipped = ingest_interval_days(rows, progress=progress)
+            else:
+                rows = tracker.filter(iter_daily_csv(f))
+                imported, skipped = ingest_usage_rows(rows, progress=progress)
+        tracker.record(imported)
+    finally:
+        os.remove(path)
+
+    skipped += tracker.covered
+    return {
+        "imported": imported,
+        "skipped": skipped,
+        "message": f"Imported {imported} records ({skipped} duplicates skipped).",
+    }
+
+
+def fetch_plans(progress: JobProgress, locations: list[str]) -> dict:
+    """Harvest plans for ``locations`` from the API and save them."""
+    from services.ptc_client import harvest_plans, save_plan_batches
+
+    raw_plans = harvest_plans(locations)
+    progress(len(raw_plans), 0)
+    saved = save_plan_batches([raw_plans], progress=progress)
+    return _plan_result(
+        saved,
+        f"Fetched {saved.total} plans ({saved.inserted} new, {saved.updated} updated, "
+        f"{saved.unchanged} unchanged).",
+    )
+
+
+def import_plans_csv(progress: JobProgress) -> dict:
+    """Stream the full CSV catalog into the plan table."""
+    from services.ptc_client import import_plans_csv as run_import
+
+    saved = run_import(progress=progress)
+    return _plan_result(
+        saved,
+        f"Imported {saved.total} plans from CSV in {saved.seconds:.1f}s "
+        f"({saved.inserted} new, {saved.updated} updated, {saved.unchanged} unchanged).",
+    )
+
+
+def _plan_result(saved, message: str) -> dict:
+    return {
+        "inserted": saved.inserted,
+        "updated": saved.updated,
+        "unchanged": saved.unchanged,
+        "message": message,
+    }
@@ -0,0 +1,277 @@
+"""Request, SQL and service-call instrumentation with Prometheus text output.
+
+``init_app`` hooks Flask request start/end and SQLAlchemy cursor execution:
+every request records its latency and the number (and time) of SQL
+statements it issued, labelled by endpoint.  Service functions decorated
+with :func:`timed` record call latency and, where they report one, the
+number of items processed, so throughput is
+``rate(service_items_total) / rate(service_call_duration_seconds_sum)``.
+
+Metrics live in a per-process registry (each gunicorn worker reports its
+own) and are rendered by ``/metrics`` in the Prometheus text format.
+
+With ``PROFILE_REQUESTS`` enabled each request also runs under cProfile,
+and requests slower than ``PROFILE_SLOW_MS`` dump their stats to
+``PROFILE_DIR`` (open with ``python -m pstats`` or snakeviz).
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+
+from flask import Flask, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BACKGROUND = "<background>"  # SQL issued outside a request, e.g. by jobs
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _format(self, key: tuple[str, ...], extra: dict | None = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return super().render() + [f"{self.name}{self._format(k)} {v:g}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return int(state[-2]) if state else 0
+
+    def sum(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0.0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = super().render()
+        for key, state in items:
+            for bound, n in zip(self.buckets, state):
+                lines.append(f"{self.name}_bucket{self._format(key, {'le': f'{bound:g}'})} {n}")
+            lines.append(f"{self.name}_bucket{self._format(key, {'le': '+Inf'})} {state[-2]}")
+            lines.append(f"{self.name}_count{self._format(key)} {state[-2]}")
+            lines.append(f"{self.name}_sum{self._format(key)} {state[-1]:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency by endpoint.",
+        ("endpoint", "method", "status"),
+    )
+)
+HTTP_QUERIES = REGISTRY.register(
+    Histogram(
+        "http_request_sql_queries",
+        "SQL statements issued per request.",
+        ("endpoint",),
+        buckets=QUERY_BUCKETS,
+    )
+)
+SQL_QUERIES = REGISTRY.register(
+    Counter("sql_queries_total", "SQL statements executed.", ("endpoint",))
+)
+SQL_SECONDS = REGISTRY.register(
+    Counter("sql_query_seconds_total", "Time spent executing SQL.", ("endpoint",))
+)
+SERVICE_DURATION = REGISTRY.register(
+    Histogram("service_call_duration_seconds", "Service function latency.", ("function",))
+)
+SERVICE_ITEMS = REGISTRY.register(
+    Counter("service_items_total", "Rows, plans or cells processed.", ("function",))
+)
+SERVICE_ERRORS = REGISTRY.register(
+    Counter("service_errors_total", "Service calls that raised.", ("function",))
+)
+
+
+def timed(name: str | None = None, items: Callable[[object], int] | None = None):
+    """Record the latency (and items processed) of a service function.
+
+    ``items`` maps the return value to the number of rows, plans or cells
+    the call handled.
+    """
+
+    def decorate(fn):
+        label = name or f"{fn.__module__.removeprefix('services.')}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                SERVICE_ERRORS.inc(function=label)
+                raise
+            finally:
+                SERVICE_DURATION.observe(time.perf_counter() - t0, function=label)
+            if items is not None:
+                SERVICE_ITEMS.inc(items(result), function=label)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def init_app(app: Flask) -> None:
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def _start_request() -> None:
+    g.metrics_sql = [0, 0.0]
+    if current_app.config.get("PROFILE_REQUESTS"):
+        g.metrics_profiler = cProfile.Profile()
+        g.metrics_profiler.enable()
+    g.metrics_start = time.perf_counter()
+
+
+def _finish_request(response):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or "<unmatched>"
+    queries, _ = g.pop("metrics_sql", (0, 0.0))
+    HTTP_DURATION.observe(
+        elapsed, endpoint=endpoint, method=request.method, status=response.status_code
+    )
+    HTTP_QUERIES.observe(queries, endpoint=endpoint)
+
+    profiler = g.pop("metrics_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        if elapsed * 1000 >= current_app.config.get("PROFILE_SLOW_MS", 500):
+            _dump_profile(profiler, endpoint, elapsed)
+    return response
+
+
+def _dump_profile(profiler: cProfile.Profile, endpoint: str, elapsed: float) -> None:
+    directory = current_app.config["PROFILE_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(directory, f"{stamp}-{endpoint}-{elapsed * 1000:.0f}ms.prof")
+    profiler.dump_stats(path)
+    current_app.logger.warning(
+        "Slow request %s %s took %.0f ms; profile written to %s",
+        request.method,
+        request.path,
+        elapsed * 1000,
+        path,
+    )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("metrics_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    endpoint = BACKGROUND
+    if has_request_context() and "metrics_sql" in g:
+        g.metrics_sql[0] += 1
+        g.metrics_sql[1] += elapsed
+        endpoint = request.endpoint or "<unmatched>"
+    SQL_QUERIES.inc(endpoint=endpoint)
+    SQL_SECONDS.inc(elapsed, endpoint=endpoint)
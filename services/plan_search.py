@@ -0,0 +1,208 @@
+"""Filtered, sorted and paginated plan search over the catalog snapshot.
+
+Queries run on the column arrays of :class:`services.catalog.PlanCatalog`:
+each filter is a vectorized mask, string filters compare interned string
+indexes, and the estimated bill at any usage level comes from evaluating
+every plan's bill curve at that kWh in one pass.  Only the rows of the
+requested page are turned into dicts, so a query costs a few array passes
+regardless of how many plans match.
+
+NULL columns behave as in SQL: a plan without a contract length, renewable
+share or cancellation fee never satisfies a filter on that column, and it
+sorts last in either direction.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+from flask import current_app
+
+from services import metrics, versions
+from services.catalog import NULL, PlanCatalog, build_catalog, get_catalog
+from services.rate_curve import evaluate
+
+DEFAULT_KWH = 1000.0
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+SORTS = (
+    "cost",
+    "price_kwh_500",
+    "price_kwh_1000",
+    "price_kwh_2000",
+    "renewable_pct",
+    "contract_length",
+    "cancellation_fee",
+)
+
+
+@dataclass
+class PlanQuery:
+    plan_types: list[str] = field(default_factory=list)
+    companies: list[str] = field(default_factory=list)
+    min_term: int | None = None  # months
+    max_term: int | None = None
+    min_renewable: float | None = None  # percent
+    max_cancellation_fee: float | None = None  # dollars
+    time_of_use: bool | None = None  # None: either
+    kwh: float = DEFAULT_KWH  # usage level for the estimated bill
+    sort: str = "cost"
+    descending: bool = False
+    page: int = 1
+    per_page: int = DEFAULT_PER_PAGE
+
+    @classmethod
+    def from_args(cls, args) -> PlanQuery:
+        """Build a query from request arguments; raises ValueError on bad input."""
+        try:
+            query = cls(
+                plan_types=[v for v in args.getlist("type") if v],
+                companies=[v for v in args.getlist("company") if v],
+                min_term=_opt(args, "term_min", int),
+                max_term=_opt(args, "term_max", int),
+                min_renewable=_opt(args, "renewable_min", float),
+                max_cancellation_fee=_opt(args, "fee_max", float),
+                time_of_use={"": None, "only": True, "exclude": False}[args.get("tou", "")],
+                kwh=_opt(args, "kwh", float),
+                sort=args.get("sort") or "cost",
+                descending=args.get("order") == "desc",
+                page=_opt(args, "page", int) or 1,
+                per_page=_opt(args, "per_page", int) or DEFAULT_PER_PAGE,
+            )
+        except KeyError as e:
+            raise ValueError(f"Invalid tou: {e.args[0]!r}") from e
+        if query.kwh is None:
+            query.kwh = DEFAULT_KWH
+        if query.sort not in SORTS:
+            raise ValueError(f"Invalid sort: {query.sort!r}")
+        if not math.isfinite(query.kwh) or query.kwh < 0:
+            raise ValueError("kwh must be a non-negative number")
+        query.page = max(query.page, 1)
+        query.per_page = min(max(query.per_page, 1), MAX_PER_PAGE)
+        return query
+
+    def to_args(self, **overrides) -> dict:
+        """Request arguments reproducing this query (for pagination links)."""
+        q = asdict(self) | overrides
+        args = {
+            "type": q["plan_types"],
+            "company": q["companies"],
+            "term_min": q["min_term"],
+            "term_max": q["max_term"],
+            "renewable_min": q["min_renewable"],
+            "fee_max": q["max_cancellation_fee"],
+            "tou": {None: None, True: "only", False: "exclude"}[q["time_of_use"]],
+            "kwh": q["kwh"] if q["kwh"] != DEFAULT_KWH else None,
+            "sort": q["sort"] if q["sort"] != "cost" else None,
+            "order": "desc" if q["descending"] else None,
+            "page": q["page"] if q["page"] != 1 else None,
+            "per_page": q["per_page"] if q["per_page"] != DEFAULT_PER_PAGE else None,
+        }
+        return {k: v for k, v in args.items() if v not in (None, [])}
+
+
+def _opt(args, name: str, type_):
+    value = args.get(name, "")
+    if value == "":
+        return None
+    try:
+        return type_(value)
+    except ValueError as e:
+        raise ValueError(f"Invalid {name}: {value!r}") from e
+
+
+@dataclass
+class PlanPage:
+    query: PlanQuery
+    total: int  # plans matching the filters
+    plans: list[dict]  # ElectricityPlan.to_dict() plus estimated_cost/_cents_per_kwh
+
+    @property
+    def pages(self) -> int:
+        return max(math.ceil(self.total / self.query.per_page), 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "data": self.plans,
+            "total": self.total,
+            "page": self.query.page,
+            "pages": self.pages,
+            "per_page": self.query.per_page,
+            "kwh": self.query.kwh,
+        }
+
+
+@metrics.timed(items=lambda page: page.total)
+def search_plans(query: PlanQuery, catalog: PlanCatalog | None = None) -> PlanPage:
+    """Run ``query`` against the plan catalog (the shared snapshot by default)."""
+    catalog = catalog if catalog is not None else current_catalog()
+    a = catalog.arrays
+
+    mask = np.ones(len(catalog), dtype=bool)
+    if query.plan_types:
+        mask &= np.isin(a["plan_type"], catalog.lookup(query.plan_types))
+    if query.companies:
+        mask &= np.isin(a["company_name"], catalog.lookup(query.companies))
+    term = a["contract_length"]
+    if query.min_term is not None:
+        mask &= (term != NULL) & (term >= query.min_term)
+    if query.max_term is not None:
+        mask &= (term != NULL) & (term <= query.max_term)
+    if query.min_renewable is not None:
+        mask &= a["renewable_pct"] >= query.min_renewable  # NaN compares False
+    if query.max_cancellation_fee is not None:
+        mask &= a["cancellation_fee"] <= query.max_cancellation_fee
+    if query.time_of_use is not None:
+        mask &= a["is_time_of_use"] == int(query.time_of_use)
+
+    rows = np.flatnonzero(mask)
+    cost = evaluate(catalog.curves.take(rows), [query.kwh])[:, 0]
+    if query.sort == "cost":
+        key = cost
+    elif query.sort == "contract_length":
+        key = np.where(term[rows] == NULL, np.nan, term[rows]).astype(np.float64)
+    else:
+        key = a[query.sort][rows]
+    missing = np.isnan(key)
+    key = np.where(missing, 0.0, -key if query.descending else key)
+    # Primary: present before missing; then the key; ties by id (row order).
+    order = np.lexsort((rows, key, missing))
+
+    start = (query.page - 1) * query.per_page
+    plans = []
+    for k in order[start : start + query.per_page]:
+        row = catalog.row(int(rows[k]))
+        estimate = None if np.isnan(cost[k]) else round(float(cost[k]), 2)
+        row["estimated_cost"] = estimate
+        row["estimated_cents_per_kwh"] = (
+            round(estimate / query.kwh * 100, 2) if estimate is not None and query.kwh else None
+        )
+        plans.append(row)
+    return PlanPage(query, len(rows), plans)
+
+
+def filter_options(catalog: PlanCatalog | None = None) -> dict:
+    """Distinct plan types and companies, for the search form."""
+    catalog = catalog if catalog is not None else current_catalog()
+    return {
+        "plan_types": catalog.distinct("plan_type"),
+        "companies": catalog.distinct("company_name"),
+    }
+
+
+def current_catalog() -> PlanCatalog:
+    """The shared snapshot, or else an unmapped catalog kept per app.
+
+    Without a snapshot (in-memory databases, or ``PLAN_SNAPSHOT=0``) the
+    built catalog is reused until the plans version moves on.
+    """
+    catalog = get_catalog()
+    if catalog is not None:
+        return catalog
+    (version,) = versions.get(versions.PLANS)
+    cached: PlanCatalog | None = current_app.extensions.get("plan_catalog_memory")
+    if cached is None or cached.version < version:
+        cached = current_app.extensions["plan_catalog_memory"] = build_catalog()
+    return cached
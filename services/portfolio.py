@@ -0,0 +1,221 @@
+"""Reprice many ESIIDs against the plan catalog at once."""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import date
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from models import ElectricityPlan, db
+from services import metrics
+from services.repricer import PlanRates, compute_cost_matrix, load_plan_rates
+from services.rollup import MonthlyUsage, monthly_totals_by_esiid
+
+# Meters per task handed to a pool worker.
+CHUNK_METERS = 32
+
+
+@dataclass
+class MeterBest:
+    """The cheapest plan for one meter over its usage history."""
+
+    esiid: str
+    months: int
+    total_kwh: float
+    best_plan_id: int | None  # ElectricityPlan.id
+    best_cost: float | None
+    avg_price_per_kwh: float | None  # cents
+
+
+@dataclass
+class PortfolioResult:
+    """Per-meter best plans plus the best single plan for the whole portfolio.
+
+    ``plan_totals`` is the summed cost of each plan over all meters; plans
+    without a usable rate for every meter-month are NaN.
+    """
+
+    meters: list[MeterBest]
+    plan_ids: np.ndarray
+    plan_totals: np.ndarray
+    seconds: float
+
+    @property
+    def best_plan_id(self) -> int | None:
+        i = self._best_index()
+        return None if i is None else int(self.plan_ids[i])
+
+    @property
+    def best_plan_cost(self) -> float | None:
+        i = self._best_index()
+        return None if i is None else round(float(self.plan_totals[i]), 2)
+
+    @property
+    def sum_of_meter_best(self) -> float:
+        """Portfolio cost if every meter took its own cheapest plan."""
+        return round(sum(m.best_cost for m in self.meters if m.best_cost is not None), 2)
+
+    def to_dict(self) -> dict:
+        ids = {m.best_plan_id for m in self.meters} | {self.best_plan_id}
+        plans = _plan_labels(ids - {None})
+        return {
+            "meters": [
+                {
+                    "esiid": m.esiid,
+                    "months": m.months,
+                    "total_kwh": m.total_kwh,
+                    "best_plan": plans.get(m.best_plan_id),
+                    "best_cost": m.best_cost,
+                    "avg_price_per_kwh": m.avg_price_per_kwh,
+                }
+                for m in self.meters
+            ],
+            "portfolio": {
+                "meters": len(self.meters),
+                "total_kwh": round(sum(m.total_kwh for m in self.meters), 2),
+                "best_plan": plans.get(self.best_plan_id),
+                "best_plan_cost": self.best_plan_cost,
+                "sum_of_meter_best": self.sum_of_meter_best,
+            },
+            "plans": len(self.plan_ids),
+            "seconds": round(self.seconds, 4),
+            "meters_per_second": (
+                round(len(self.meters) / self.seconds, 1) if self.seconds else None
+            ),
+        }
+
+    def _best_index(self) -> int | None:
+        if np.isnan(self.plan_totals).all():
+            return None
+        # Ties on the rounded total go to the lowest plan id, as in reprice_usage.
+        return int(np.nanargmin(np.round(self.plan_totals, 2)))
+
+
+@metrics.timed(items=lambda r: len(r.meters))
+def reprice_portfolio(
+    esiids: list[str] | None = None,
+    plan_ids: list[int] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    workers: int | None = None,
+) -> PortfolioResult:
+    """Find the best plan for every meter in ``esiids`` (all if None).
+
+    Monthly usage for all meters is loaded with one grouped rollup query.
+    The plan x month cost computation is split into chunks of meters and
+    run on a process pool of ``workers`` (REPRICE_WORKERS by default), made
+    for this call; ``workers <= 1`` computes in this process.  Web requests
+    pass 1, since a per-request pool would fork a threaded server worker.
+    Per-meter totals use the same month-by-month summation as reprice_usage.
+    """
+    t0 = time.perf_counter()
+    usage = monthly_totals_by_esiid(esiids, start, end)
+    rates = load_plan_rates(plan_ids)
+    if workers is None:
+        workers = current_app.config.get("REPRICE_WORKERS") or os.cpu_count() or 1
+
+    meters = [
+        (esiid, np.array([mu.total_kwh for mu in months])) for esiid, months in usage.items()
+    ]
+    chunks = [meters[i : i + CHUNK_METERS] for i in range(0, len(meters), CHUNK_METERS)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        priced = [_price_meters(rates, chunk) for chunk in chunks]
+    else:
+        # The mapped catalog itself cannot be pickled; its arrays are copied.
+        shipped = replace(rates, catalog=None)
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)), initializer=_init_worker, initargs=(shipped,)
+        ) as pool:
+            priced = list(pool.map(_price_chunk, chunks))
+
+    totals = np.vstack([t for t, _ in priced]) if priced else np.empty((0, len(rates)))
+    complete = np.vstack([c for _, c in priced]) if priced else np.empty((0, len(rates)), bool)
+
+    results = [
+        _meter_best(esiid, usage[esiid], rates, totals[i], complete[i])
+        for i, (esiid, _) in enumerate(meters)
+    ]
+    plan_totals = np.full(len(rates), np.nan)
+    if meters:
+        plan_totals = np.where(complete.all(axis=0), totals.sum(axis=0), np.nan)
+    return PortfolioResult(results, rates.plan_ids, plan_totals, time.perf_counter() - t0)
+
+
+_rates: PlanRates | None = None
+
+
+def _init_worker(rates: PlanRates) -> None:
+    global _rates
+    _rates = rates
+
+
+def _price_chunk(meters: list[tuple[str, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+    """Pool task: :func:`_price_meters` with the rates given to the worker."""
+    return _price_meters(_rates, meters)
+
+
+def _price_meters(
+    rates: PlanRates, meters: list[tuple[str, np.ndarray]]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Total cost of every plan for each meter of a chunk.
+
+    Returns (totals, complete), both shaped (meters, plans); ``complete``
+    is False where a plan has no usable rate for some month.
+    """
+    costs = compute_cost_matrix(rates, np.concatenate([kwh for _, kwh in meters]))
+    totals = np.empty((len(meters), len(rates)))
+    complete = np.empty((len(meters), len(rates)), dtype=bool)
+    col = 0
+    for i, (_, kwh) in enumerate(meters):
+        block = costs[:, col : col + len(kwh)]
+        col += len(kwh)
+        valid = ~np.isnan(block)
+        # cumsum adds month by month, like RepriceResults.
+        totals[i] = np.cumsum(np.where(valid, block, 0.0), axis=1)[:, -1]
+        complete[i] = valid.all(axis=1)
+    return totals, complete
+
+
+def _meter_best(
+    esiid: str,
+    months: list[MonthlyUsage],
+    rates: PlanRates,
+    totals: np.ndarray,
+    complete: np.ndarray,
+) -> MeterBest:
+    total_kwh = sum(mu.total_kwh for mu in months)
+    best_plan_id = best_cost = avg_price = None
+    if complete.any():
+        rounded = np.where(complete, np.round(totals, 2), np.inf)
+        i = int(np.argmin(rounded))
+        best_plan_id = int(rates.plan_ids[i])
+        best_cost = float(rounded[i])
+        avg_price = round(float(totals[i]) / total_kwh * 100, 2) if total_kwh > 0 else 0.0
+    return MeterBest(esiid, len(months), round(total_kwh, 2), best_plan_id, best_cost, avg_price)
+
+
+def _plan_labels(ids: set[int]) -> dict[int, dict]:
+    if not ids:
+        return {}
+    stmt = select(
+        ElectricityPlan.id,
+        ElectricityPlan.plan_id,
+        ElectricityPlan.company_name,
+        ElectricityPlan.plan_name,
+    ).where(ElectricityPlan.id.in_(ids))
+    return {
+        row.id: {
+            "id": row.id,
+            "plan_id": row.plan_id,
+            "company_name": row.company_name,
+            "plan_name": row.plan_name,
+        }
+        for row in db.session.execute(stmt)
+    }
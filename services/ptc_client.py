@@ -4,72 +4,372 @@ from __future__ import annotations
 
 import csv
 import io
+import hashlib
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
 
 import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import bindparam, insert, select, update
+from urllib3.util.retry import Retry
 
 from config import Config
 from models import ElectricityPlan, db
+from services import catalog, database, metrics, versions
+from services.rate_curve import compile_curve
+
+# Bookkeeping columns that must not affect change detection.
+_UNHASHED_FIELDS = {"content_hash", "fetched_at"}
 
 
 def fetch_plans_from_api(zip_code: str = "") -> list[dict]:
-    """Fetch plans from the Power to Choose REST API.
+    """Fetch all plans for one ZIP code from the Power to Choose REST API.
 
     POST http://api.powertochoose.org/api/PowerToChoose/plans
-    Body: {"zip_code": "77001", "page_size": 200}
+    Body: {"zip_code": "77001", "page_size": 200, "page": 1}
     """
-    payload = {"zip_code": zip_code, "page_size": 200}
-    resp = requests.post(Config.PTC_API_URL, json=payload, timeout=30)
+    return harvest_plans([zip_code], max_workers=1)
+
+
+# Representative ZIP codes for each TDU service territory; the API prices
+# plans by ZIP, and every ZIP in a territory sees the same catalog.
+TDU_ZIP_CODES = {
+    "oncor": "75201",
+    "centerpoint": "77002",
+    "aep_central": "78401",
+    "aep_north": "79601",
+    "tnmp": "77573",
+    "lubbock": "79401",
+}
+
+
+def make_session(pool_size: int | None = None, retries: int | None = None) -> requests.Session:
+    """HTTP session with a connection pool and retry/backoff for transient errors."""
+    pool_size = pool_size or Config.PTC_MAX_WORKERS
+    retry = Retry(
+        total=Config.PTC_RETRIES if retries is None else retries,
+        backoff_factor=Config.PTC_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_plans_page(
+    session: requests.Session, zip_code: str, page: int = 1, page_size: int | None = None
+) -> tuple[list[dict], int | None]:
+    """Fetch one page of plans for a ZIP code.
+
+    Returns the plans and the total plan count when the API reports one.
+    """
+    page_size = page_size or Config.PTC_PAGE_SIZE
+    payload = {"zip_code": zip_code, "page_size": page_size, "page": page}
+    resp = session.post(Config.PTC_API_URL, json=payload, timeout=30)
     resp.raise_for_status()
     data = resp.json()
-    return data.get("data", [])
+    total = data.get("total") or data.get("total_count")
+    return data.get("data", []), _safe_int(total)
+
+
+@metrics.timed(items=len)
+def harvest_plans(
+    locations: list[str],
+    max_workers: int | None = None,
+    page_size: int | None = None,
+    session: requests.Session | None = None,
+) -> list[dict]:
+    """Fetch every page of plans for many ZIP codes / TDU territories concurrently.
+
+    ``locations`` may mix 5-digit ZIP codes and keys of TDU_ZIP_CODES.  All
+    requests share one pooled session and run on a bounded thread pool.
+    Plans offered in several ZIPs are returned once (first seen wins).
+
+    When the API reports no total, pages are requested one after another
+    until one comes back short or adds no plan_id not seen for that ZIP
+    (a server ignoring ``page`` repeats itself).  Either way, at most
+    ``Config.PTC_MAX_PAGES`` pages are fetched per ZIP code.
+    """
+    max_workers = max_workers or Config.PTC_MAX_WORKERS
+    page_size = page_size or Config.PTC_PAGE_SIZE
+    max_pages = Config.PTC_MAX_PAGES
+    zip_codes = list(dict.fromkeys(TDU_ZIP_CODES.get(loc.lower(), loc) for loc in locations))
+    own_session = session is None
+    session = session or make_session(pool_size=max_workers)
+
+    def fetch(zip_code: str, page: int):
+        return zip_code, page, fetch_plans_page(session, zip_code, page, page_size)
+
+    pages: dict[tuple[str, int], list[dict]] = {}
+    seen_ids: dict[str, set] = {z: set() for z in zip_codes}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {pool.submit(fetch, z, 1) for z in zip_codes}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    zip_code, page, (plans, total) = future.result()
+                    pages[(zip_code, page)] = plans
+                    if total is not None and page == 1:
+                        last = min(-(-total // page_size), max_pages)
+                        pending |= {pool.submit(fetch, zip_code, p) for p in range(2, last + 1)}
+                    elif total is None:
+                        ids = {_plan_id(p) for p in plans} - {""}
+                        new_ids = ids - seen_ids[zip_code]
+                        seen_ids[zip_code] |= ids
+                        if len(plans) >= page_size and new_ids and page < max_pages:
+                            pending.add(pool.submit(fetch, zip_code, page + 1))
+    finally:
+        if own_session:
+            session.close()
+
+    unique: dict[str, dict] = {}
+    for key in sorted(pages):
+        for plan in pages[key]:
+            fields = normalize_plan(plan)
+            if fields is not None:
+                unique.setdefault(fields["plan_id"], plan)
+    return list(unique.values())
 
 
 def fetch_plans_csv() -> list[dict]:
     """Download the full plan list as CSV from Power to Choose."""
-    resp = requests.get(Config.PTC_CSV_URL, timeout=30)
+    return list(iter_plans_csv())
+
+
+# CSV export headers (lowercased, without brackets) -> API field names.
+CSV_FIELD_MAP = {
+    "idkey": "plan_id",
+    "company name": "company_name",
+    "plan name": "plan_name",
+    "plan type": "plan_type",
+    "term value": "contract_length",
+    "price/kwh 500": "price_kwh500",
+    "price/kwh 1000": "price_kwh1000",
+    "price/kwh 2000": "price_kwh2000",
+    "base charge": "base_charge",
+    "cancel fee": "cancellation_fee",
+    "early termination/cancel fee": "cancellation_fee",
+    "renewable %": "renewable_pct",
+    "time of use": "timeofuse",
+    "special terms": "special_terms",
+    "pricing details": "pricing_details",
+    "promotion description": "promotion_desc",
+}
+
+
+def iter_plans_csv(session: requests.Session | None = None) -> Iterator[dict]:
+    """Stream the Power to Choose CSV export as API-style plan dicts.
+
+    The response is decoded as a stream with line endings kept, so quoted
+    fields spanning several lines (Special Terms) survive intact.  The
+    bracketed ``[Column]`` headers are mapped to API field names once, and
+    unknown columns are dropped.
+    """
+    session = session or requests
+    resp = session.get(Config.PTC_CSV_URL, timeout=30, stream=True)
     resp.raise_for_status()
-    reader = csv.DictReader(io.StringIO(resp.text))
-    return [row for row in reader]
+    if "charset" not in resp.headers.get("Content-Type", ""):
+        # requests would assume ISO-8859-1 for text/*; the export is UTF-8 with a BOM.
+        resp.encoding = "utf-8-sig"
+    try:
+        resp.raw.decode_content = True  # undo any Content-Encoding: gzip
+        resp.raw.auto_close = False  # TextIOWrapper reads past the end
+        reader = csv.reader(io.TextIOWrapper(resp.raw, encoding=resp.encoding, newline=""))
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [
+            (i, CSV_FIELD_MAP[key])
+            for i, key in enumerate(h.strip().strip("[]").strip().lower() for h in header)
+            if key in CSV_FIELD_MAP
+        ]
+        for row in reader:
+            if row:
+                yield {field: row[i] for i, field in columns if i < len(row)}
+    finally:
+        resp.close()
+
+
+@metrics.timed(items=lambda r: r.total)
+def import_plans_csv(batch_size: int = 500, progress=None) -> PlanSaveResult:
+    """Import the full CSV catalog in fixed-size batches; reports elapsed time.
+
+    Peak memory is bounded by ``batch_size`` rows plus the (plan_id, hash)
+    index of the existing catalog.
+    """
+    t0 = time.perf_counter()
+    result = save_plan_batches(_batched(iter_plans_csv(), batch_size), progress=progress)
+    result.seconds = time.perf_counter() - t0
+    return result
 
 
-def save_plans_to_db(raw_plans: list[dict]) -> int:
+@dataclass
+class PlanSaveResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+
+def save_plans_to_db(raw_plans: list[dict], batch_size: int = 500) -> PlanSaveResult:
     """Upsert raw API plan records into the database.
 
-    Returns the number of plans saved.
+    Stored plans are looked up in chunks of ``batch_size`` and compared by a
+    content hash of their normalized fields, so only new or changed plans
+    are written.
+    Unchanged plans keep their previous ``fetched_at``.
+
+    Returns counts of inserted, updated and unchanged plans.
+    """
+    return save_plan_batches([raw_plans], batch_size)
+
+
+@metrics.timed(items=lambda r: r.total)
+def save_plan_batches(
+    batches: Iterable[list[dict]], batch_size: int = 500, progress=None
+) -> PlanSaveResult:
+    """Upsert successive batches of raw plans, committing after each batch.
+
+    See :func:`save_plans_to_db`.  Each batch is pulled from ``batches``
+    before its write transaction begins; the stored hashes of the batch's
+    plans are then read under the write lock, so plans another writer
+    added between batches are updated rather than inserted twice.
+    ``progress(rows_parsed, rows_written)`` is called before each commit.  If any plan changed, the
+    shared catalog snapshot is rewritten at the end.
     """
-    count = 0
+    result = PlanSaveResult()
+    parsed = 0
     now = datetime.utcnow()
+    table = ElectricityPlan.__table__
+    update_stmt = update(table).where(table.c.plan_id == bindparam("match_plan_id"))
+
+    for raw_plans in batches:
+        # Pull and normalize the batch first, so a slow source (the CSV
+        # download) never runs while the write lock is held.
+        incoming: dict[str, dict] = {}
+        for p in raw_plans:
+            fields = normalize_plan(p)
+            if fields is not None:
+                fields["content_hash"] = plan_content_hash(fields)
+                fields["fetched_at"] = now
+                incoming[fields["plan_id"]] = fields
+
+        database.begin_write()
+        existing = _stored_hashes(list(incoming), batch_size)
+
+        inserts: list[dict] = []
+        updates: list[dict] = []
+        for plan_id, fields in incoming.items():
+            if plan_id not in existing:
+                inserts.append(fields)
+            elif existing[plan_id] == fields["content_hash"]:
+                result.unchanged += 1
+            else:
+                updates.append({"match_plan_id": plan_id, **fields})
+
+        for i in range(0, len(inserts), batch_size):
+            db.session.execute(insert(table), inserts[i : i + batch_size])
+        for i in range(0, len(updates), batch_size):
+            db.session.execute(update_stmt, updates[i : i + batch_size])
+        result.inserted += len(inserts)
+        result.updated += len(updates)
+        parsed += len(raw_plans)
+
+        if inserts or updates:
+            versions.bump(versions.PLANS)
+        if progress is not None:
+            progress(parsed, result.inserted + result.updated)
+        db.session.commit()
+
+    if result.inserted or result.updated:
+        catalog.refresh_catalog()
+    return result
 
-    for p in raw_plans:
-        plan_id = str(p.get("plan_id") or p.get("idKey") or p.get("[idKey]", ""))
-        if not plan_id:
-            continue
-
-        existing = ElectricityPlan.query.filter_by(plan_id=plan_id).first()
-        plan = existing or ElectricityPlan(plan_id=plan_id)
-
-        plan.company_name = p.get("company_name", p.get("[Company Name]", ""))
-        plan.plan_name = p.get("plan_name", p.get("[Plan Name]", ""))
-        plan.plan_type = p.get("plan_type", p.get("[Plan Type]", ""))
-        plan.contract_length = _safe_int(p.get("contract_length") or p.get("[Term Value]"))
-        plan.price_kwh_500 = _safe_float(p.get("price_kwh500") or p.get("[Price/kWh 500]"))
-        plan.price_kwh_1000 = _safe_float(p.get("price_kwh1000") or p.get("[Price/kWh 1000]"))
-        plan.price_kwh_2000 = _safe_float(p.get("price_kwh2000") or p.get("[Price/kWh 2000]"))
-        plan.base_charge = _safe_float(p.get("base_charge") or p.get("[Base Charge]"))
-        plan.cancellation_fee = _safe_float(
+
+def _batched(items: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _plan_id(p: dict) -> str:
+    """A raw API or CSV plan record's id, or "" when it has none."""
+    return str(p.get("plan_id") or p.get("idKey") or p.get("[idKey]", ""))
+
+
+def _stored_hashes(plan_ids: list[str], batch_size: int) -> dict[str, str]:
+    """plan_id -> content_hash of the stored plans among ``plan_ids``."""
+    table = ElectricityPlan.__table__
+    hashes: dict[str, str] = {}
+    for i in range(0, len(plan_ids), batch_size):
+        stmt = select(table.c.plan_id, table.c.content_hash).where(
+            table.c.plan_id.in_(plan_ids[i : i + batch_size])
+        )
+        hashes.update(db.session.execute(stmt).all())
+    return hashes
+
+
+def normalize_plan(p: dict) -> dict | None:
+    """Map an API or CSV plan record onto ElectricityPlan column values.
+
+    The plan's bill curve is compiled here, from the prices and any credit
+    or minimum-usage terms, and stored with it (see services.rate_curve).
+    """
+    plan_id = _plan_id(p)
+    if not plan_id:
+        return None
+
+    fields = {
+        "plan_id": plan_id,
+        "company_name": p.get("company_name", p.get("[Company Name]", "")),
+        "plan_name": p.get("plan_name", p.get("[Plan Name]", "")),
+        "plan_type": p.get("plan_type", p.get("[Plan Type]", "")),
+        "contract_length": _safe_int(p.get("contract_length") or p.get("[Term Value]")),
+        "price_kwh_500": _safe_float(p.get("price_kwh500") or p.get("[Price/kWh 500]")),
+        "price_kwh_1000": _safe_float(p.get("price_kwh1000") or p.get("[Price/kWh 1000]")),
+        "price_kwh_2000": _safe_float(p.get("price_kwh2000") or p.get("[Price/kWh 2000]")),
+        "base_charge": _safe_float(p.get("base_charge") or p.get("[Base Charge]")),
+        "cancellation_fee": _safe_float(
             p.get("cancellation_fee") or p.get("[Early Termination/Cancel Fee]")
+        ),
+        "renewable_pct": _safe_float(p.get("renewable_pct") or p.get("[Renewable %]")),
+        "is_time_of_use": _safe_bool(p.get("timeofuse") or p.get("[Time of Use]")),
+    }
+    terms = " ".join(
+        str(p.get(key) or "")
+        for key in (
+            "special_terms",
+            "pricing_details",
+            "promotion_desc",
+            "[Special Terms]",
+            "[Pricing Details]",
+            "[Promotion Description]",
         )
-        plan.renewable_pct = _safe_float(p.get("renewable_pct") or p.get("[Renewable %]"))
-        plan.is_time_of_use = bool(p.get("timeofuse") or p.get("[Time of Use]"))
-        plan.fetched_at = now
+    )
+    curve = compile_curve(fields, terms)
+    fields["rate_curve"] = curve.to_json() if curve else None
+    return fields
 
-        if not existing:
-            db.session.add(plan)
-        count += 1
 
-    db.session.commit()
-    return count
+def plan_content_hash(fields: dict) -> str:
+    """Stable hash of normalized plan fields (excluding bookkeeping columns)."""
+    payload = {k: v for k, v in fields.items() if k not in _UNHASHED_FIELDS}
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
 
 
 def _safe_float(val) -> float | None:
@@ -81,6 +381,12 @@ def _safe_float(val) -> float | None:
         return None
 
 
+def _safe_bool(val) -> bool:
+    if isinstance(val, str):
+        return val.strip().lower() in {"true", "yes", "y", "1"}
+    return bool(val)
+
+
 def _safe_int(val) -> int | None:
     if val is None:
         return None
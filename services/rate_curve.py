@@ -0,0 +1,251 @@
+"""Piecewise-linear monthly bill curves for electricity plans.
+
+A plan's bill as a function of monthly kWh is stored as four linear
+segments starting at the published usage points (0, 500, 1000, 2000 kWh;
+the last one extends indefinitely) plus step adjustments: bill credits and
+minimum-usage fees that switch on or off at a usage threshold.
+
+Curves are compiled once when a plan is fetched (see
+services.ptc_client.normalize_plan) and stored as JSON in
+``ElectricityPlan.rate_curve``.  :func:`evaluate` prices many plans over
+many months in one vectorized pass; :meth:`RateCurve.cost` is the scalar
+equivalent and performs the same float operations in the same order.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field
+
+import numpy as np
+
+BREAKPOINTS = (0.0, 500.0, 1000.0, 2000.0)
+_BREAKPOINTS = np.array(BREAKPOINTS)
+
+Step = tuple[float, float]  # (threshold kWh, dollars added when usage >= threshold)
+
+
+@dataclass
+class RateCurve:
+    costs: list[float]  # bill at the start of each segment, dollars
+    slopes: list[float]  # dollars per kWh within each segment
+    steps: list[Step] = field(default_factory=list)
+
+    def cost(self, kwh: float) -> float:
+        i = min(max(bisect_right(BREAKPOINTS, kwh) - 1, 0), len(BREAKPOINTS) - 1)
+        total = self.costs[i] + (kwh - BREAKPOINTS[i]) * self.slopes[i]
+        for threshold, delta in self.steps:
+            total += delta if kwh >= threshold else 0.0
+        return total
+
+    def to_json(self) -> str:
+        return json.dumps({"costs": self.costs, "slopes": self.slopes, "steps": self.steps})
+
+    @classmethod
+    def from_json(cls, text: str) -> RateCurve:
+        data = json.loads(text)
+        return cls(data["costs"], data["slopes"], [tuple(s) for s in data["steps"]])
+
+
+def compile_curve(fields: dict, terms: str = "") -> RateCurve | None:
+    """Build the bill curve of a plan from its column values and terms text.
+
+    Rate components (energy_charge etc.) take precedence, as in
+    ElectricityPlan.estimate_monthly_cost.  Otherwise the curve is fitted
+    through the published 500/1000/2000 kWh average prices after taking
+    out the credits and fees parsed from ``terms`` (the published prices
+    already include them), so the steps land at their real thresholds.
+    Returns None when the plan has no usable prices.
+    """
+    fixed, steps = parse_bill_terms(terms)
+
+    def adjustment(kwh: float) -> float:
+        return fixed + sum(delta for threshold, delta in steps if kwh >= threshold)
+
+    if fields.get("energy_charge") is not None:
+        rate = fields["energy_charge"] + (fields.get("tdu_per_kwh") or 0)
+        base = (fields.get("base_charge") or 0) + (fields.get("tdu_delivery_charge") or 0)
+        return RateCurve(
+            costs=[base + fixed + rate * x for x in BREAKPOINTS],
+            slopes=[rate] * len(BREAKPOINTS),
+            steps=steps,
+        )
+
+    tiers = ((500.0, "price_kwh_500"), (1000.0, "price_kwh_1000"), (2000.0, "price_kwh_2000"))
+    points = [
+        (kwh, fields[key] * kwh / 100 - adjustment(kwh)) for kwh, key in tiers if fields.get(key)
+    ]
+    if not points:
+        return None
+
+    # Intercept (fixed monthly charge) from the first two points, never negative.
+    if len(points) == 1:
+        intercept = 0.0
+    else:
+        (x1, y1), (x2, y2) = points[:2]
+        intercept = max(y1 - x1 * (y2 - y1) / (x2 - x1), 0.0)
+    knots = [(0.0, intercept)] + points
+
+    costs, slopes = [], []
+    for x in BREAKPOINTS:
+        j = min(max(k for k, (kx, _) in enumerate(knots) if kx <= x), len(knots) - 2)
+        (x0, y0), (x1, y1) = knots[j], knots[j + 1]
+        slope = (y1 - y0) / (x1 - x0)
+        costs.append(y0 + (x - x0) * slope + fixed)
+        slopes.append(slope)
+    return RateCurve(costs, slopes, steps)
+
+
+_SENTENCE = re.compile(r"(?<!\d)\.|\.(?!\d)|[;\n]")  # not the dot in "$9.95"
+_MONEY = re.compile(r"\$\s*(\d+(?:\.\d+)?)")
+_KWH = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*kwh", re.IGNORECASE)
+_KWH_RANGE = re.compile(
+    r"(\d[\d,]*)\s*(?:kwh\s*)?(?:-|to|and)\s*(\d[\d,]*)\s*kwh", re.IGNORECASE
+)
+
+
+def parse_bill_terms(text: str) -> tuple[float, list[Step]]:
+    """Parse usage credits and minimum-usage fees from plan terms.
+
+    Recognizes sentences such as "$100 bill credit when usage is 1000 kWh
+    or more", "$50 credit for usage between 1000 and 2000 kWh" and
+    "$9.95 minimum usage fee if usage is less than 500 kWh".  Returns the
+    fixed amount added to every bill and the list of steps; window upper
+    bounds are inclusive to the whole kWh.
+    """
+    fixed = 0.0
+    steps: list[Step] = []
+    for sentence in _SENTENCE.split(text or ""):
+        lower = sentence.lower()
+        money = _MONEY.search(sentence)
+        kwh = [float(k.replace(",", "")) for k in _KWH.findall(sentence)]
+        if not money or not kwh:
+            continue
+        amount = float(money.group(1))
+        if "fee" in lower and ("less than" in lower or "below" in lower or "under" in lower):
+            # Charged below the threshold: add it everywhere, take it off at the threshold.
+            fixed += amount
+            steps.append((kwh[0], -amount))
+        elif "credit" in lower:
+            window = _KWH_RANGE.search(sentence)
+            if window:
+                low, high = (float(g.replace(",", "")) for g in window.groups())
+                steps += [(low, -amount), (high + 1, amount)]
+            else:
+                steps.append((kwh[0], -amount))
+    return fixed, sorted(steps)
+
+
+def plan_curve(plan) -> RateCurve | None:
+    """The stored curve of an ElectricityPlan, or one compiled from its columns."""
+    if plan.rate_curve:
+        return RateCurve.from_json(plan.rate_curve)
+    return compile_curve(
+        {
+            "energy_charge": plan.energy_charge,
+            "base_charge": plan.base_charge,
+            "tdu_delivery_charge": plan.tdu_delivery_charge,
+            "tdu_per_kwh": plan.tdu_per_kwh,
+            "price_kwh_500": plan.price_kwh_500,
+            "price_kwh_1000": plan.price_kwh_1000,
+            "price_kwh_2000": plan.price_kwh_2000,
+        }
+    )
+
+
+@dataclass
+class CurveArrays:
+    """Curves of many plans as arrays; plans without a curve are all NaN."""
+
+    costs: np.ndarray  # (plans, segments)
+    slopes: np.ndarray  # (plans, segments)
+    step_kwh: np.ndarray  # (plans, max steps), padded with inf
+    step_delta: np.ndarray  # (plans, max steps), padded with 0
+
+    @classmethod
+    def from_curves(cls, curves: list[RateCurve | None]) -> CurveArrays:
+        n, segments = len(curves), len(BREAKPOINTS)
+        width = max((len(c.steps) for c in curves if c is not None), default=0)
+        arrays = cls(
+            costs=np.full((n, segments), np.nan),
+            slopes=np.full((n, segments), np.nan),
+            step_kwh=np.full((n, width), np.inf),
+            step_delta=np.zeros((n, width)),
+        )
+        for i, curve in enumerate(curves):
+            if curve is None:
+                continue
+            arrays.costs[i] = curve.costs
+            arrays.slopes[i] = curve.slopes
+            for s, (threshold, delta) in enumerate(curve.steps):
+                arrays.step_kwh[i, s] = threshold
+                arrays.step_delta[i, s] = delta
+        return arrays
+
+    def take(self, rows) -> CurveArrays:
+        """The curves of the selected plan rows (an index array or mask)."""
+        return CurveArrays(
+            self.costs[rows], self.slopes[rows], self.step_kwh[rows], self.step_delta[rows]
+        )
+
+
+def evaluate(curves: CurveArrays, monthly_kwh: np.ndarray) -> np.ndarray:
+    """Bill of every plan for every month: a (plans, months) array of dollars."""
+    kwh = np.asarray(monthly_kwh, dtype=np.float64)
+    seg = np.clip(np.searchsorted(_BREAKPOINTS, kwh, side="right") - 1, 0, len(BREAKPOINTS) - 1)
+    offset = (kwh - _BREAKPOINTS[seg])[np.newaxis, :]
+    total = curves.costs[:, seg] + offset * curves.slopes[:, seg]
+    for s in range(curves.step_kwh.shape[1]):
+        applies = kwh[np.newaxis, :] >= curves.step_kwh[:, s, np.newaxis]
+        total += np.where(applies, curves.step_delta[:, s, np.newaxis], 0.0)
+    return total
+
+
+def convex_floor(
+    curves: CurveArrays, kwh: float, min_kwh: float = 0.0, max_kwh: float = np.inf
+) -> np.ndarray:
+    """Per plan, a lower bound on the mean monthly bill of months averaging ``kwh``.
+
+    The bill without steps is bounded by its convex minorant: the lowest
+    chord between segment end points that spans ``kwh``, or a ray along
+    the last segment's slope (every segment end point, with that slope,
+    lies on or under the bill further out).  Being convex, the minorant at
+    the average usage is at most the average of its values (Jensen), so
+    ``months * floor`` bounds a total bill from the month count and total
+    kWh alone.  Steps add their lowest running total over the thresholds a
+    month between ``min_kwh`` and ``max_kwh`` can reach.  Plans without a
+    curve get NaN.
+    """
+    last = len(BREAKPOINTS) - 1
+    seg_end = _BREAKPOINTS[1:] - _BREAKPOINTS[:-1]
+    xs = np.concatenate([_BREAKPOINTS, _BREAKPOINTS[1:]])
+    ys = np.concatenate(
+        [curves.costs, curves.costs[:, :last] + seg_end * curves.slopes[:, :last]], axis=1
+    )
+
+    # Rays from every point at or before kwh.
+    before = xs <= kwh
+    floor = (ys[:, before] + (kwh - xs[before]) * curves.slopes[:, last:]).min(axis=1)
+    # Chords between a point before and a point after kwh.
+    for a in np.flatnonzero(before):
+        for b in np.flatnonzero(xs >= kwh):
+            if xs[b] > xs[a]:
+                w = (kwh - xs[a]) / (xs[b] - xs[a])
+                floor = np.minimum(floor, ys[:, a] + w * (ys[:, b] - ys[:, a]))
+            elif xs[b] == xs[a]:
+                floor = np.minimum(floor, np.minimum(ys[:, a], ys[:, b]))
+
+    if curves.step_kwh.shape[1]:
+        by_threshold = np.argsort(curves.step_kwh, axis=1, kind="stable")
+        thresholds = np.take_along_axis(curves.step_kwh, by_threshold, axis=1)
+        deltas = np.take_along_axis(curves.step_delta, by_threshold, axis=1)
+        # running[:, m]: the steps' sum with the first m thresholds reached.
+        running = np.cumsum(np.pad(deltas, ((0, 0), (1, 0))), axis=1)
+        reached = np.arange(running.shape[1])[np.newaxis, :]
+        lo = (thresholds <= min_kwh).sum(axis=1, keepdims=True)
+        hi = (thresholds <= max_kwh).sum(axis=1, keepdims=True)
+        possible = (reached >= lo) & (reached <= hi)
+        floor = floor + np.where(possible, running, np.inf).min(axis=1)
+    return floor
@@ -0,0 +1,50 @@
+"""Memoized repricing results keyed on request parameters and data versions."""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Sequence
+
+from flask import current_app
+
+from services import versions
+from services.cache import LRUCache
+from services.repricer import PlanCostEstimate, reprice_usage
+
+
+def get_cache() -> LRUCache:
+    """The repricing cache of the current app (one per worker process)."""
+    ext = current_app.extensions
+    if "reprice_cache" not in ext:
+        ext["reprice_cache"] = LRUCache(current_app.config.get("REPRICE_CACHE_SIZE", 64))
+    return ext["reprice_cache"]
+
+
+def cached_reprice(
+    esiid: str,
+    plan_ids: list[int] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    top_k: int | None = None,
+) -> Sequence[PlanCostEstimate]:
+    """reprice_usage, memoized until this ESIID's usage or the plan catalog changes.
+
+    Versions are read from the database, so an upload or plan fetch in any
+    worker invalidates entries everywhere.
+    """
+    usage_version, plans_version = versions.get(versions.usage_key(esiid), versions.PLANS)
+    key = (
+        esiid,
+        start,
+        end,
+        tuple(sorted(plan_ids)) if plan_ids else None,
+        top_k,
+        usage_version,
+        plans_version,
+    )
+    cache = get_cache()
+    results = cache.get(key)
+    if results is None:
+        results = reprice_usage(esiid, plan_ids=plan_ids, start=start, end=end, top_k=top_k)
+        cache.put(key, results)
+    return results
@@ -2,18 +2,21 @@
 
 from __future__ import annotations
 
+from collections.abc import Sequence
 from dataclasses import dataclass
 from datetime import date
 
-from models import ElectricityPlan, UsageRecord, db
+import heapq
 
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
 
-@dataclass
-class MonthlyUsage:
-    year: int
-    month: int
-    total_kwh: float
-    days: int
+from models import ElectricityPlan, db
+from services import metrics
+from services.catalog import PlanCatalog, get_catalog
+from services.rate_curve import CurveArrays, convex_floor, evaluate, plan_curve
+from services.rollup import MonthlyUsage, monthly_totals
 
 
 @dataclass
@@ -25,79 +28,295 @@ class PlanCostEstimate:
     avg_price_per_kwh: float  # cents
 
 
+@dataclass
+class PlanRates:
+    """Bill curves of many plans as arrays (one row per plan), ordered by id."""
+
+    plan_ids: np.ndarray  # ElectricityPlan.id, int64
+    curves: CurveArrays
+    catalog: PlanCatalog | None = None  # the snapshot the rates were read from
+
+    def __len__(self) -> int:
+        return len(self.plan_ids)
+
+    def take(self, rows) -> PlanRates:
+        """The rates of the selected plan rows, in the given order."""
+        return PlanRates(self.plan_ids[rows], self.curves.take(rows), self.catalog)
+
+
+# Plans priced per round of the top-K search, as a multiple of K.
+TOP_K_BATCH = 4
+TOP_K_MIN_BATCH = 256
+# Slack for rounding totals to cents when comparing bounds with them.
+BOUND_MARGIN = 0.01
+
+
+def load_plan_rates(plan_ids: list[int] | None = None) -> PlanRates:
+    """Load the bill curves of the selected plans (all if None), ordered by id.
+
+    Plans stored without a compiled curve (e.g. added by hand) get one
+    compiled from their rate columns.  When the shared catalog snapshot is
+    available the arrays are read from it (views, for all plans) instead of
+    the database.
+    """
+    catalog = get_catalog()
+    if catalog is not None:
+        if not plan_ids:
+            return PlanRates(catalog.ids, catalog.curves, catalog)
+        rows = catalog.positions(plan_ids)
+        return PlanRates(catalog.ids[rows], catalog.curves.take(rows), catalog)
+
+    table = ElectricityPlan.__table__
+    stmt = select(
+        table.c.id,
+        table.c.rate_curve,
+        table.c.energy_charge,
+        table.c.base_charge,
+        table.c.tdu_delivery_charge,
+        table.c.tdu_per_kwh,
+        table.c.price_kwh_500,
+        table.c.price_kwh_1000,
+        table.c.price_kwh_2000,
+    ).order_by(table.c.id)
+    if plan_ids:
+        stmt = stmt.where(table.c.id.in_(plan_ids))
+    rows = db.session.execute(stmt).all()
+
+    return PlanRates(
+        plan_ids=np.array([r.id for r in rows], dtype=np.int64),
+        curves=CurveArrays.from_curves([plan_curve(r) for r in rows]),
+    )
+
+
+def compute_cost_matrix(rates: PlanRates, monthly_kwh: np.ndarray) -> np.ndarray:
+    """Vectorized ElectricityPlan.estimate_monthly_cost over plans x months.
+
+    Returns a (plans, months) array of dollar costs, NaN where a plan has
+    no usable rate.
+    """
+    return evaluate(rates.curves, monthly_kwh)
+
+
 def get_monthly_usage(esiid: str, start: date | None = None, end: date | None = None) -> list[MonthlyUsage]:
-    """Aggregate daily usage into monthly totals."""
-    query = UsageRecord.query.filter_by(esiid=esiid)
-    if start:
-        query = query.filter(UsageRecord.date >= start)
-    if end:
-        query = query.filter(UsageRecord.date <= end)
+    """Monthly usage totals for an ESIID, read from the monthly rollup."""
+    return monthly_totals(esiid, start, end)
+
+
+class RepriceResults(Sequence):
+    """Plans ranked by total cost, materialized as PlanCostEstimate on access.
 
-    records = query.order_by(UsageRecord.date).all()
+    Costs for every plan are computed up front as arrays; the plan and its
+    monthly breakdown are only loaded for the entries that are actually
+    indexed, sliced or iterated.
+    """
+
+    _PAGE = 200
+
+    def __init__(
+        self,
+        rates: PlanRates,
+        monthly_usage: list[MonthlyUsage],
+        costs: np.ndarray,
+        plans_considered: int | None = None,
+        plans_evaluated: int | None = None,
+    ):
+        # Top-K results hold only the winners; of the ``plans_considered``,
+        # ``plans_evaluated`` were priced and the rest pruned by their bound.
+        self.plans_considered = len(rates) if plans_considered is None else plans_considered
+        self.plans_evaluated = len(rates) if plans_evaluated is None else plans_evaluated
+        self._monthly_usage = monthly_usage
+        self._costs = costs
+        self._valid = ~np.isnan(costs)
+
+        # Accumulate month by month so totals match a sequential Python sum.
+        total = np.zeros(len(rates))
+        total_kwh = np.zeros(len(rates))
+        for j, mu in enumerate(monthly_usage):
+            total += np.where(self._valid[:, j], costs[:, j], 0.0)
+            total_kwh += np.where(self._valid[:, j], mu.total_kwh, 0.0)
+        num_months = np.maximum(self._valid.sum(axis=1), 1)
+
+        self._total = total
+        self._avg_monthly = total / num_months
+        self._avg_price = (
+            np.divide(total, total_kwh, out=np.zeros_like(total), where=total_kwh > 0) * 100
+        )
+        self._total_rounded = [round(t, 2) for t in total.tolist()]
+        self._order = np.argsort(np.array(self._total_rounded), kind="stable")
+        self._plan_ids = rates.plan_ids
+        self._catalog = rates.catalog
+        self._cache: dict[int, PlanCostEstimate] = {}
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            ranks = range(*index.indices(len(self)))
+            self._materialize(ranks)
+            return [self._cache[r] for r in ranks]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RepriceResults index out of range")
+        self._materialize([index])
+        return self._cache[index]
+
+    def __iter__(self):
+        for start in range(0, len(self), self._PAGE):
+            yield from self[start : start + self._PAGE]
+
+    @property
+    def total_costs(self) -> list[float]:
+        """Rounded total cost of every plan, in ranked order."""
+        return [self._total_rounded[i] for i in self._order]
+
+    def cost_frame(self) -> pd.DataFrame:
+        """Long-form (plan, month) costs in ranked order, built from the arrays.
 
-    monthly: dict[tuple[int, int], MonthlyUsage] = {}
-    for rec in records:
-        key = (rec.date.year, rec.date.month)
-        if key not in monthly:
-            monthly[key] = MonthlyUsage(year=key[0], month=key[1], total_kwh=0.0, days=0)
-        monthly[key].total_kwh += rec.usage_kwh
-        monthly[key].days += 1
+        Columns: rank, plan_db_id, total_cost, year, month, kwh,
+        estimated_cost.  Cells without a usable rate are omitted.
+        """
+        n_plans, n_months = len(self._order), len(self._monthly_usage)
+        ranks = np.repeat(np.arange(1, n_plans + 1), n_months)
+        valid = self._valid[self._order].ravel()
+        return pd.DataFrame(
+            {
+                "rank": ranks,
+                "plan_db_id": np.repeat(self._plan_ids[self._order], n_months),
+                "total_cost": np.repeat(np.array(self.total_costs), n_months),
+                "year": np.tile([mu.year for mu in self._monthly_usage], n_plans),
+                "month": np.tile([mu.month for mu in self._monthly_usage], n_plans),
+                "kwh": np.tile(
+                    np.round([mu.total_kwh for mu in self._monthly_usage], 2), n_plans
+                ),
+                "estimated_cost": np.round(self._costs[self._order].ravel(), 2),
+            }
+        )[valid].reset_index(drop=True)
 
-    return sorted(monthly.values(), key=lambda m: (m.year, m.month))
+    def _materialize(self, ranks) -> None:
+        missing = [r for r in ranks if r not in self._cache]
+        if not missing:
+            return
+        ids = [int(self._plan_ids[self._order[r]]) for r in missing]
+        # Transient (session-less) plan objects, so results can outlive the
+        # request that computed them, e.g. in the repricing cache.
+        if self._catalog is not None:
+            catalog = self._catalog
+            plans = {int(catalog.ids[i]): catalog.plan(i) for i in catalog.positions(ids)}
+        else:
+            table = ElectricityPlan.__table__
+            plans = {
+                row.id: ElectricityPlan(**row._mapping)
+                for row in db.session.execute(select(table).where(table.c.id.in_(ids)))
+            }
+        for rank, plan_id in zip(missing, ids):
+            self._cache[rank] = self._build(self._order[rank], plans[plan_id])
+
+    def _build(self, i: int, plan: ElectricityPlan) -> PlanCostEstimate:
+        monthly_costs = [
+            {
+                "year": mu.year,
+                "month": mu.month,
+                "kwh": round(mu.total_kwh, 2),
+                "estimated_cost": round(float(self._costs[i, j]), 2),
+            }
+            for j, mu in enumerate(self._monthly_usage)
+            if self._valid[i, j]
+        ]
+        return PlanCostEstimate(
+            plan=plan,
+            monthly_costs=monthly_costs,
+            total_cost=self._total_rounded[i],
+            avg_monthly_cost=round(float(self._avg_monthly[i]), 2),
+            avg_price_per_kwh=round(float(self._avg_price[i]), 2),
+        )
 
 
+@metrics.timed(items=len)
 def reprice_usage(
     esiid: str,
     plan_ids: list[int] | None = None,
     start: date | None = None,
     end: date | None = None,
-) -> list[PlanCostEstimate]:
+    top_k: int | None = None,
+) -> Sequence[PlanCostEstimate]:
     """Calculate what historical usage would cost under each selected plan.
 
-    If plan_ids is None, all plans in the database are used.
+    If plan_ids is None, all plans in the database are used.  The full
+    plan x month cost matrix is computed with NumPy; results are ranked by
+    total cost and behave like a list of PlanCostEstimate.
+
+    With ``top_k`` only the ``top_k`` cheapest plans are returned, ranked
+    exactly as in the full list; see :func:`select_top_k`.
     """
     monthly_usage = get_monthly_usage(esiid, start, end)
     if not monthly_usage:
         return []
 
-    if plan_ids:
-        plans = ElectricityPlan.query.filter(ElectricityPlan.id.in_(plan_ids)).all()
-    else:
-        plans = ElectricityPlan.query.all()
-
-    results = []
-    for plan in plans:
-        monthly_costs = []
-        total = 0.0
-        total_kwh = 0.0
-
-        for mu in monthly_usage:
-            cost = plan.estimate_monthly_cost(mu.total_kwh)
-            if cost is not None:
-                monthly_costs.append(
-                    {
-                        "year": mu.year,
-                        "month": mu.month,
-                        "kwh": round(mu.total_kwh, 2),
-                        "estimated_cost": round(cost, 2),
-                    }
-                )
-                total += cost
-                total_kwh += mu.total_kwh
-
-        num_months = len(monthly_costs) or 1
-        avg_monthly = total / num_months
-        avg_price = (total / total_kwh * 100) if total_kwh > 0 else 0
-
-        results.append(
-            PlanCostEstimate(
-                plan=plan,
-                monthly_costs=monthly_costs,
-                total_cost=round(total, 2),
-                avg_monthly_cost=round(avg_monthly, 2),
-                avg_price_per_kwh=round(avg_price, 2),
-            )
-        )
+    rates = load_plan_rates(plan_ids)
+    monthly_kwh = np.array([mu.total_kwh for mu in monthly_usage])
+    if top_k is not None:
+        rows, costs, evaluated = select_top_k(rates, monthly_kwh, top_k)
+        return RepriceResults(rates.take(rows), monthly_usage, costs, len(rates), evaluated)
+    costs = compute_cost_matrix(rates, monthly_kwh)
+    return RepriceResults(rates, monthly_usage, costs)
+
+
+def select_top_k(
+    rates: PlanRates, monthly_kwh: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """Find the ``k`` plans with the lowest total cost without pricing them all.
+
+    Each plan's total has a cheap lower bound: its convex floor
+    (services.rate_curve.convex_floor) at the period's average monthly kWh,
+    given its lowest and highest month, times the number of months.  Plans
+    are priced in rounds in order of that bound while a heap keeps the best
+    ``k`` (total rounded to cents, then plan order, as RepriceResults ranks
+    them); once the next bound exceeds the k-th best total, no remaining
+    plan can make the cut.
+
+    Returns the winners' row positions in ``rates`` (ascending), their
+    (winners, months) cost matrix and the number of plans priced.
+    """
+    k = max(k, 0)
+    months = len(monthly_kwh)
+    floor = convex_floor(
+        rates.curves,
+        float(monthly_kwh.mean()),
+        float(monthly_kwh.min()) if months else 0.0,
+        float(monthly_kwh.max()) if months else np.inf,
+    )
+    # Plans without a curve total 0 (no month is priced), which is exact.
+    bound = np.where(np.isnan(floor), 0.0, months * floor)
+    order = np.argsort(bound, kind="stable")
+    batch = max(k * TOP_K_BATCH, TOP_K_MIN_BATCH)
+
+    best: list[tuple[float, int]] = []  # max-heap of (-total, -row) over the best k
+    priced: dict[int, np.ndarray] = {}
+    evaluated = 0
+    for start in range(0, len(order) if k else 0, batch):
+        rows = order[start : start + batch]
+        if len(best) == k and bound[rows[0]] > -best[0][0] + BOUND_MARGIN:
+            break
+        costs = evaluate(rates.curves.take(rows), monthly_kwh)
+        evaluated += len(rows)
+        # Month by month, like RepriceResults, so the rounded totals agree.
+        totals = np.cumsum(np.where(np.isnan(costs), 0.0, costs), axis=1)[:, -1]
+        if len(best) == k:
+            keep = totals < -best[0][0] + BOUND_MARGIN
+            rows, totals, costs = rows[keep], totals[keep], costs[keep]
+        for row, total, cost in zip(rows.tolist(), totals.tolist(), costs):
+            entry = (-round(total, 2), -row)
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                evicted = -heapq.heappushpop(best, entry)[1]
+                priced.pop(evicted, None)
+            else:
+                continue
+            priced[row] = cost
 
-    results.sort(key=lambda r: r.total_cost)
-    return results
+    winners = sorted(-row for _, row in best)
+    costs = np.array([priced[r] for r in winners]).reshape(len(winners), months)
+    return np.array(winners, dtype=np.int64), costs, evaluated
@@ -0,0 +1,319 @@
+"""Per-ESIID monthly usage rollup maintained alongside usage_records."""
+
+from __future__ import annotations
+
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import and_, case, delete, event, extract, func, insert, select
+from sqlalchemy.orm import Session, attributes
+
+from models import MonthlyUsageRollup, UsageRecord, db
+from services import database, metrics
+
+MonthKey = tuple[str, int, int]  # (esiid, year, month)
+
+_ROLLUP_COLUMNS = [
+    "esiid",
+    "year",
+    "month",
+    "total_kwh",
+    "days",
+    "estimated_days",
+    "min_kwh",
+    "max_kwh",
+]
+
+
+@dataclass
+class MonthlyUsage:
+    year: int
+    month: int
+    total_kwh: float
+    days: int
+    estimated_days: int = 0
+    min_kwh: float | None = None
+    max_kwh: float | None = None
+
+
+def month_keys(rows: Iterable) -> set[MonthKey]:
+    """Months touched by rows with ``esiid`` and ``date`` attributes or keys."""
+    keys = set()
+    for row in rows:
+        esiid, day = (row["esiid"], row["date"]) if isinstance(row, dict) else (row.esiid, row.date)
+        keys.add((esiid, day.year, day.month))
+    return keys
+
+
+def refresh_rollup(keys: Iterable[MonthKey], executor=None) -> None:
+    """Recompute the rollup rows for the given months from usage_records.
+
+    Runs on ``executor`` (a Session or Connection, default db.session) so
+    it joins the caller's transaction.
+    """
+    executor = executor if executor is not None else db.session
+    by_esiid: dict[str, set[int]] = {}
+    for esiid, year, month in keys:
+        by_esiid.setdefault(esiid, set()).add(year * 12 + month - 1)
+
+    roll_index = MonthlyUsageRollup.year * 12 + MonthlyUsageRollup.month - 1
+    for esiid, indexes in by_esiid.items():
+        executor.execute(
+            delete(MonthlyUsageRollup).where(
+                MonthlyUsageRollup.esiid == esiid, roll_index.in_(sorted(indexes))
+            )
+        )
+        first = _month_start(min(indexes))
+        last = _month_end(max(indexes))
+        executor.execute(
+            _rollup_insert(
+                and_(
+                    UsageRecord.esiid == esiid,
+                    UsageRecord.date >= first,
+                    UsageRecord.date <= last,
+                ),
+                month_indexes=sorted(indexes),
+            )
+        )
+
+
+@metrics.timed()
+def rebuild_rollup(esiid: str | None = None) -> None:
+    """Rebuild the rollup (for one ESIID or all) from raw usage records."""
+    database.begin_write()
+    stmt = delete(MonthlyUsageRollup)
+    condition = UsageRecord.esiid == esiid if esiid else None
+    if esiid:
+        stmt = stmt.where(MonthlyUsageRollup.esiid == esiid)
+    db.session.execute(stmt)
+    db.session.execute(_rollup_insert(condition))
+    db.session.commit()
+
+
+def backfill_rollup() -> bool:
+    """Build the rollup of a database that has usage records but no rollup yet.
+
+    Databases created before the rollup existed get an empty monthly_usage
+    table from ``db.create_all()``; readers (dashboard, repricing) would
+    see no usage until it is filled.  Called at startup; returns True if
+    the rollup was built.
+    """
+    if db.session.execute(select(MonthlyUsageRollup.id).limit(1)).first() is not None:
+        return False
+    if db.session.execute(select(UsageRecord.id).limit(1)).first() is None:
+        return False
+    rebuild_rollup()
+    return True
+
+
+def check_rollup() -> list[MonthKey]:
+    """Return the months whose rollup row disagrees with usage_records."""
+    expected = {
+        (r.esiid, r.year, r.month): r for r in db.session.execute(_aggregate_select(None))
+    }
+    rollup_columns = [getattr(MonthlyUsageRollup, c) for c in _ROLLUP_COLUMNS]
+    actual = {(r.esiid, r.year, r.month): r for r in db.session.execute(select(*rollup_columns))}
+    mismatched = []
+    for key in sorted(expected.keys() | actual.keys()):
+        e, a = expected.get(key), actual.get(key)
+        if (
+            e is None
+            or a is None
+            or e.days != a.days
+            or e.estimated_days != a.estimated_days
+            or abs(e.total_kwh - a.total_kwh) > 1e-6
+            or e.min_kwh != a.min_kwh
+            or e.max_kwh != a.max_kwh
+        ):
+            mismatched.append(key)
+    return mismatched
+
+
+def monthly_totals(
+    esiid: str | None = None, start: date | None = None, end: date | None = None
+) -> list[MonthlyUsage]:
+    """Monthly usage for one ESIID (or summed over all), oldest first.
+
+    Whole months come from the rollup; a month only partly inside
+    [start, end] is aggregated from the raw daily rows for that window.
+    """
+    stmt = select(
+        MonthlyUsageRollup.year,
+        MonthlyUsageRollup.month,
+        func.sum(MonthlyUsageRollup.total_kwh),
+        func.sum(MonthlyUsageRollup.days),
+        func.sum(MonthlyUsageRollup.estimated_days),
+        func.min(MonthlyUsageRollup.min_kwh),
+        func.max(MonthlyUsageRollup.max_kwh),
+    ).group_by(MonthlyUsageRollup.year, MonthlyUsageRollup.month)
+    if esiid:
+        stmt = stmt.where(MonthlyUsageRollup.esiid == esiid)
+    stmt, partial = _restrict_months(stmt, start, end)
+
+    months = [MonthlyUsage(*row) for row in db.session.execute(stmt)]
+    for window_start, window_end in partial:
+        month = _aggregate_window(esiid, window_start, window_end)
+        if month is not None:
+            months.append(month)
+    return sorted(months, key=lambda m: (m.year, m.month))
+
+
+def monthly_totals_by_esiid(
+    esiids: list[str] | None = None, start: date | None = None, end: date | None = None
+) -> dict[str, list[MonthlyUsage]]:
+    """Monthly usage of many ESIIDs (all if None) in one rollup query.
+
+    Same month semantics as :func:`monthly_totals`; partial edge months
+    cost one grouped query each.  ESIIDs without usage are omitted.
+    """
+    stmt = select(
+        MonthlyUsageRollup.esiid,
+        MonthlyUsageRollup.year,
+        MonthlyUsageRollup.month,
+        MonthlyUsageRollup.total_kwh,
+        MonthlyUsageRollup.days,
+        MonthlyUsageRollup.estimated_days,
+        MonthlyUsageRollup.min_kwh,
+        MonthlyUsageRollup.max_kwh,
+    )
+    if esiids:
+        stmt = stmt.where(MonthlyUsageRollup.esiid.in_(esiids))
+    stmt, partial = _restrict_months(stmt, start, end)
+
+    by_esiid: dict[str, list[MonthlyUsage]] = {}
+    for esiid, *values in db.session.execute(stmt):
+        by_esiid.setdefault(esiid, []).append(MonthlyUsage(*values))
+    for window_start, window_end in partial:
+        for esiid, month in _aggregate_window_by_esiid(esiids, window_start, window_end):
+            by_esiid.setdefault(esiid, []).append(month)
+    return {
+        esiid: sorted(months, key=lambda m: (m.year, m.month))
+        for esiid, months in sorted(by_esiid.items())
+    }
+
+
+def register_listeners() -> None:
+    """Keep the rollup in sync with UsageRecord rows written through the ORM.
+
+    Bulk ingest (services.ingest) refreshes the rollup explicitly; this hook
+    covers objects added, changed or deleted through a session.
+    """
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    keys: set[MonthKey] = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, UsageRecord):
+            keys |= month_keys([obj])
+    for obj in session.dirty:
+        if not isinstance(obj, UsageRecord) or not session.is_modified(obj):
+            continue
+        keys |= month_keys([obj])
+        old_esiid = attributes.get_history(obj, "esiid").deleted or [obj.esiid]
+        old_date = attributes.get_history(obj, "date").deleted or [obj.date]
+        keys.add((old_esiid[0], old_date[0].year, old_date[0].month))
+    if keys:
+        refresh_rollup(keys, executor=session.connection())
+
+
+def _restrict_months(stmt, start: date | None, end: date | None):
+    """Limit a rollup query to whole months in [start, end].
+
+    Returns the statement and the (window_start, window_end) ranges of
+    partial edge months, which must be aggregated from raw rows.
+    """
+    roll_index = MonthlyUsageRollup.year * 12 + MonthlyUsageRollup.month - 1
+    partial: list[tuple[date, date]] = []
+    if start:
+        start_index = start.year * 12 + start.month - 1
+        if start.day != 1:
+            partial.append((start, min(_month_end(start_index), end or date.max)))
+            start_index += 1
+        stmt = stmt.where(roll_index >= start_index)
+    if end:
+        end_index = end.year * 12 + end.month - 1
+        if end != _month_end(end_index):
+            window_start = max(_month_start(end_index), start or date.min)
+            if not partial or partial[0][0] != window_start:
+                partial.append((window_start, end))
+            end_index -= 1
+        stmt = stmt.where(roll_index <= end_index)
+    return stmt, partial
+
+
+def _aggregate_select(condition, month_indexes: list[int] | None = None):
+    year = extract("year", UsageRecord.date)
+    month = extract("month", UsageRecord.date)
+    stmt = select(
+        UsageRecord.esiid,
+        year.label("year"),
+        month.label("month"),
+        func.sum(UsageRecord.usage_kwh).label("total_kwh"),
+        func.count().label("days"),
+        func.sum(case((UsageRecord.actual_estimated == "E", 1), else_=0)).label("estimated_days"),
+        func.min(UsageRecord.usage_kwh).label("min_kwh"),
+        func.max(UsageRecord.usage_kwh).label("max_kwh"),
+    ).group_by(UsageRecord.esiid, year, month)
+    if condition is not None:
+        stmt = stmt.where(condition)
+    if month_indexes is not None:
+        stmt = stmt.having((year * 12 + month - 1).in_(month_indexes))
+    return stmt
+
+
+def _rollup_insert(condition, month_indexes: list[int] | None = None):
+    return insert(MonthlyUsageRollup).from_select(
+        _ROLLUP_COLUMNS, _aggregate_select(condition, month_indexes)
+    )
+
+
+def _aggregate_window(esiid: str | None, start: date, end: date) -> MonthlyUsage | None:
+    stmt = select(
+        func.sum(UsageRecord.usage_kwh),
+        func.count(),
+        func.sum(case((UsageRecord.actual_estimated == "E", 1), else_=0)),
+        func.min(UsageRecord.usage_kwh),
+        func.max(UsageRecord.usage_kwh),
+    ).where(UsageRecord.date >= start, UsageRecord.date <= end)
+    if esiid:
+        stmt = stmt.where(UsageRecord.esiid == esiid)
+    total, days, estimated, lo, hi = db.session.execute(stmt).one()
+    if not days:
+        return None
+    return MonthlyUsage(start.year, start.month, total, days, estimated, lo, hi)
+
+
+def _aggregate_window_by_esiid(
+    esiids: list[str] | None, start: date, end: date
+) -> list[tuple[str, MonthlyUsage]]:
+    stmt = (
+        select(
+            UsageRecord.esiid,
+            func.sum(UsageRecord.usage_kwh),
+            func.count(),
+            func.sum(case((UsageRecord.actual_estimated == "E", 1), else_=0)),
+            func.min(UsageRecord.usage_kwh),
+            func.max(UsageRecord.usage_kwh),
+        )
+        .where(UsageRecord.date >= start, UsageRecord.date <= end)
+        .group_by(UsageRecord.esiid)
+    )
+    if esiids:
+        stmt = stmt.where(UsageRecord.esiid.in_(esiids))
+    return [
+        (esiid, MonthlyUsage(start.year, start.month, total, days, estimated, lo, hi))
+        for esiid, total, days, estimated, lo, hi in db.session.execute(stmt)
+    ]
+
+
+def _month_start(index: int) -> date:
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_end(index: int) -> date:
+    year, month = index // 12, index % 12 + 1
+    return date(year, month, calendar.monthrange(year, month)[1])
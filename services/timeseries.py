@@ -0,0 +1,132 @@
+"""Downsampled daily usage series and seasonal averages for charts."""
+
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy import func, select
+
+from models import UsageRecord, db
+from services import metrics
+from services.rollup import MonthlyUsage, monthly_totals
+
+SUMMER_MONTHS = range(4, 10)  # April - September, as shown in the chart legend
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+
+def lttb(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``n_out`` representative points.
+
+    Keeps the first and last points and, for each bucket in between, the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket.  ``y`` is assumed evenly spaced.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax_buckets(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the minimum and maximum of ``n_out // 2`` equal buckets."""
+    n = len(y)
+    buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        seg = y[lo:hi]
+        keep.extend(sorted({lo + int(np.argmin(seg)), lo + int(np.argmax(seg))}))
+    return np.array(keep, dtype=np.int64)
+
+
+_METHODS = {"lttb": lttb, "minmax": minmax_buckets}
+
+
+def daily_series(
+    esiid: str | None = None, start: date | None = None, end: date | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Daily kWh as (dates, values) arrays; summed across meters if esiid is None."""
+    stmt = select(UsageRecord.date, func.sum(UsageRecord.usage_kwh)).group_by(UsageRecord.date)
+    if esiid:
+        stmt = stmt.where(UsageRecord.esiid == esiid)
+    if start:
+        stmt = stmt.where(UsageRecord.date >= start)
+    if end:
+        stmt = stmt.where(UsageRecord.date <= end)
+    rows = db.session.execute(stmt.order_by(UsageRecord.date)).all()
+    dates = np.array([r[0] for r in rows], dtype="datetime64[D]")
+    values = np.array([r[1] for r in rows], dtype=np.float64)
+    return dates, values
+
+
+def seasonal_averages(months: np.ndarray, values: np.ndarray) -> dict[str, float | None]:
+    """Overall, summer (Apr-Sep) and winter (Oct-Mar) means of ``values``."""
+    summer = np.isin(months, SUMMER_MONTHS)
+
+    def mean(mask):
+        return round(float(values[mask].mean()), 3) if mask.any() else None
+
+    everything = np.ones(len(values), dtype=bool)
+    return {"overall": mean(everything), "summer": mean(summer), "winter": mean(~summer)}
+
+
+@metrics.timed()
+def usage_chart_series(
+    esiid: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    points: int = DEFAULT_POINTS,
+    method: str = "lttb",
+) -> dict:
+    """Chart payload for /usage: downsampled daily series, monthly totals, averages.
+
+    Averages are computed over the full-resolution data, so they do not
+    depend on the point budget.
+    """
+    if method not in _METHODS:
+        raise ValueError(f"Unknown downsampling method: {method!r}")
+    points = min(max(points, 3), MAX_POINTS)
+
+    dates, values = daily_series(esiid, start, end)
+    keep = _METHODS[method](values, points)
+    months: list[MonthlyUsage] = monthly_totals(esiid, start, end)
+    month_numbers = np.array([m.month for m in months], dtype=np.int64)
+    month_values = np.array([m.total_kwh for m in months], dtype=np.float64)
+
+    return {
+        "method": method,
+        "total_points": int(len(values)),
+        "daily": [
+            {"date": str(d), "kwh": round(float(v), 3)} for d, v in zip(dates[keep], values[keep])
+        ],
+        "monthly": [
+            {"label": f"{m.year:04d}-{m.month:02d}", "kwh": round(m.total_kwh, 1)} for m in months
+        ],
+        "averages": {
+            "daily": seasonal_averages(dates.astype("datetime64[M]").astype(int) % 12 + 1, values),
+            "monthly": seasonal_averages(month_numbers, month_values),
+        },
+    }
@@ -0,0 +1,193 @@
+"""Registry of ingested usage exports, so that re-uploads stay cheap.
+
+Smart Meter Texas exports are usually downloaded again with overlapping
+ranges, e.g. the last 13 months every month.  Every upload that is
+ingested completely is recorded with the SHA-256 of its bytes and, per
+ESIID, the runs of consecutive days it contained.  A later upload with
+the same hash is answered from the registry without being parsed.  For
+other uploads, rows of days inside a recorded run are dropped between the
+parser and services.ingest, so only new days are checked against the
+database.
+
+Coverage is written only after a whole file has been ingested, so a
+failed upload never hides days that were not stored.  A daily export
+covers usage records, while an interval export covers both usage and
+interval records.  Daily uploads therefore skip days covered by either
+kind, and interval uploads skip only interval coverage.  Editing or
+deleting a usage record through the ORM unregisters the uploads of its
+ESIID.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
+
+from models import Upload, UploadCoverage, UsageRecord, db
+from services import database
+
+# Coverage kinds that make a day redundant for each upload type.
+COVERED_BY = {"daily": ("daily", "interval"), "interval": ("interval",)}
+
+Run = tuple[str, date, date]  # (esiid, first day, last day), inclusive
+
+_ONE_DAY = timedelta(days=1)
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def find_upload(digest: str, file_type: str) -> Upload | None:
+    """The registered upload with this content hash and type, if any."""
+    return db.session.execute(
+        select(Upload).where(Upload.sha256 == digest, Upload.file_type == file_type)
+    ).scalar_one_or_none()
+
+
+class Coverage:
+    """Merged runs of covered days per ESIID, with a bisect membership test."""
+
+    def __init__(self, runs: Iterable[Run]):
+        by_esiid: dict[str, list[tuple[date, date]]] = {}
+        for esiid, start, end in runs:
+            by_esiid.setdefault(esiid, []).append((start, end))
+        self._starts: dict[str, list[date]] = {}
+        self._ends: dict[str, list[date]] = {}
+        for esiid, spans in by_esiid.items():
+            merged = _merge(sorted(spans))
+            self._starts[esiid] = [s for s, _ in merged]
+            self._ends[esiid] = [e for _, e in merged]
+
+    def __contains__(self, key: tuple[str, date]) -> bool:
+        esiid, day = key
+        starts = self._starts.get(esiid)
+        if not starts:
+            return False
+        i = bisect_right(starts, day) - 1
+        return i >= 0 and day <= self._ends[esiid][i]
+
+
+def load_coverage(file_type: str) -> Coverage:
+    """Days already stored by earlier uploads, as relevant to ``file_type``."""
+    if file_type not in COVERED_BY:
+        raise ValueError(f"Unknown file type: {file_type!r}")
+    table = UploadCoverage.__table__
+    stmt = select(table.c.esiid, table.c.start_date, table.c.end_date).where(
+        table.c.file_type.in_(COVERED_BY[file_type])
+    )
+    return Coverage(tuple(r) for r in db.session.execute(stmt))
+
+
+class UploadTracker:
+    """Filters one upload's parsed rows against coverage and records the upload.
+
+    Wrap the parser with :meth:`filter`; rows of covered days are counted
+    in ``covered`` and not passed on.  Every row (covered or not) counts
+    towards the file's own coverage, which :meth:`record` writes once the
+    ingest has finished.
+    """
+
+    def __init__(self, digest: str, file_type: str):
+        self.digest = digest
+        self.file_type = file_type
+        self.rows = 0
+        self.covered = 0
+        self._coverage = load_coverage(file_type)
+        self._days: dict[str, set[date]] = {}
+
+    def filter(self, rows: Iterable) -> Iterator:
+        for row in rows:
+            self.rows += 1
+            self._days.setdefault(row.esiid, set()).add(row.date)
+            if (row.esiid, row.date) in self._coverage:
+                self.covered += 1
+                continue
+            yield row
+
+    def runs(self) -> list[Run]:
+        """Runs of consecutive days seen so far, per ESIID."""
+        return [
+            (esiid, start, end)
+            for esiid, days in sorted(self._days.items())
+            for start, end in _merge((d, d) for d in sorted(days))
+        ]
+
+    def record(self, imported: int) -> None:
+        """Register the upload and its coverage in one write transaction."""
+        database.begin_write()
+        upload = Upload(
+            sha256=self.digest,
+            file_type=self.file_type,
+            rows=self.rows,
+            imported=imported,
+            created_at=datetime.utcnow(),
+        )
+        db.session.add(upload)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # The same file was registered concurrently by another worker.
+            db.session.rollback()
+            return
+        runs = self.runs()
+        if runs:
+            db.session.execute(
+                insert(UploadCoverage),
+                [
+                    {
+                        "upload_id": upload.id,
+                        "file_type": self.file_type,
+                        "esiid": esiid,
+                        "start_date": start,
+                        "end_date": end,
+                    }
+                    for esiid, start, end in runs
+                ],
+            )
+        db.session.commit()
+
+
+def _merge(spans: Iterable[tuple[date, date]]) -> list[tuple[date, date]]:
+    """Merge sorted (start, end) spans that overlap or touch."""
+    merged: list[tuple[date, date]] = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1] + _ONE_DAY:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def register_listeners() -> None:
+    """Forget uploads of ESIIDs whose usage records are edited or deleted via the ORM."""
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    esiids: set[str] = set()
+    for obj in list(session.deleted) + list(session.dirty):
+        if isinstance(obj, UsageRecord):
+            esiids.add(obj.esiid)
+            esiids.update(attributes.get_history(obj, "esiid").deleted)
+    if esiids:
+        # Forget the uploads too, so that re-uploading one restores the days.
+        affected = select(UploadCoverage.upload_id).where(UploadCoverage.esiid.in_(esiids))
+        upload_ids = session.connection().execute(affected).scalars().all()
+        session.connection().execute(
+            delete(UploadCoverage).where(UploadCoverage.upload_id.in_(upload_ids))
+        )
+        session.connection().execute(delete(Upload).where(Upload.id.in_(upload_ids)))
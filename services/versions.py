@@ -0,0 +1,65 @@
+"""Change counters for usage data and the plan catalog.
+
+Every committed write to usage_records bumps the "usage" version plus a
+per-meter "usage:<esiid>" version, and every write to electricity_plans bumps
+"plans".  Caches key their entries on these versions, so a write in one
+gunicorn worker invalidates the others' caches.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import DataVersion, ElectricityPlan, UsageRecord, db
+
+USAGE = "usage"
+PLANS = "plans"
+
+
+def usage_key(esiid: str) -> str:
+    """Version name for the usage data of a single ESIID."""
+    return f"{USAGE}:{esiid}"
+
+
+def bump(*names: str, executor=None) -> None:
+    """Increment the named versions inside the caller's transaction."""
+    executor = executor if executor is not None else db.session
+    for name in names:
+        result = executor.execute(
+            update(DataVersion)
+            .where(DataVersion.name == name)
+            .values(version=DataVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            executor.execute(insert(DataVersion).values(name=name, version=1))
+
+
+def get(*names: str) -> tuple[int, ...]:
+    """Current values of the named versions (0 for names never bumped)."""
+    rows = dict(
+        db.session.execute(
+            select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(names))
+        ).all()
+    )
+    return tuple(rows.get(name, 0) for name in names)
+
+
+def register_listeners() -> None:
+    """Bump versions for UsageRecord/ElectricityPlan changes made through the ORM.
+
+    Bulk writers (services.ingest, services.ptc_client) bump explicitly.
+    """
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, UsageRecord):
+            touched.update((USAGE, usage_key(obj.esiid)))
+        elif isinstance(obj, ElectricityPlan):
+            touched.add(PLANS)
+    if touched:
+        bump(*sorted(touched), executor=session.connection())
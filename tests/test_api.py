@@ -0,0 +1,95 @@
+"""Tests for the paginated and streaming JSON API."""
+
+import json
+import re
+from datetime import date, timedelta
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import db
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+from services.ptc_client import save_plans_to_db
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        rows = [
+            ParsedUsageRow(esiid, date(2025, 1, 1) + timedelta(days=i), float(i), "C", "A")
+            for esiid in ("2222222222222", "1111111111111")
+            for i in range(10)
+        ]
+        ingest_usage_rows(rows)
+        save_plans_to_db(
+            [{"plan_id": f"p{i}", "company_name": "Co", "plan_name": f"P{i}"} for i in range(5)]
+        )
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_usage_keyset_pages_cover_all_rows_in_order(client):
+    seen = []
+    url = "/api/usage?limit=7"
+    while url:
+        page = client.get(url).get_json()
+        seen.extend((r["esiid"], r["date"]) for r in page["data"])
+        url = page["next_cursor"] and f"/api/usage?limit=7&cursor={page['next_cursor']}"
+    assert len(seen) == 20
+    assert seen == sorted(seen)
+    assert seen[0] == ("1111111111111", "2025-01-01")
+
+
+def test_usage_filters(client):
+    page = client.get("/api/usage?esiid=2222222222222&start=2025-01-03&end=2025-01-05").get_json()
+    assert [r["date"] for r in page["data"]] == ["2025-01-03", "2025-01-04", "2025-01-05"]
+    assert page["next_cursor"] is None
+
+
+def test_usage_ndjson_stream(client):
+    resp = client.get("/api/usage?format=ndjson&esiid=1111111111111")
+    assert resp.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert len(lines) == 10
+    assert set(lines[0]) == {"id", "esiid", "date", "usage_kwh", "reading_type", "actual_estimated"}
+
+
+def test_usage_page_table_is_bounded_for_long_histories(app, client):
+    ingest_usage_rows(
+        ParsedUsageRow("3333333333333", date(2020, 1, 1) + timedelta(days=i), 1.0, "C", "A")
+        for i in range(1500)
+    )
+    app.config["USAGE_PAGE_SIZE"] = 50
+
+    # Following the next links walks every row exactly once, 50 at a time.
+    seen, url = [], "/usage"
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        page = re.findall(r"<td>(\d{13})</td>\s*<td>([\d-]+)</td>", html)
+        assert 0 < len(page) <= 50
+        seen.extend(page)
+        cursor = re.search(r"cursor=([\w-]+)", html)
+        url = cursor and f"/usage?cursor={cursor.group(1)}"
+    assert len(seen) == len(set(seen)) == 1520
+
+
+def test_plans_pagination_and_bad_cursor(client):
+    first = client.get("/api/plans?limit=3").get_json()
+    second = client.get(f"/api/plans?limit=3&cursor={first['next_cursor']}").get_json()
+    assert [p["plan_id"] for p in first["data"] + second["data"]] == [f"p{i}" for i in range(5)]
+    assert second["next_cursor"] is None
+    assert client.get("/api/plans?cursor=not-a-cursor").status_code == 400
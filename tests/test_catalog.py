@@ -0,0 +1,158 @@
+"""Tests for the memory-mapped plan catalog snapshot."""
+
+import os
+from datetime import date
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import ElectricityPlan, UsageRecord, db
+from services import catalog
+from services.catalog import get_catalog, open_snapshot
+from services.ptc_client import save_plans_to_db
+from services.repricer import load_plan_rates, reprice_usage
+
+ESIID = "1234567890123"
+
+
+def _config(path):
+    class FileConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        JOB_WORKERS = 0
+
+    return FileConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(_config(tmp_path / "energy.db"))
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _raw_plan(plan_id, price_1000=10.0, **extra):
+    return {
+        "plan_id": plan_id,
+        "company_name": "Test Energy Co",
+        "plan_name": f"Plan {plan_id}",
+        "plan_type": "Fixed",
+        "contract_length": "12",
+        "price_kwh500": 12.0,
+        "price_kwh1000": price_1000,
+        "price_kwh2000": 9.0,
+        **extra,
+    }
+
+
+def _seed():
+    save_plans_to_db(
+        [
+            _raw_plan("a", 11.0, renewable_pct="100", cancellation_fee="150", timeofuse="true"),
+            _raw_plan("b", 9.5, pricing_details="$50 bill credit when usage is 1000 kWh or more."),
+            _raw_plan("c", 10.0, company_name="Ünïcode Power"),
+        ]
+    )
+    db.session.execute(
+        UsageRecord.__table__.insert(),
+        [
+            {"esiid": ESIID, "date": date(2025, m, d), "usage_kwh": 20.0 + m + d}
+            for m in (1, 2, 3)
+            for d in range(1, 29)
+        ],
+    )
+    db.session.commit()
+    from services.rollup import rebuild_rollup
+
+    rebuild_rollup()
+
+
+def test_snapshot_matches_plan_table(app):
+    _seed()
+    path = app.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///") + ".plans"
+    assert os.path.exists(path)
+
+    snapshot = get_catalog()
+    expected = [p.to_dict() for p in ElectricityPlan.query.order_by(ElectricityPlan.id)]
+    assert [snapshot.row(i) for i in range(len(snapshot))] == expected
+    # Arrays are read-only views of the mapped file, not copies.
+    assert not snapshot.ids.flags.writeable
+
+
+def test_repricing_from_snapshot_matches_sql(app):
+    _seed()
+    from_snapshot = [(r.plan.plan_id, r.total_cost, r.monthly_costs) for r in reprice_usage(ESIID)]
+    rates = load_plan_rates()
+    assert rates.catalog is not None
+
+    app.extensions.pop("plan_catalog")
+    assert load_plan_rates().catalog is None
+    from_sql = [(r.plan.plan_id, r.total_cost, r.monthly_costs) for r in reprice_usage(ESIID)]
+    assert from_snapshot == from_sql
+
+
+def test_orm_edit_rebuilds_and_other_workers_remap(app, tmp_path):
+    _seed()
+    first = get_catalog()
+    plan = ElectricityPlan.query.filter_by(plan_id="a").one()
+    plan.price_kwh_1000 = 7.0
+    db.session.commit()
+
+    second = get_catalog()
+    assert second.version > first.version
+    assert second.row(0)["price_kwh_1000"] == 7.0
+    # The old mapping stays usable for requests still holding it.
+    assert first.row(0)["price_kwh_1000"] == 11.0
+
+    # A second worker maps the existing file instead of rebuilding it.
+    calls = []
+    build = catalog.build_catalog
+    catalog.build_catalog = lambda: calls.append(1) or build()
+    try:
+        other = create_app(_config(tmp_path / "energy.db"))
+        with other.app_context():
+            assert get_catalog().version == second.version
+    finally:
+        catalog.build_catalog = build
+    assert calls == []
+
+
+def test_plans_views_read_snapshot(client):
+    _seed()
+    page = client.get("/api/plans?limit=2").get_json()
+    assert [p["plan_id"] for p in page["data"]] == ["a", "b"]
+    rest = client.get(f"/api/plans?cursor={page['next_cursor']}").get_json()
+    assert [p["plan_id"] for p in rest["data"]] == ["c"]
+    assert rest["data"][0]["company_name"] == "Ünïcode Power"
+    assert rest["next_cursor"] is None
+
+    lines = client.get("/api/plans?format=ndjson").get_data(as_text=True).splitlines()
+    assert len(lines) == 3
+    assert client.get("/api/plans?cursor=bogus").status_code == 400
+
+    html = client.get("/plans").get_data(as_text=True)
+    assert html.index("Plan b") < html.index("Plan c") < html.index("Plan a")
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "broken.plans"
+    path.write_bytes(b"not a snapshot")
+    assert open_snapshot(str(path)) is None
+    assert open_snapshot(str(tmp_path / "missing.plans")) is None
+
+
+def test_no_snapshot_for_in_memory_database():
+    class MemoryConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+    app = create_app(MemoryConfig)
+    with app.app_context():
+        assert get_catalog() is None
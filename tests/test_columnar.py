@@ -0,0 +1,77 @@
+"""Tests for Parquet/Arrow exports."""
+
+import io
+from datetime import date, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app import create_app
+from config import Config
+from models import db
+from services.columnar import export_dataset
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+from services.ptc_client import save_plans_to_db
+
+ESIID = "1234567890123"
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        ingest_usage_rows(
+            ParsedUsageRow(ESIID, date(2025, 1, 1) + timedelta(days=i), 30.0, "C", "A")
+            for i in range(59)
+        )
+        save_plans_to_db(
+            [
+                {"plan_id": "cheap", "company_name": "A", "plan_name": "C", "price_kwh2000": 9.0},
+                {"plan_id": "dear", "company_name": "B", "plan_name": "D", "price_kwh2000": 15.0},
+            ]
+        )
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_usage_parquet_export_with_filters(app):
+    buf = io.BytesIO()
+    rows = export_dataset("usage", buf, esiid=ESIID, start=date(2025, 2, 1))
+    table = pq.read_table(io.BytesIO(buf.getvalue()))
+    assert rows == table.num_rows == 28
+    assert table.schema.field("date").type == pa.date32()
+    assert table.column("date")[0].as_py() == date(2025, 2, 1)
+
+
+def test_monthly_and_reprice_arrow_exports(app):
+    buf = io.BytesIO()
+    export_dataset("monthly", buf, fmt="arrow")
+    monthly = pa.ipc.open_stream(buf.getvalue()).read_all()
+    assert monthly.column("total_kwh").to_pylist() == [930.0, 840.0]
+
+    buf = io.BytesIO()
+    export_dataset("reprice", buf, fmt="arrow", esiid=ESIID)
+    reprice = pa.ipc.open_stream(buf.getvalue()).read_all().to_pandas()
+    assert reprice["plan_id"].tolist() == ["cheap", "cheap", "dear", "dear"]
+    assert reprice["estimated_cost"].tolist() == [83.7, 75.6, 139.5, 126.0]
+
+
+def test_export_endpoint(client):
+    resp = client.get(f"/api/export/usage?format=parquet&esiid={ESIID}")
+    assert resp.status_code == 200
+    assert pq.read_table(io.BytesIO(resp.data)).num_rows == 59
+    assert client.get("/api/export/reprice").status_code == 400
+    assert client.get("/api/export/usage?format=csv").status_code == 400
@@ -5,7 +5,12 @@ from datetime import date
 
 import pytest
 
-from services.csv_parser import parse_daily_csv, parse_interval_csv
+from services.csv_parser import (
+    iter_daily_csv,
+    iter_interval_csv,
+    parse_daily_csv,
+    parse_interval_csv,
+)
 
 
 DAILY_CSV = """\
@@ -47,3 +52,72 @@ def test_parse_interval_csv():
     assert rows[0].date == date(2025, 1, 1)
     assert rows[0].usage_kwh == pytest.approx(2.2, abs=0.01)
     assert rows[1].usage_kwh == pytest.approx(2.2, abs=0.01)
+
+
+def test_iter_daily_csv_streams_rows():
+    rows = iter_daily_csv(io.StringIO(DAILY_CSV))
+    first = next(rows)
+    assert first.date == date(2025, 1, 1)
+    assert [r.usage_kwh for r in rows] == [38.7, 52.1]
+
+
+def test_parse_daily_csv_iso_dates_and_reordered_columns():
+    text = (
+        "Usage Date,Meter Reading (kWh),ESIID\n"
+        "2025-01-01,10.5,1234567890123\n"
+        "\n"
+        "2025-01-02,11.0,1234567890123\n"
+    )
+    rows = parse_daily_csv(io.StringIO(text))
+    assert [r.date for r in rows] == [date(2025, 1, 1), date(2025, 1, 2)]
+    assert rows[0].reading_type == "C"
+    assert rows[0].actual_estimated == "A"
+
+
+def test_parse_interval_csv_preamble_blanks_and_trailing_delimiter():
+    text = (
+        "Smart Meter Texas - Interval Report\n"
+        "ESIID,Date,00:15,00:30,00:45,01:00\n"
+        "1234567890123,01/01/2025,0.5,,0.4,0.7,\n"
+        "1234567890123,01/02/2025, 0.3,0.5, ,0.8,\n"
+        "1234567890123,01/03/2025\n"
+    )
+    rows = parse_interval_csv(io.StringIO(text))
+    assert [r.date for r in rows] == [date(2025, 1, 1), date(2025, 1, 2)]
+    assert rows[0].usage_kwh == 1.6
+    assert rows[1].usage_kwh == 1.6
+
+
+def test_parse_interval_csv_sums_rows_wider_than_header():
+    text = "ESIID,Date\n1234567890123,01/01/2025,1.0,2.0,3.0\n"
+    rows = parse_interval_csv(io.StringIO(text))
+    assert rows[0].usage_kwh == 6.0
+
+
+def test_parse_interval_csv_keeps_days_without_readings():
+    text = (
+        "ESIID,Date,00:15,00:30\n"
+        "1234567890123,01/01/2025,,\n"
+        "1234567890123,01/02/2025,0.5,0.4\n"
+        "1234567890123,01/03/2025, ,\n"
+    )
+    rows = parse_interval_csv(io.StringIO(text))
+    assert [(r.date.day, r.usage_kwh) for r in rows] == [(1, 0.0), (2, 0.9), (3, 0.0)]
+
+
+def test_parse_interval_csv_blank_date_raises_value_error():
+    text = "ESIID,Date,00:15,00:30\n1234567890123,,0.5,0.4\n"
+    with pytest.raises(ValueError, match="no ESIID or date"):
+        parse_interval_csv(io.StringIO(text))
+
+
+def test_interval_blocks_parse_alike_on_either_path():
+    text = "ESIID,Date,00:15,00:30\n" + "".join(
+        f"1234567890123,01/{d:02d}/2025,{d / 10},0.25\n" for d in range(1, 21)
+    )
+    # Ragged and padded rows send their blocks to the row-by-row parser.
+    text += "1234567890123,01/21/2025,1,2,3\n1234567890123,01/22/2025, 0.5,\n"
+    whole = list(iter_interval_csv(io.StringIO(text)))
+    assert list(iter_interval_csv(io.StringIO(text), block_chars=64)) == whole
+    assert len(whole) == 22
+    assert [r.usage_kwh for r in whole[-3:]] == [2.25, 6.0, 0.5]
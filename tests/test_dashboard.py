@@ -0,0 +1,89 @@
+"""Tests for cached dashboard statistics."""
+
+from datetime import date
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import UsageRecord, db
+from services import dashboard, versions
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+from services.ptc_client import save_plans_to_db
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def compute_calls(monkeypatch):
+    calls = []
+    original = dashboard._compute
+
+    def counting(esiid):
+        calls.append(esiid)
+        return original(esiid)
+
+    monkeypatch.setattr(dashboard, "_compute", counting)
+    return calls
+
+
+def _row(day, esiid="1234567890123", kwh=30.0):
+    return ParsedUsageRow(esiid, date(2025, 1, day), kwh, "C", "A")
+
+
+def test_stats_cached_until_usage_or_plans_change(app, compute_calls):
+    ingest_usage_rows([_row(1), _row(2, kwh=40.0), _row(3, esiid="9999999999999")])
+
+    stats = dashboard.get_dashboard_stats()
+    assert stats.total_records == 3
+    assert stats.avg_daily_kwh == pytest.approx(33.3)
+    assert stats.date_range == "2025-01-01 to 2025-01-03"
+    assert dashboard.get_dashboard_stats() is stats
+    assert compute_calls == [None]
+
+    save_plans_to_db([{"plan_id": "p1", "company_name": "Co", "plan_name": "P"}])
+    assert dashboard.get_dashboard_stats().plan_count == 1
+
+    ingest_usage_rows([_row(4)])
+    assert dashboard.get_dashboard_stats().total_records == 4
+    assert compute_calls == [None, None, None]
+
+
+def test_stats_per_esiid_and_orm_writes_bump_version(app):
+    before = versions.get(versions.USAGE, versions.usage_key("1234567890123"))
+    db.session.add(UsageRecord(esiid="1234567890123", date=date(2025, 2, 1), usage_kwh=12.0))
+    db.session.commit()
+    after = versions.get(versions.USAGE, versions.usage_key("1234567890123"))
+    assert after == (before[0] + 1, before[1] + 1)
+
+    stats = dashboard.get_dashboard_stats("1234567890123")
+    assert stats.total_records == 1
+    assert stats.esiids == ("1234567890123",)
+    assert dashboard.get_dashboard_stats("0000000000000").date_range == "No data"
+
+
+def test_stats_cache_is_bounded(app, compute_calls):
+    app.config["DASHBOARD_CACHE_SIZE"] = 3
+    ingest_usage_rows([_row(1)])
+    for i in range(10):
+        dashboard.get_dashboard_stats(f"unknown-{i}")
+    cache = dashboard._cache()
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evictions"] == 7
+
+    # Recently viewed ESIIDs are still served from the cache.
+    dashboard.get_dashboard_stats("unknown-9")
+    assert compute_calls.count("unknown-9") == 1
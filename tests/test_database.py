@@ -0,0 +1,223 @@
+"""Tests for SQLite tuning and the single-writer path under multi-process load."""
+
+import multiprocessing
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import UsageRecord, db
+from services import database
+from services.csv_parser import ParsedUsageRow
+from services.dashboard import get_dashboard_stats
+from services.ingest import ingest_usage_rows
+
+READ_BUDGET_S = 1.0
+
+
+def _config(path):
+    class FileConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        JOB_WORKERS = 0
+        METRICS_ENABLED = False
+
+    return FileConfig
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "energy.db"
+    app = create_app(_config(path))
+    with app.app_context():
+        db.engine.dispose()
+    return path
+
+
+def _rows(esiid, days, start=date(2024, 1, 1)):
+    return [
+        ParsedUsageRow(esiid, start + timedelta(days=i), 10.0 + i % 7, "C", "A")
+        for i in range(days)
+    ]
+
+
+def _ingest_worker(path, esiid, days, batch_size):
+    app = create_app(_config(path))
+    with app.app_context():
+        return ingest_usage_rows(_rows(esiid, days), batch_size=batch_size)
+
+
+def _hold_write_lock(path, ready, release):
+    app = create_app(_config(path))
+    with app.app_context():
+        database.begin_write()
+        rows = _rows("9999999999999", 30)
+        db.session.execute(
+            UsageRecord.__table__.insert(),
+            [
+                {"esiid": r.esiid, "date": r.date, "usage_kwh": r.usage_kwh}
+                for r in rows
+            ],
+        )
+        ready.set()
+        release.wait(10)
+        db.session.commit()
+
+
+def test_connections_are_tuned(db_path):
+    app = create_app(_config(db_path))
+    with app.app_context():
+        conn = db.session.connection()
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 30_000
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+
+
+def test_invalid_synchronous_rejected(tmp_path):
+    class Bad(_config(tmp_path / "bad.db")):
+        SQLITE_SYNCHRONOUS = "SOMETIMES"
+
+    with pytest.raises(ValueError):
+        create_app(Bad)
+
+
+def test_begin_write_takes_lock_up_front(db_path):
+    app = create_app(_config(db_path))
+    with app.app_context():
+        database.begin_write()
+        other = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+        try:
+            # Readers are unaffected, but a second writer cannot start.
+            assert other.execute("SELECT count(*) FROM usage_records").fetchone() == (0,)
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                other.execute("BEGIN IMMEDIATE")
+        finally:
+            other.close()
+            db.session.rollback()
+
+
+def test_readers_do_not_wait_for_writer_in_other_process(db_path):
+    ctx = multiprocessing.get_context("spawn")
+    ready, release = ctx.Event(), ctx.Event()
+    writer = ctx.Process(target=_hold_write_lock, args=(db_path, ready, release))
+    writer.start()
+    try:
+        assert ready.wait(30)
+        app = create_app(_config(db_path))
+        with app.app_context():
+            start = time.perf_counter()
+            stats = get_dashboard_stats(None)
+            elapsed = time.perf_counter() - start
+        # The uncommitted rows are invisible and the read did not block.
+        assert stats.total_records == 0
+        assert elapsed < READ_BUDGET_S
+    finally:
+        release.set()
+        writer.join(30)
+    assert writer.exitcode == 0
+
+
+def test_concurrent_ingest_processes_all_succeed(db_path):
+    ctx = multiprocessing.get_context("spawn")
+    esiids = [f"{n:013d}" for n in range(1, 5)]
+    with ctx.Pool(len(esiids)) as pool:
+        results = pool.starmap(
+            _ingest_worker, [(db_path, esiid, 400, 50) for esiid in esiids]
+        )
+        # Every process re-sends the same rows: all must be skipped, not fail.
+        repeats = pool.starmap(
+            _ingest_worker, [(db_path, esiids[0], 400, 50) for _ in esiids]
+        )
+
+    assert results == [(400, 0)] * len(esiids)
+    assert repeats == [(0, 400)] * len(esiids)
+    app = create_app(_config(db_path))
+    with app.app_context():
+        assert UsageRecord.query.count() == 400 * len(esiids)
+        assert get_dashboard_stats(esiids[0]).total_records == 400
+
+
+# Schema of a database created before this series (baseline models.py).
+BASELINE_SCHEMA = """
+CREATE TABLE usage_records (
+    id INTEGER NOT NULL PRIMARY KEY,
+    esiid VARCHAR(22) NOT NULL,
+    date DATE NOT NULL,
+    usage_kwh FLOAT NOT NULL,
+    reading_type VARCHAR(1),
+    actual_estimated VARCHAR(1),
+    CONSTRAINT uq_esiid_date UNIQUE (esiid, date)
+);
+CREATE TABLE electricity_plans (
+    id INTEGER NOT NULL PRIMARY KEY,
+    plan_id VARCHAR(50) NOT NULL UNIQUE,
+    company_name VARCHAR(200) NOT NULL,
+    plan_name VARCHAR(200) NOT NULL,
+    plan_type VARCHAR(50),
+    contract_length INTEGER,
+    rate_type VARCHAR(50),
+    price_kwh_500 FLOAT,
+    price_kwh_1000 FLOAT,
+    price_kwh_2000 FLOAT,
+    base_charge FLOAT,
+    energy_charge FLOAT,
+    tdu_delivery_charge FLOAT,
+    tdu_per_kwh FLOAT,
+    cancellation_fee FLOAT,
+    renewable_pct FLOAT,
+    is_time_of_use BOOLEAN,
+    fetched_at DATETIME
+);
+INSERT INTO electricity_plans (plan_id, company_name, plan_name, plan_type, price_kwh_500,
+                               price_kwh_1000, price_kwh_2000)
+VALUES ('old-1', 'Legacy Power', 'Legacy Fixed 12', 'Fixed', 12.0, 10.0, 9.0);
+"""
+
+
+def _baseline_db(path, days=60):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO usage_records (esiid, date, usage_kwh, reading_type, actual_estimated)"
+        " VALUES (?, ?, ?, 'C', 'A')",
+        [
+            ("1234567890123", (date(2025, 1, 1) + timedelta(days=i)).isoformat(), 30.0)
+            for i in range(days)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_is_upgraded_in_place(tmp_path):
+    path = tmp_path / "energy.db"
+    _baseline_db(path)
+
+    app = create_app(_config(path))
+    with app.app_context():
+        assert database.add_missing_columns() == []  # already done at startup
+        db.engine.dispose()
+    columns = {r[1] for r in sqlite3.connect(path).execute("PRAGMA table_info(electricity_plans)")}
+    assert {"content_hash", "rate_curve"} <= columns
+
+    html = app.test_client().get("/plans").get_data(as_text=True)
+    assert "Legacy Fixed 12" in html
+
+
+def test_baseline_usage_is_rolled_up_at_startup(tmp_path):
+    from services.repricer import reprice_usage
+    from services.rollup import backfill_rollup, check_rollup
+
+    path = tmp_path / "energy.db"
+    _baseline_db(path, days=60)
+
+    app = create_app(_config(path))
+    with app.app_context():
+        assert check_rollup() == []
+        assert backfill_rollup() is False  # only runs on an empty rollup
+        assert get_dashboard_stats().total_records == 60
+        assert [r.plan.plan_id for r in reprice_usage("1234567890123")] == ["old-1"]
+        db.engine.dispose()
@@ -0,0 +1,82 @@
+"""Tests for response compression and ETag revalidation."""
+
+import gzip
+import json
+from datetime import date
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import UsageRecord, db
+from services import metrics
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    HTTP_GZIP_MIN_BYTES = 100
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            UsageRecord(esiid="1234567890123", date=date(2025, 1, d), usage_kwh=30.0 + d)
+            for d in range(1, 11)
+        )
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_versioned_views_revalidate_without_rendering(client, app):
+    first = client.get("/api/usage")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    queries_before = metrics.HTTP_QUERIES.sum(endpoint="api_usage")
+    again = client.get("/api/usage", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == etag
+    # Only the version lookup ran.
+    assert metrics.HTTP_QUERIES.sum(endpoint="api_usage") - queries_before == 1
+
+    # Another URL, or a write to the data, gives another tag.
+    assert client.get("/api/usage?limit=3").headers["ETag"] != etag
+    with app.app_context():
+        db.session.add(UsageRecord(esiid="1234567890123", date=date(2025, 1, 11), usage_kwh=1.0))
+        db.session.commit()
+    changed = client.get("/api/usage", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and len(changed.get_json()["data"]) == 11
+
+
+def test_gzip_is_negotiated_and_tagged_separately(client):
+    plain = client.get("/api/usage")
+    packed = client.get("/api/usage", headers={"Accept-Encoding": "gzip, deflate"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert packed.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(packed.data)) == plain.get_json()
+    assert packed.headers["ETag"] != plain.headers["ETag"]
+    # Deterministic bytes, so the strong tag holds across requests.
+    assert client.get("/api/usage", headers={"Accept-Encoding": "gzip"}).data == packed.data
+
+    small = client.get("/api/reprice/cache", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_unversioned_responses_are_tagged_by_content(client):
+    first = client.get("/api/reprice/cache")
+    repeat = client.get("/api/reprice/cache", headers={"If-None-Match": first.headers["ETag"]})
+    assert repeat.status_code == 304
+
+    html = client.get("/usage")
+    assert html.headers["ETag"] and html.mimetype == "text/html"
+    assert "ETag" not in client.post("/reprice", data={"esiid": "1234567890123"}).headers
@@ -0,0 +1,73 @@
+"""Tests for bulk usage ingest."""
+
+import io
+from datetime import date
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import UsageRecord, db
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    JOB_WORKERS = 0
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _row(day, kwh=10.0, esiid="1234567890123"):
+    return ParsedUsageRow(
+        esiid=esiid,
+        date=date(2025, 1, day),
+        usage_kwh=kwh,
+        reading_type="C",
+        actual_estimated="A",
+    )
+
+
+def test_ingest_counts_new_and_existing(app):
+    assert ingest_usage_rows([_row(1), _row(2)]) == (2, 0)
+    assert ingest_usage_rows([_row(2), _row(3), _row(4)]) == (2, 1)
+    assert UsageRecord.query.count() == 4
+
+
+def test_ingest_skips_duplicates_within_upload(app):
+    rows = [_row(1, 10.0), _row(1, 99.0), _row(2), _row(2, esiid="9999999999999")]
+    assert ingest_usage_rows(rows, batch_size=2) == (3, 1)
+    rec = UsageRecord.query.filter_by(esiid="1234567890123", date=date(2025, 1, 1)).one()
+    assert rec.usage_kwh == 10.0
+
+
+def test_upload_route_streams_daily_csv(client):
+    csv_bytes = (
+        "\ufeffSmart Meter Texas - Daily Usage Report\n"
+        "ESIID,Date,Reading Type,Meter Reading (kWh),Actual/Estimated\n"
+        "1234567890123,01/01/2025,C,45.2,A\n"
+        "1234567890123,01/01/2025,C,45.2,A\n"
+        "1234567890123,01/02/2025,C,38.7,E\n"
+    ).encode("utf-8")
+    resp = client.post(
+        "/upload",
+        data={"file_type": "daily", "csv_file": (io.BytesIO(csv_bytes), "daily.csv")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert resp.status_code == 200
+    assert b"Imported 2 records (1 duplicates skipped)" in resp.data
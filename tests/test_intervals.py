@@ -0,0 +1,73 @@
+"""Tests for packed interval storage."""
+
+import io
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app import create_app
+from config import Config
+from models import IntervalRecord, UsageRecord, db
+from services.csv_parser import iter_interval_days
+from services.ingest import ingest_interval_days
+from services.intervals import load_intervals
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def _interval_csv(days):
+    header = "ESIID,Date," + ",".join(f"c{i}" for i in range(96))
+    lines = [header]
+    for day, value in days:
+        lines.append(f"1234567890123,{day},," + ",".join([str(value)] * 95))
+    return "\n".join(lines) + "\n"
+
+
+def test_ingest_stores_packed_intervals_and_daily_totals(app):
+    text = _interval_csv([("01/30/2025", 0.25), ("01/31/2025", 0.5), ("02/02/2025", 0.1)])
+    assert ingest_interval_days(iter_interval_days(io.StringIO(text))) == (3, 0)
+    assert IntervalRecord.query.count() == 3
+    assert UsageRecord.query.filter_by(date=date(2025, 1, 31)).one().usage_kwh == 47.5
+
+    # Re-uploading the same file stores nothing new.
+    assert ingest_interval_days(iter_interval_days(io.StringIO(text))) == (0, 3)
+    assert IntervalRecord.query.count() == 3
+
+
+def test_load_intervals_returns_contiguous_range(app):
+    text = _interval_csv([("01/30/2025", 0.25), ("01/31/2025", 0.5), ("02/02/2025", 0.1)])
+    ingest_interval_days(iter_interval_days(io.StringIO(text)))
+
+    series = load_intervals("1234567890123")
+    assert series.readings.shape == (4, 96)
+    assert series.flat.shape == (4 * 96,)
+    assert np.isnan(series.readings[0, 0])
+    assert np.isnan(series.readings[2]).all()  # 2025-02-01 missing
+
+    daily = series.daily_totals()
+    assert daily[0] == pytest.approx(23.75)
+    assert np.isnan(daily[2])
+    assert series.hourly().shape == (4, 24)
+    assert series.monthly_totals() == [
+        {"label": "2025-01", "kwh": 71.2, "days": 2},
+        {"label": "2025-02", "kwh": 9.5, "days": 1},
+    ]
+
+
+def test_load_intervals_without_data(app):
+    series = load_intervals("0000000000000")
+    assert series.readings.shape == (0, 96)
+    assert series.monthly_totals() == []
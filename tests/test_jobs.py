@@ -0,0 +1,150 @@
+"""Tests for the background job runner."""
+
+import io
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import ElectricityPlan, Job, UsageRecord, db
+from services.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, get_runner
+
+DAILY_CSV = (
+    "ESIID,Date,Reading Type,Meter Reading (kWh),Actual/Estimated\n"
+    + "".join(f"1234567890123,01/{d:02d}/2025,C,{30 + d},A\n" for d in range(1, 29))
+).encode("utf-8")
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    JOB_WORKERS = 2
+
+
+@pytest.fixture
+def app(tmp_path):
+    TestConfig.UPLOAD_FOLDER = str(tmp_path)
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        get_runner().shutdown()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _upload(client, data, file_type="daily"):
+    resp = client.post(
+        "/upload",
+        data={"file_type": file_type, "csv_file": (io.BytesIO(data), "usage.csv")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 302
+    job_id = resp.headers["Location"].rsplit("/", 1)[-1]
+    get_runner().wait(job_id, timeout=10)
+    return job_id
+
+
+def test_upload_runs_as_background_job(app, client, tmp_path):
+    job_id = _upload(client, DAILY_CSV)
+
+    status = client.get(f"/api/jobs/{job_id}").get_json()
+    assert status["status"] == SUCCEEDED
+    assert status["kind"] == "upload"
+    assert status["rows_parsed"] == 28
+    assert status["rows_written"] == 28
+    assert status["result"] == {
+        "imported": 28,
+        "skipped": 0,
+        "message": "Imported 28 records (0 duplicates skipped).",
+    }
+    assert status["rows_per_second"] > 0
+    assert UsageRecord.query.count() == 28
+    # The spooled upload is removed once ingested.
+    assert list(tmp_path.iterdir()) == []
+
+    page = client.get(f"/jobs/{job_id}")
+    assert b"Imported 28 records" in page.data
+
+
+def test_failed_job_records_error(app, client):
+    job_id = _upload(client, b"not,a,usage,file\n1,2,3,4\n")
+
+    job = db.session.get(Job, job_id)
+    assert job.status == FAILED
+    assert job.message
+    assert job.finished_at is not None
+
+
+def test_plan_fetch_job(app, client, monkeypatch):
+    monkeypatch.setattr(
+        "services.ptc_client.harvest_plans",
+        lambda locations: [
+            {"plan_id": f"P{i}", "company_name": "Co", "plan_name": z}
+            for i, z in enumerate(locations)
+        ],
+    )
+    resp = client.post("/plans/fetch", data={"zip_code": "77001, 75201"})
+    job_id = resp.headers["Location"].rsplit("/", 1)[-1]
+    get_runner().wait(job_id, timeout=10)
+
+    status = client.get(f"/api/jobs/{job_id}").get_json()
+    assert status["status"] == SUCCEEDED
+    assert (status["rows_parsed"], status["rows_written"]) == (2, 2)
+    assert ElectricityPlan.query.count() == 2
+
+
+def test_startup_fails_only_jobs_of_exited_workers(tmp_path):
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'jobs.db'}"
+        UPLOAD_FOLDER = str(tmp_path)
+
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    host = socket.gethostname()
+    jobs = [
+        ("exited", RUNNING, f"{host}:{exited.pid}"),
+        ("legacy", QUEUED, None),
+        ("live", RUNNING, f"{host}:{os.getppid()}"),
+        ("remote", RUNNING, "another-host:1"),
+        ("done", SUCCEEDED, f"{host}:{exited.pid}"),
+    ]
+    with create_app(FileConfig).app_context():
+        for job_id, status, owner in jobs:
+            created_at = datetime.utcnow()
+            db.session.add(
+                Job(id=job_id, kind="upload", status=status, owner=owner, created_at=created_at)
+            )
+        db.session.commit()
+
+    with create_app(FileConfig).app_context():
+        statuses = {job.id: job.status for job in Job.query}
+        assert statuses == {
+            "exited": FAILED,
+            "legacy": FAILED,
+            "live": RUNNING,
+            "remote": RUNNING,
+            "done": SUCCEEDED,
+        }
+        interrupted = db.session.get(Job, "exited")
+        assert "Interrupted" in interrupted.message and interrupted.finished_at is not None
+        get_runner().shutdown()
+
+
+def test_submitted_jobs_record_their_owner(app, client):
+    job = db.session.get(Job, _upload(client, DAILY_CSV))
+    assert job.owner == f"{socket.gethostname()}:{os.getpid()}"
+
+
+def test_unknown_job_returns_404(client):
+    assert client.get("/api/jobs/nope").status_code == 404
+    assert client.get("/jobs/nope").status_code == 404
@@ -0,0 +1,85 @@
+"""Tests for request/SQL/service instrumentation and /metrics."""
+
+from datetime import date
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import UsageRecord, db
+from services import metrics
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            UsageRecord(esiid="1234567890123", date=date(2025, 1, d), usage_kwh=30.0 + d)
+            for d in range(1, 11)
+        )
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_requests_record_latency_and_query_counts(client):
+    labels = {"endpoint": "api_usage", "method": "GET", "status": "200"}
+    requests_before = metrics.HTTP_DURATION.count(**labels)
+    queries_before = metrics.HTTP_QUERIES.sum(endpoint="api_usage")
+
+    for _ in range(3):
+        assert client.get("/api/usage").status_code == 200
+
+    assert metrics.HTTP_DURATION.count(**labels) == requests_before + 3
+    per_request = (metrics.HTTP_QUERIES.sum(endpoint="api_usage") - queries_before) / 3
+    assert 1 <= per_request <= 5
+    assert metrics.SQL_QUERIES.value(endpoint="api_usage") >= 3
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert (
+        'http_request_duration_seconds_bucket{endpoint="api_usage",method="GET",'
+        'status="200",le="+Inf"}'
+    ) in body
+    assert 'http_request_sql_queries_count{endpoint="api_usage"}' in body
+
+
+def test_service_functions_are_timed(client):
+    before = metrics.SERVICE_DURATION.count(function="repricer.reprice_usage")
+    client.post("/reprice", data={"esiid": "1234567890123"})
+    assert metrics.SERVICE_DURATION.count(function="repricer.reprice_usage") == before + 1
+
+    items_before = metrics.SERVICE_ITEMS.value(function="export.fetch_page")
+    client.get("/api/usage?limit=4")
+    assert metrics.SERVICE_ITEMS.value(function="export.fetch_page") == items_before + 4
+
+
+def test_slow_requests_dump_profiles(app, client, tmp_path):
+    app.config.update(PROFILE_REQUESTS=True, PROFILE_SLOW_MS=0, PROFILE_DIR=str(tmp_path))
+    client.get("/api/usage")
+    dumps = list(tmp_path.glob("*-api_usage-*ms.prof"))
+    assert len(dumps) == 1
+
+    app.config["PROFILE_SLOW_MS"] = 60_000
+    client.get("/api/usage")
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_metrics_can_be_disabled():
+    class Disabled(TestConfig):
+        METRICS_ENABLED = False
+
+    app = create_app(Disabled)
+    assert app.test_client().get("/metrics").status_code == 404
@@ -0,0 +1,133 @@
+"""Tests for plan search, filtering and sorting."""
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app import create_app
+from config import Config
+from models import ElectricityPlan, db
+from services.plan_search import PlanQuery, current_catalog, filter_options, search_plans
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        _seed_plans()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _seed_plans():
+    plans = [
+        # plan_id, company, type, term, renewable, fee, tou, energy_charge, base_charge
+        ("flat", "Alpha", "Fixed", 12, 100.0, 150.0, False, 0.12, 0.0),
+        ("base", "Alpha", "Fixed", 24, 30.0, None, False, 0.07, 60.0),
+        ("vary", "Beta", "Variable", None, None, 0.0, False, 0.11, 5.0),
+        ("tou", "Beta", "Fixed", 12, 50.0, 200.0, True, 0.10, 0.0),
+    ]
+    for plan_id, company, plan_type, term, renewable, fee, tou, energy, base in plans:
+        db.session.add(
+            ElectricityPlan(
+                plan_id=plan_id,
+                company_name=company,
+                plan_name=f"Plan {plan_id}",
+                plan_type=plan_type,
+                contract_length=term,
+                renewable_pct=renewable,
+                cancellation_fee=fee,
+                is_time_of_use=tou,
+                energy_charge=energy,
+                base_charge=base,
+                price_kwh_1000=energy * 100,
+            )
+        )
+    db.session.commit()
+
+
+def _ids(**kwargs):
+    return [p["plan_id"] for p in search_plans(PlanQuery(**kwargs)).plans]
+
+
+def test_sort_by_cost_depends_on_usage_level(app):
+    # $60/month base charge loses at low usage and wins at high usage.
+    assert _ids(kwh=200) == ["tou", "flat", "vary", "base"]
+    assert _ids(kwh=3000) == ["base", "tou", "vary", "flat"]
+    page = search_plans(PlanQuery(kwh=1000))
+    assert page.plans[0]["estimated_cost"] == 100.0
+    assert page.plans[0]["estimated_cents_per_kwh"] == 10.0
+
+
+def test_filters_combine(app):
+    assert _ids(companies=["Beta"]) == ["tou", "vary"]
+    assert _ids(plan_types=["Fixed"], time_of_use=False) == ["flat", "base"]
+    assert _ids(min_term=12, max_term=12) == ["tou", "flat"]
+    assert _ids(min_renewable=50) == ["tou", "flat"]
+    # NULL fees and terms never satisfy a filter on that column.
+    assert _ids(max_cancellation_fee=150) == ["vary", "flat"]
+    assert _ids(companies=["Nobody"]) == []
+
+
+def test_column_sorts_put_nulls_last(app):
+    assert _ids(sort="renewable_pct") == ["base", "tou", "flat", "vary"]
+    assert _ids(sort="renewable_pct", descending=True) == ["flat", "tou", "base", "vary"]
+    assert _ids(sort="contract_length", descending=True) == ["base", "flat", "tou", "vary"]
+
+
+def test_pagination(app):
+    first = search_plans(PlanQuery(per_page=3))
+    second = search_plans(PlanQuery(per_page=3, page=2))
+    assert (first.total, first.pages) == (4, 2)
+    assert [p["plan_id"] for p in first.plans + second.plans] == _ids()
+    assert filter_options() == {"plan_types": ["Fixed", "Variable"], "companies": ["Alpha", "Beta"]}
+
+
+def test_catalog_is_reused_until_plans_change(app):
+    catalog = current_catalog()
+    assert current_catalog() is catalog
+
+    db.session.get(ElectricityPlan, 1).energy_charge = 0.05
+    db.session.commit()
+    rebuilt = current_catalog()
+    assert rebuilt is not catalog and rebuilt.version > catalog.version
+
+
+def test_query_round_trips_through_args():
+    query = PlanQuery(
+        plan_types=["Fixed"], min_term=6, time_of_use=False, kwh=1500, sort="renewable_pct", page=3
+    )
+    assert PlanQuery.from_args(MultiDict(list(_flatten(query.to_args())))) == query
+    with pytest.raises(ValueError):
+        PlanQuery.from_args(MultiDict({"sort": "plan_name"}))
+    with pytest.raises(ValueError):
+        PlanQuery.from_args(MultiDict({"term_min": "twelve"}))
+
+
+def _flatten(args):
+    for key, value in args.items():
+        for v in value if isinstance(value, list) else [value]:
+            yield key, v
+
+
+def test_search_endpoints(client):
+    resp = client.get("/api/plans/search?company=Alpha&kwh=500&per_page=1")
+    body = resp.get_json()
+    assert (body["total"], body["pages"], body["kwh"]) == (2, 2, 500.0)
+    assert body["data"][0]["plan_id"] == "flat"
+    assert client.get("/api/plans/search?tou=sometimes").status_code == 400
+
+    html = client.get("/plans?type=Fixed&per_page=2").get_data(as_text=True)
+    assert "3 plans match" in html
+    assert "page=2" in html and "Plan vary" not in html
+    assert b"Invalid sort" in client.get("/plans?sort=bogus").data
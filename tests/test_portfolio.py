@@ -0,0 +1,122 @@
+"""Tests for portfolio (multi-ESIID) repricing."""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import ElectricityPlan, UsageRecord, db
+from services import portfolio
+from services.portfolio import reprice_portfolio
+from services.repricer import reprice_usage
+from services.rollup import monthly_totals, monthly_totals_by_esiid
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    REPRICE_WORKERS = 1
+
+
+ESIIDS = [f"10443720000000{i:02d}" for i in range(5)]
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        _seed_data()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _seed_data():
+    rng = random.Random(3)
+    for n, esiid in enumerate(ESIIDS):
+        for d in range(60 + 30 * n):
+            db.session.add(
+                UsageRecord(
+                    esiid=esiid,
+                    date=date(2024, 1, 1) + timedelta(days=d),
+                    usage_kwh=rng.uniform(10, 30 + 20 * n),
+                )
+            )
+    for i in range(12):
+        db.session.add(
+            ElectricityPlan(
+                plan_id=f"plan-{i}",
+                company_name=f"Co {i}",
+                plan_name=f"Plan {i}",
+                price_kwh_500=rng.uniform(9, 16),
+                price_kwh_1000=rng.uniform(8, 15),
+                price_kwh_2000=rng.uniform(7, 14),
+                energy_charge=rng.uniform(0.08, 0.14) if i % 3 == 0 else None,
+                base_charge=4.95,
+            )
+        )
+    db.session.commit()
+
+
+def test_monthly_totals_by_esiid_matches_single_queries(app):
+    start, end = date(2024, 1, 15), date(2024, 4, 10)
+    grouped = monthly_totals_by_esiid(None, start, end)
+    assert sorted(grouped) == ESIIDS
+    for esiid in ESIIDS:
+        assert grouped[esiid] == monthly_totals(esiid, start, end)
+    assert list(monthly_totals_by_esiid(ESIIDS[:2])) == ESIIDS[:2]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_portfolio_matches_single_meter_repricing(app, monkeypatch, workers):
+    monkeypatch.setattr(portfolio, "CHUNK_METERS", 2)
+    result = reprice_portfolio(workers=workers)
+
+    assert [m.esiid for m in result.meters] == ESIIDS
+    for meter in result.meters:
+        best = reprice_usage(meter.esiid)[0]
+        assert meter.best_plan_id == best.plan.id
+        assert meter.best_cost == best.total_cost
+        assert meter.avg_price_per_kwh == best.avg_price_per_kwh
+
+    per_plan = {}
+    for esiid in ESIIDS:
+        for r in reprice_usage(esiid):
+            per_plan[r.plan.id] = per_plan.get(r.plan.id, 0.0) + r.total_cost
+    assert result.best_plan_cost == pytest.approx(min(per_plan.values()), abs=0.05)
+    assert result.sum_of_meter_best == pytest.approx(sum(m.best_cost for m in result.meters))
+
+
+def test_portfolio_api(client):
+    data = client.get(f"/api/reprice/portfolio?esiid={ESIIDS[0]}&esiid={ESIIDS[1]}").get_json()
+    assert [m["esiid"] for m in data["meters"]] == ESIIDS[:2]
+    assert data["meters"][0]["best_plan"]["plan_id"].startswith("plan-")
+    assert data["portfolio"]["meters"] == 2
+    assert data["plans"] == 12
+
+    assert client.get("/api/reprice/portfolio?start=bad").status_code == 400
+
+
+def test_portfolio_api_prices_in_process(app, client, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("the web route must not start a process pool")
+
+    monkeypatch.setattr(portfolio, "ProcessPoolExecutor", no_pool)
+    monkeypatch.setattr(portfolio, "CHUNK_METERS", 1)
+    app.config["REPRICE_WORKERS"] = 4
+    data = client.get("/api/reprice/portfolio").get_json()
+    assert data["portfolio"]["meters"] == len(ESIIDS)
+
+
+def test_portfolio_cli(app):
+    out = app.test_cli_runner().invoke(args=["reprice-portfolio", "--esiid", ESIIDS[0]])
+    assert out.exit_code == 0
+    assert ESIIDS[0] in out.output
+    assert "Best single plan" in out.output
@@ -0,0 +1,253 @@
+"""Tests for the Power to Choose client."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import ElectricityPlan, db
+from services import database
+from services.ptc_client import (
+    harvest_plans,
+    import_plans_csv,
+    iter_plans_csv,
+    save_plan_batches,
+    save_plans_to_db,
+)
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def _raw_plan(plan_id, price_1000=10.0):
+    return {
+        "plan_id": plan_id,
+        "company_name": "Test Energy Co",
+        "plan_name": f"Plan {plan_id}",
+        "plan_type": "Fixed",
+        "contract_length": "12",
+        "price_kwh500": 12.0,
+        "price_kwh1000": price_1000,
+        "price_kwh2000": 9.0,
+    }
+
+
+def test_save_plans_inserts_updates_and_skips_unchanged(app):
+    first = save_plans_to_db([_raw_plan("a"), _raw_plan("b")])
+    assert (first.inserted, first.updated, first.unchanged) == (2, 0, 0)
+    fetched_b = ElectricityPlan.query.filter_by(plan_id="b").one().fetched_at
+
+    second = save_plans_to_db([_raw_plan("a", price_1000=11.5), _raw_plan("b"), _raw_plan("c")])
+    assert (second.inserted, second.updated, second.unchanged) == (1, 1, 1)
+    assert second.total == 3
+
+    db.session.expire_all()
+    assert ElectricityPlan.query.count() == 3
+    assert ElectricityPlan.query.filter_by(plan_id="a").one().price_kwh_1000 == 11.5
+    assert ElectricityPlan.query.filter_by(plan_id="b").one().fetched_at == fetched_b
+
+
+def test_save_plans_ignores_records_without_id(app):
+    result = save_plans_to_db([{"company_name": "No Id"}, _raw_plan("a"), _raw_plan("a")])
+    assert result.total == 1
+
+
+class _StubPTCHandler(BaseHTTPRequestHandler):
+    """Paginated stand-in for the Power to Choose plans endpoint."""
+
+    catalogs = {
+        "75201": [f"oncor-{i}" for i in range(5)] + ["statewide-1"],
+        "77002": ["cnp-1", "statewide-1"],
+    }
+    requests = []
+    fail_once = set()
+    csv_body = ""
+    with_total = True
+    repeat_first_page = False  # a server that ignores "page"
+    id_field = "plan_id"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        zip_code, page, size = body["zip_code"], body["page"], body["page_size"]
+        self.requests.append((zip_code, page))
+        if (zip_code, page) in self.fail_once:
+            self.fail_once.discard((zip_code, page))
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        ids = self.catalogs.get(zip_code, [])
+        if self.repeat_first_page:
+            page = 1
+        chunk = ids[(page - 1) * size : page * size]
+        plans = [{self.id_field: i, "company_name": "Co", "plan_name": i} for i in chunk]
+        payload = json.dumps(
+            {"data": plans, "total": len(ids) if self.with_total else None}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        payload = self.csv_body.encode("utf-8-sig")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ptc_stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPTCHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(Config, "PTC_API_URL", f"http://127.0.0.1:{server.server_port}/plans")
+    monkeypatch.setattr(Config, "PTC_CSV_URL", f"http://127.0.0.1:{server.server_port}/csv")
+    monkeypatch.setattr(Config, "PTC_BACKOFF", 0)
+    _StubPTCHandler.requests = []
+    _StubPTCHandler.with_total = True
+    _StubPTCHandler.repeat_first_page = False
+    _StubPTCHandler.id_field = "plan_id"
+    yield _StubPTCHandler
+    server.shutdown()
+
+
+def test_harvest_fetches_all_pages_and_dedupes(ptc_stub):
+    ptc_stub.fail_once = {("75201", 2)}
+    plans = harvest_plans(["oncor", "77002", "75201"], page_size=2)
+
+    ids = sorted(p["plan_id"] for p in plans)
+    assert ids == sorted(["cnp-1", "statewide-1"] + [f"oncor-{i}" for i in range(5)])
+    # 3 pages for 75201 (one retried), 1 page for 77002; "oncor" maps to 75201.
+    assert sorted(set(ptc_stub.requests)) == [
+        ("75201", 1),
+        ("75201", 2),
+        ("75201", 3),
+        ("77002", 1),
+    ]
+    assert ptc_stub.requests.count(("75201", 2)) == 2
+
+
+def test_harvest_without_total_stops_when_pages_repeat(ptc_stub):
+    ptc_stub.with_total = False
+    ptc_stub.repeat_first_page = True
+    plans = harvest_plans(["75201"], page_size=2)
+    assert sorted(p["plan_id"] for p in plans) == ["oncor-0", "oncor-1"]
+    # The second page added nothing new, so the third was never requested.
+    assert ptc_stub.requests == [("75201", 1), ("75201", 2)]
+
+
+def test_harvest_without_total_pages_through_id_key_records(ptc_stub):
+    ptc_stub.with_total = False
+    ptc_stub.id_field = "idKey"
+    plans = harvest_plans(["75201"], page_size=2)
+    assert sorted(p["idKey"] for p in plans) == sorted(
+        [f"oncor-{i}" for i in range(5)] + ["statewide-1"]
+    )
+    assert sorted(set(ptc_stub.requests)) == [("75201", p) for p in (1, 2, 3, 4)]
+
+
+def test_harvest_page_count_is_capped(ptc_stub, monkeypatch):
+    monkeypatch.setattr(Config, "PTC_MAX_PAGES", 2)
+    monkeypatch.setattr(ptc_stub, "catalogs", {"75201": [f"p-{i}" for i in range(20)]})
+    ptc_stub.with_total = False
+    assert len(harvest_plans(["75201"], page_size=2)) == 4
+    ptc_stub.with_total = True
+    assert len(harvest_plans(["75201"], page_size=2)) == 4
+    assert max(page for _, page in ptc_stub.requests) == 2
+
+
+def test_save_plan_batches_updates_plans_from_earlier_batch(app):
+    with app.app_context():
+        saved = save_plan_batches([[_raw_plan("P1")], [_raw_plan("P1", price_1000=12.0)]])
+        assert (saved.inserted, saved.updated, saved.unchanged) == (1, 1, 0)
+        assert db.session.execute(db.select(ElectricityPlan.price_kwh_1000)).scalar() == 12.0
+
+
+def test_save_plan_batches_sees_plans_written_between_batches(app):
+    def batches():
+        yield [_raw_plan("P1")]
+        # Another fetch commits P2 before our next batch.
+        save_plans_to_db([_raw_plan("P2")])
+        yield [_raw_plan("P2"), _raw_plan("P3", price_1000=11.0)]
+
+    with app.app_context():
+        saved = save_plan_batches(batches())
+        assert (saved.inserted, saved.updated, saved.unchanged) == (2, 0, 1)
+        assert ElectricityPlan.query.count() == 3
+
+
+def test_save_plan_batches_pulls_each_batch_before_locking(app, monkeypatch):
+    events = []
+    begin_write = database.begin_write
+
+    def tracking_begin_write():
+        events.append("lock")
+        begin_write()
+
+    def batches():
+        for i in range(2):
+            events.append("pull")
+            yield [_raw_plan(f"P{i}")]
+        events.append("pull")
+
+    monkeypatch.setattr(database, "begin_write", tracking_begin_write)
+    with app.app_context():
+        save_plan_batches(batches())
+    assert events == ["pull", "lock", "pull", "lock", "pull"]
+
+
+def test_import_plans_csv_streams_in_batches(app, ptc_stub):
+    header = (
+        "[idKey],[Company Name],[Plan Name],[Term Value],[Price/kWh 1000],[Time of Use],[Extra]"
+    )
+    rows = [f"{i},Co,Plan {i},12,{10 + i},FALSE,x" for i in range(6)]
+    ptc_stub.csv_body = "\r\n".join([header, *rows, "5,Co,Plan 5,12,15,TRUE,x"]) + "\r\n"
+
+    with app.app_context():
+        saved = import_plans_csv(batch_size=3)
+        assert (saved.inserted, saved.updated, saved.unchanged) == (6, 1, 0)
+        plans = {p.plan_id: p for p in ElectricityPlan.query.all()}
+        assert len(plans) == 6
+        assert plans["0"].company_name == "Co"
+        assert plans["0"].contract_length == 12
+        assert plans["0"].price_kwh_1000 == 10.0
+        assert plans["0"].is_time_of_use is False
+        assert plans["5"].is_time_of_use is True
+
+
+def test_csv_quoted_fields_keep_embedded_newlines(ptc_stub):
+    ptc_stub.csv_body = (
+        "[idKey],[Plan Name],[Special Terms]\r\n"
+        '1,"Plan, One","Bill credit of $100\r\napplies at 1000 kWh"\r\n'
+        '2,Plan Two,"line one\nline two"\r\n'
+    )
+    plans = list(iter_plans_csv())
+    assert plans == [
+        {
+            "plan_id": "1",
+            "plan_name": "Plan, One",
+            "special_terms": "Bill credit of $100\r\napplies at 1000 kWh",
+        },
+        {"plan_id": "2", "plan_name": "Plan Two", "special_terms": "line one\nline two"},
+    ]
@@ -0,0 +1,102 @@
+"""Tests for piecewise-linear plan bill curves."""
+
+import numpy as np
+import pytest
+
+from services.ptc_client import normalize_plan
+from services.rate_curve import (
+    CurveArrays,
+    RateCurve,
+    compile_curve,
+    evaluate,
+    parse_bill_terms,
+)
+
+
+def test_parse_bill_terms():
+    fixed, steps = parse_bill_terms(
+        "$9.95 minimum usage fee if usage is less than 500 kWh. "
+        "$50 bill credit for usage between 1,000 and 1,999 kWh; see EFL."
+    )
+    assert fixed == 9.95
+    assert steps == [(500.0, -9.95), (1000.0, -50.0), (2000.0, 50.0)]
+    assert parse_bill_terms("$100 usage credit when usage is 1000 kWh or more") == (
+        0.0,
+        [(1000.0, -100.0)],
+    )
+    assert parse_bill_terms("Fixed rate for 12 months.") == (0.0, [])
+
+
+def test_tier_curve_passes_through_published_prices():
+    fields = {"price_kwh_500": 14.2, "price_kwh_1000": 12.1, "price_kwh_2000": 11.5}
+    curve = compile_curve(fields)
+    for kwh, key in ((500, "price_kwh_500"), (1000, "price_kwh_1000"), (2000, "price_kwh_2000")):
+        assert curve.cost(kwh) == pytest.approx(fields[key] * kwh / 100)
+    # Interpolated between tiers instead of jumping to the next tier's average.
+    assert curve.cost(750) == pytest.approx((71.0 + 121.0) / 2)
+    assert curve.cost(0) == pytest.approx(21.0)  # implied base charge
+
+
+def test_bill_credit_lands_on_its_threshold():
+    # 15 c/kWh energy with a $100 credit at >= 1000 kWh, as published by PTC.
+    fields = {"price_kwh_500": 15.0, "price_kwh_1000": 5.0, "price_kwh_2000": 10.0}
+    curve = compile_curve(fields, "$100 bill credit when usage is 1000 kWh or more")
+    assert curve.cost(999) == pytest.approx(149.85)
+    assert curve.cost(1000) == pytest.approx(50.0)
+    assert curve.cost(1500) == pytest.approx(125.0)
+    # Without the terms the published points are still honoured.
+    plain = compile_curve(fields)
+    assert plain.cost(1000) == pytest.approx(50.0)
+    assert plain.cost(999) != pytest.approx(149.85)
+
+
+def test_component_curve_and_missing_prices():
+    curve = compile_curve(
+        {
+            "energy_charge": 0.11,
+            "base_charge": 9.95,
+            "tdu_delivery_charge": 4.39,
+            "tdu_per_kwh": 0.04,
+        }
+    )
+    assert curve.cost(1000) == pytest.approx(9.95 + 4.39 + 150.0)
+    assert compile_curve({"price_kwh_500": 0.0}) is None
+
+
+def test_bulk_evaluation_matches_scalar_and_roundtrips():
+    curves = [
+        compile_curve(
+            {"price_kwh_500": 15.0, "price_kwh_1000": 5.0, "price_kwh_2000": 10.0},
+            "$100 bill credit when usage is 1000 kWh or more",
+        ),
+        compile_curve({"price_kwh_1000": 13.5}),
+        None,
+        compile_curve(
+            {"price_kwh_500": 12.0, "price_kwh_1000": 10.0, "price_kwh_2000": 9.0},
+            "$9.95 minimum usage fee if usage is less than 800 kWh",
+        ),
+    ]
+    curves[0] = RateCurve.from_json(curves[0].to_json())
+    kwh = np.array([-1.0, 0.0, 320.5, 500.0, 799.9, 800.0, 999.9, 1000.0, 2600.0])
+    matrix = evaluate(CurveArrays.from_curves(curves), kwh)
+    for i, curve in enumerate(curves):
+        for j, k in enumerate(kwh):
+            if curve is None:
+                assert np.isnan(matrix[i, j])
+            else:
+                assert matrix[i, j] == curve.cost(float(k))
+
+
+def test_normalize_plan_compiles_curve():
+    fields = normalize_plan(
+        {
+            "plan_id": "P1",
+            "price_kwh500": "15.0",
+            "price_kwh1000": "5.0",
+            "price_kwh2000": "10.0",
+            "special_terms": "$100 bill credit when usage is 1000 kWh or more.",
+        }
+    )
+    curve = RateCurve.from_json(fields["rate_curve"])
+    assert curve.steps == [(1000.0, -100.0)]
+    assert normalize_plan({"plan_id": "P2"})["rate_curve"] is None
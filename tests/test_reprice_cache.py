@@ -0,0 +1,87 @@
+"""Tests for the memoized repricing cache."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import db
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+from services.ptc_client import save_plans_to_db
+from services.cache import LRUCache
+from services.reprice_cache import cached_reprice, get_cache
+
+ESIID = "1234567890123"
+OTHER = "9999999999999"
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    REPRICE_CACHE_SIZE = 2
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        ingest_usage_rows(_rows(ESIID, 0, 60) + _rows(OTHER, 0, 60))
+        save_plans_to_db([_plan(10.0)])
+        yield app
+        db.drop_all()
+
+
+def _rows(esiid, first, count):
+    start = date(2025, 1, 1)
+    return [
+        ParsedUsageRow(esiid, start + timedelta(days=i), 30.0, "C", "A")
+        for i in range(first, first + count)
+    ]
+
+
+def _plan(price):
+    return {"plan_id": "p1", "company_name": "Co", "plan_name": "P", "price_kwh2000": price}
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.stats() == {
+        "entries": 2,
+        "max_entries": 2,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+
+def test_cached_reprice_hits_until_versions_change(app):
+    first = cached_reprice(ESIID)
+    assert cached_reprice(ESIID) is first
+
+    # Another meter's upload does not invalidate this ESIID's entry.
+    ingest_usage_rows(_rows(OTHER, 60, 5))
+    assert cached_reprice(ESIID) is first
+
+    ingest_usage_rows(_rows(ESIID, 60, 5))
+    second = cached_reprice(ESIID)
+    assert second is not first
+    assert second[0].total_cost > first[0].total_cost
+
+    save_plans_to_db([_plan(12.0)])
+    assert cached_reprice(ESIID) is not second
+    assert get_cache().stats()["hits"] == 2
+
+
+def test_cached_results_outlive_the_session(app):
+    assert cached_reprice(ESIID, start=date(2025, 1, 1))[0].plan.plan_id == "p1"
+    db.session.commit()
+    db.session.remove()
+    assert cached_reprice(ESIID, start=date(2025, 1, 1))[0].plan.company_name == "Co"
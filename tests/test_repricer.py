@@ -91,3 +91,182 @@ def test_api_usage(client):
     assert resp.status_code == 200
     data = resp.get_json()
     assert len(data["data"]) == 90  # Jan + Feb + Mar 2025 = 31+28+31
+
+
+def test_cost_matrix_matches_scalar_estimate(app):
+    import numpy as np
+
+    from services.repricer import compute_cost_matrix, load_plan_rates
+
+    with app.app_context():
+        db.session.add_all(
+            [
+                ElectricityPlan(
+                    plan_id="components",
+                    company_name="A",
+                    plan_name="Components",
+                    energy_charge=0.11,
+                    base_charge=9.95,
+                    tdu_delivery_charge=4.39,
+                    tdu_per_kwh=0.0403,
+                ),
+                ElectricityPlan(
+                    plan_id="no-500-tier",
+                    company_name="B",
+                    plan_name="No 500",
+                    price_kwh_500=0.0,
+                    price_kwh_1000=13.5,
+                    price_kwh_2000=12.0,
+                ),
+                ElectricityPlan(
+                    plan_id="only-2000", company_name="C", plan_name="Only 2000", price_kwh_2000=11.0
+                ),
+                ElectricityPlan(plan_id="no-prices", company_name="D", plan_name="Empty"),
+            ]
+        )
+        db.session.commit()
+
+        kwh = np.array([0.0, 320.5, 500.0, 999.9, 1000.0, 1500.0, 2600.0])
+        rates = load_plan_rates()
+        matrix = compute_cost_matrix(rates, kwh)
+        for i, plan_id in enumerate(rates.plan_ids):
+            plan = db.session.get(ElectricityPlan, int(plan_id))
+            for j, k in enumerate(kwh):
+                expected = plan.estimate_monthly_cost(float(k))
+                if expected is None:
+                    assert np.isnan(matrix[i, j])
+                else:
+                    assert matrix[i, j] == expected
+
+
+def test_reprice_results_rank_and_slice(app):
+    from services.repricer import reprice_usage
+
+    with app.app_context():
+        db.session.add(
+            ElectricityPlan(
+                plan_id="cheap",
+                company_name="Cheap Co",
+                plan_name="Cheap",
+                price_kwh_500=8.0,
+                price_kwh_1000=7.0,
+                price_kwh_2000=6.0,
+            )
+        )
+        db.session.commit()
+
+        results = reprice_usage("1234567890123")
+        assert [r.plan.plan_id for r in results] == ["cheap", "test-plan-1"]
+        assert results[:1][0].total_cost == results.total_costs[0]
+        assert results[-1].plan.plan_id == "test-plan-1"
+
+
+def _seed_random_plans(count, seed=3):
+    import random
+
+    from services.rate_curve import compile_curve
+
+    rng = random.Random(seed)
+    plans = []
+    for i in range(count):
+        fields = {
+            "price_kwh_500": rng.uniform(9, 20),
+            "price_kwh_1000": rng.uniform(8, 18),
+            "price_kwh_2000": rng.uniform(7, 17),
+        }
+        if i % 4 == 0:
+            fields.update(energy_charge=rng.uniform(0.07, 0.16), base_charge=rng.choice([0, 9.95]))
+        terms = "$100 bill credit when usage is 1000 kWh or more." if i % 5 == 0 else ""
+        curve = compile_curve(fields, terms)
+        plans.append(
+            ElectricityPlan(
+                plan_id=f"rand-{i}",
+                company_name="Random Co",
+                plan_name=f"Random {i}",
+                rate_curve=curve.to_json(),
+                **fields,
+            )
+        )
+    # Equal-cost twins exercise the tie-break on plan order.
+    plans.append(ElectricityPlan(plan_id="twin", company_name="T", plan_name="Twin", **fields))
+    db.session.add_all(plans)
+    db.session.commit()
+
+
+def test_top_k_matches_full_ranking(app):
+    from services.repricer import reprice_usage
+
+    with app.app_context():
+        _seed_random_plans(600)
+        full = reprice_usage("1234567890123")
+        for k in (1, 15, 100):
+            top = reprice_usage("1234567890123", top_k=k)
+            assert len(top) == k
+            assert top.plans_considered == len(full)
+            assert top.plans_evaluated < len(full)
+            assert [(r.plan.plan_id, r.total_cost, r.monthly_costs) for r in top] == [
+                (r.plan.plan_id, r.total_cost, r.monthly_costs) for r in full[:k]
+            ]
+        assert len(reprice_usage("1234567890123", top_k=10_000)) == len(full)
+
+
+def test_convex_floor_bounds_mean_bill():
+    import numpy as np
+
+    from services.rate_curve import CurveArrays, compile_curve, convex_floor, evaluate
+
+    curves = CurveArrays.from_curves(
+        [
+            compile_curve({"price_kwh_500": 15.0, "price_kwh_1000": 9.0, "price_kwh_2000": 11.0}),
+            compile_curve(
+                {"energy_charge": 0.1, "base_charge": 9.95},
+                "$9.95 minimum usage fee if usage is less than 500 kWh. "
+                "$50 bill credit for usage between 1,000 and 1,999 kWh",
+            ),
+            None,
+        ]
+    )
+    kwh = np.linspace(0, 4000, 401)
+    bills = evaluate(curves, kwh)
+    for x, column in zip(kwh, bills.T):
+        assert (convex_floor(curves, x)[:2] <= column[:2] + 1e-9).all()
+    # Jensen: the floor at the mean usage bounds the mean bill of any months.
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        months = rng.uniform(rng.uniform(0, 1500), 3000, size=rng.integers(1, 13))
+        months = months[months <= rng.uniform(months.min(), 3000)]
+        floor = convex_floor(curves, months.mean(), months.min(), months.max())
+        assert (floor[:2] <= evaluate(curves, months)[:2].mean(axis=1) + 1e-9).all()
+    # Months below 1000 kWh can never earn the credit.
+    assert convex_floor(curves, 800.0, 700.0, 900.0)[1] == evaluate(curves, [800.0])[1, 0]
+    assert np.isnan(convex_floor(curves, 800.0)[2])
+
+
+def test_api_reprice_pages(client, app):
+    with app.app_context():
+        _seed_random_plans(40)
+    first = client.get("/api/reprice?esiid=1234567890123&k=5").get_json()
+    second = client.get("/api/reprice?esiid=1234567890123&k=5&offset=5").get_json()
+    assert [r["rank"] for r in first["data"] + second["data"]] == list(range(1, 11))
+    totals = [r["total_cost"] for r in first["data"] + second["data"]]
+    assert totals == sorted(totals)
+    assert first["next_offset"] == 5 and first["plans"] == 42
+    assert "monthly_costs" not in first["data"][0]
+    assert client.get("/api/reprice?esiid=1234567890123&k=0").status_code == 400
+    assert client.get("/api/reprice").status_code == 400
+
+
+def test_reprice_page_loads_months_on_demand(client, app):
+    with app.app_context():
+        _seed_random_plans(80)
+    html = client.get("/reprice?esiid=1234567890123").get_data(as_text=True)
+    assert "Showing 50 of 82 plans" in html and "Show more plans" in html
+
+    best = client.get("/api/reprice?esiid=1234567890123&k=1").get_json()["data"][0]
+    detail = client.get(
+        f"/api/reprice/plans/{best['plan']['id']}?esiid=1234567890123&start=2025-02-01"
+    ).get_json()
+    assert [m["month"] for m in detail["monthly_costs"]] == [2, 3]
+    assert detail["plan"] == best["plan"]
+    assert client.get("/api/reprice/plans/99999?esiid=1234567890123").status_code == 404
+    assert client.get(f"/api/reprice/plans/{best['plan']['id']}").status_code == 400
@@ -0,0 +1,90 @@
+"""Tests for the monthly usage rollup."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import MonthlyUsageRollup, UsageRecord, db
+from services import rollup
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+
+ESIID = "1234567890123"
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def _rows(start, days, kwh=10.0, esiid=ESIID):
+    return [
+        ParsedUsageRow(
+            esiid=esiid,
+            date=start + timedelta(days=i),
+            usage_kwh=kwh + i,
+            reading_type="C",
+            actual_estimated="E" if i == 0 else "A",
+        )
+        for i in range(days)
+    ]
+
+
+def test_ingest_maintains_rollup(app):
+    ingest_usage_rows(_rows(date(2025, 1, 20), 20))  # Jan 20 - Feb 8
+    ingest_usage_rows(_rows(date(2025, 2, 9), 5, kwh=1.0))
+
+    months = rollup.monthly_totals(ESIID)
+    assert [(m.year, m.month, m.days) for m in months] == [(2025, 1, 12), (2025, 2, 13)]
+    assert months[0].total_kwh == pytest.approx(sum(10.0 + i for i in range(12)))
+    assert months[0].estimated_days == 1
+    assert (months[1].min_kwh, months[1].max_kwh) == (1.0, 29.0)
+    assert rollup.check_rollup() == []
+
+
+def test_orm_writes_refresh_rollup(app):
+    rec = UsageRecord(esiid=ESIID, date=date(2025, 3, 1), usage_kwh=5.0)
+    db.session.add(rec)
+    db.session.commit()
+    assert rollup.monthly_totals(ESIID)[0].total_kwh == 5.0
+
+    rec.usage_kwh = 7.5
+    db.session.commit()
+    assert rollup.monthly_totals(ESIID)[0].total_kwh == 7.5
+
+    db.session.delete(rec)
+    db.session.commit()
+    assert rollup.monthly_totals(ESIID) == []
+
+
+def test_monthly_totals_partial_months_use_raw_rows(app):
+    ingest_usage_rows(_rows(date(2025, 1, 1), 90, kwh=1.0))
+    ingest_usage_rows(_rows(date(2025, 1, 1), 90, kwh=2.0, esiid="9999999999999"))
+
+    months = rollup.monthly_totals(ESIID, start=date(2025, 1, 10), end=date(2025, 3, 5))
+    assert [(m.month, m.days) for m in months] == [(1, 22), (2, 28), (3, 5)]
+
+    same_month = rollup.monthly_totals(start=date(2025, 2, 3), end=date(2025, 2, 4))
+    assert [(m.month, m.days) for m in same_month] == [(2, 4)]
+
+
+def test_check_and_rebuild(app):
+    ingest_usage_rows(_rows(date(2025, 1, 1), 40))
+    db.session.execute(db.delete(MonthlyUsageRollup))
+    db.session.commit()
+    assert rollup.check_rollup() == [(ESIID, 2025, 1), (ESIID, 2025, 2)]
+
+    result = app.test_cli_runner().invoke(args=["check-rollup", "--fix"])
+    assert "2 month(s) out of sync" in result.output
+    assert rollup.check_rollup() == []
@@ -0,0 +1,70 @@
+"""Tests for downsampled usage chart series."""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app import create_app
+from config import Config
+from models import db
+from services.csv_parser import ParsedUsageRow
+from services.ingest import ingest_usage_rows
+from services.timeseries import lttb, minmax_buckets
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        days = [date(2023, 1, 1) + timedelta(days=i) for i in range(730)]
+        ingest_usage_rows(
+            ParsedUsageRow("1234567890123", d, 60.0 if 4 <= d.month <= 9 else 20.0, "C", "A")
+            for d in days
+        )
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    keep = lttb(y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep
+    assert np.all(np.diff(keep) > 0)
+    assert len(lttb(y, 2000)) == 1000
+
+
+def test_minmax_buckets_within_budget():
+    y = np.sin(np.linspace(0, 20, 1000))
+    keep = minmax_buckets(y, 100)
+    assert len(keep) <= 100
+    assert y[keep].max() == y.max()
+
+
+def test_usage_series_endpoint_is_bounded(client):
+    resp = client.get("/api/usage/series?points=100")
+    data = resp.get_json()
+    assert data["total_points"] == 730
+    assert len(data["daily"]) == 100
+    assert len(data["monthly"]) == 24
+    # 366 summer days at 60 kWh, 364 winter days at 20 kWh
+    assert data["averages"]["daily"] == {"overall": 40.055, "summer": 60.0, "winter": 20.0}
+    assert data["averages"]["monthly"]["summer"] == pytest.approx(1830.0)
+
+
+def test_usage_series_rejects_unknown_method(client):
+    assert client.get("/api/usage/series?method=bogus").status_code == 400
@@ -0,0 +1,127 @@
+"""Tests for the upload registry: identical files and already-covered days."""
+
+import io
+from datetime import date, timedelta
+
+import pytest
+
+from app import create_app
+from config import Config
+from models import Job, Upload, UploadCoverage, UsageRecord, db
+from services.jobs import SUCCEEDED
+from services.uploads import Coverage, load_coverage
+
+ESIID = "1234567890123"
+
+
+def _daily_csv(days) -> bytes:
+    return (
+        "ESIID,Date,Reading Type,Meter Reading (kWh),Actual/Estimated\n"
+        + "".join(f"{ESIID},{d:%m/%d/%Y},C,{30 + d.day},A\n" for d in days)
+    ).encode("utf-8")
+
+
+def _days(first: date, last: date):
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    JOB_WORKERS = 0
+
+
+@pytest.fixture
+def app(tmp_path):
+    TestConfig.UPLOAD_FOLDER = str(tmp_path)
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _upload(client, data) -> Job:
+    resp = client.post(
+        "/upload",
+        data={"file_type": "daily", "csv_file": (io.BytesIO(data), "usage.csv")},
+        content_type="multipart/form-data",
+    )
+    job = db.session.get(Job, resp.headers["Location"].rsplit("/", 1)[-1])
+    assert job.status == SUCCEEDED, job.message
+    return job
+
+
+def test_identical_file_is_not_parsed_again(client):
+    data = _daily_csv(_days(date(2025, 1, 1), date(2025, 1, 28)))
+    _upload(client, data)
+    again = _upload(client, data)
+    assert again.rows_parsed == 0
+    assert again.to_dict()["result"]["skipped"] == 28
+    assert "Identical to the file uploaded" in again.message
+    assert Upload.query.count() == 1
+
+
+def test_overlapping_export_only_ingests_new_days(client):
+    _upload(client, _daily_csv(_days(date(2025, 1, 1), date(2025, 1, 28))))
+    job = _upload(client, _daily_csv(_days(date(2025, 1, 15), date(2025, 2, 10))))
+    # Only January 29 to February 10 reached the ingest.
+    assert job.rows_parsed == 13
+    assert (job.to_dict()["result"]["imported"], job.to_dict()["result"]["skipped"]) == (13, 14)
+    assert UsageRecord.query.count() == 41
+
+
+def test_gaps_are_not_treated_as_covered(client):
+    jan = _days(date(2025, 1, 1), date(2025, 1, 31))
+    _upload(client, _daily_csv(jan[:10] + jan[20:]))
+    runs = {(c.start_date.day, c.end_date.day) for c in UploadCoverage.query}
+    assert runs == {(1, 10), (21, 31)}
+
+    job = _upload(client, _daily_csv(jan))
+    assert (job.rows_parsed, job.to_dict()["result"]["imported"]) == (10, 10)
+    assert UsageRecord.query.count() == 31
+
+
+def test_deleting_records_forgets_coverage(client):
+    data = _daily_csv(_days(date(2025, 1, 1), date(2025, 1, 10)))
+    _upload(client, data)
+    db.session.delete(UsageRecord.query.filter_by(date=date(2025, 1, 5)).one())
+    db.session.commit()
+    assert UploadCoverage.query.count() == 0
+
+    job = _upload(client, data)
+    assert job.to_dict()["result"]["imported"] == 1
+    assert UsageRecord.query.count() == 10
+
+
+def test_unknown_file_type_is_rejected(client):
+    resp = client.post(
+        "/upload",
+        data={"file_type": "hourly", "csv_file": (io.BytesIO(b"ESIID\n"), "usage.csv")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 400
+    assert "Unknown file type" in resp.get_data(as_text=True)
+    assert Job.query.count() == 0
+
+    with pytest.raises(ValueError, match="Unknown file type"):
+        load_coverage("hourly")
+
+
+def test_coverage_merges_touching_runs():
+    coverage = Coverage(
+        [
+            (ESIID, date(2025, 1, 1), date(2025, 1, 10)),
+            (ESIID, date(2025, 1, 11), date(2025, 1, 20)),
+            (ESIID, date(2025, 3, 1), date(2025, 3, 5)),
+        ]
+    )
+    assert (ESIID, date(2025, 1, 15)) in coverage
+    assert (ESIID, date(2025, 2, 1)) not in coverage
+    assert (ESIID, date(2024, 12, 31)) not in coverage
+    assert ("other", date(2025, 1, 15)) not in coverage